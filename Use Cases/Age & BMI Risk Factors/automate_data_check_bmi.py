@@ -1,7 +1,7 @@
 """
 BMI Use Case Check Script
 Written: 12/12/2020
-Updated: 12/12/2020
+Updated: 10/18/2026
 @author: Dominic DiSanto
 """
 
@@ -9,94 +9,100 @@ Updated: 12/12/2020
 
 
 import pandas as pd
-import numpy as np
+import os, sys
 
-def sln_check(submission, solution, num, correct, note):
-    
-    submission_cln =  submission.sort_values('ID').reset_index(drop=True)    
-    submission_cln = submission_cln[~np.isnan(submission_cln['ID'])]
-    
-    solution_cln =  solution.sort_values('ID').reset_index(drop=True)    
-    solution_cln = solution_cln[~np.isnan(solution_cln['ID'])]
-    
-    xmax = max(submission_cln.shape[0], solution_cln.shape[0])
-    ymax = max(submission_cln.shape[1], solution_cln.shape[1])
+# row_diff.py, shared by the use case check scripts, sits in the Use Cases folder
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from row_diff import diff_frames
 
-    bool_check = 0
+# Each workbook is parsed once (all sheets) and its sheets cached next to the script for later runs
+from workbook_cache import load_workbook, load_report
+from bmi_cohorts import CohortEngine, bmi_criteria
 
-    for j in ['ID', 'PhoneNo', 'Address']:
-        for i in range(xmax):
-            bool_check = bool_check + (solution_cln.loc[i, j] == submission_cln.loc[i, j])
+key_columns = ['ID', 'PhoneNo', 'Address']
 
-    if bool_check == xmax*ymax:
-        correct[num] = 'Correct!'
-        note[num] = ''
-    elif solution_cln.shape[0] != submission_cln.shape[0]:
-        correct[num] = 'Some errors present, see note'
-        note[num] = 'Unequal number of rows (i.e. observations). Some patients incorrectly included and/or some incorrectly excluded'
-    elif solution.shape[1] != submission_cln.shape[1]:
+import_error_note = 'Error importing file, please check your submission. If you feel this is an error, please contact the instructors via GitHub and consult the manual submission key for feedback in the interim'
+
+def id_list(ids, limit=10):
+    ids = sorted(pd.unique(pd.Series(list(ids))), key=str)
+    shown = [str(int(i)) if isinstance(i, float) and i.is_integer() else str(i) for i in ids[:limit]]
+    return ', '.join(shown) + (', ...' if len(ids) > limit else '')
+
+def sln_check(submission, solution, num, correct, note):
+    # Note the answer key is passed in as `submission` and the student's sheet as `solution`
+    key = submission[submission['ID'].notna()]
+    student = solution[solution['ID'].notna()]
+
+    # Joining the two on ID: unmatched IDs are missing/extra patients, matched IDs are compared column by column
+    diff = diff_frames(student, key, key='ID', drop=[])
+    issues = []
+
+    # Row count
+    if student.shape[0] != key.shape[0]:
+        issues.append('Unequal number of rows (i.e. observations): %d in your answer and %d in the solution. Some patients incorrectly included and/or some incorrectly excluded' % (student.shape[0], key.shape[0]))
+    elif len(diff.missing) or len(diff.extra):
+        issues.append('Correct dimensions supplied (i.e. correct number of rows and columns), but some correct observations erroneously excluded as well as incorret patients included')
+
+    # Column set
+    if diff.missing_columns or diff.extra_columns:
+        detail = ['missing ' + ', '.join(diff.missing_columns)] if diff.missing_columns else []
+        detail += ['unexpected ' + ', '.join(diff.extra_columns)] if diff.extra_columns else []
+        issues.append('Unequal number of columns (%s). Ensure your answer contains only patient ID, phone number, and address' % '; '.join(detail))
+
+    # Values
+    duplicated = student.loc[student['ID'].duplicated(), 'ID']
+    if len(duplicated):
+        issues.append('Patients listed more than once: ' + id_list(duplicated))
+    if len(diff.missing):
+        issues.append('Patients missing from your answer: ' + id_list(diff.missing['ID']))
+    extra = diff.extra.loc[~diff.extra['ID'].isin(duplicated), 'ID'] # a repeated patient is reported once, above
+    if len(extra):
+        issues.append('Patients incorrectly included: ' + id_list(extra))
+    if len(diff.changed):
+        columns = diff.column_mismatches[diff.column_mismatches > 0]
+        issues.append('Patients with a different %s: ' % ' or '.join(columns.index) + id_list(diff.changed.index))
+
+    if issues:
         correct[num] = 'Some errors present, see note'
-        note[num] = 'Unequal number of columns. Ensure your answer contains only patient ID, phone number, and address'
+        note[num] = '. '.join(issues)
     else:
-        correct[num] = 'Some errors present, see note'
-        note[num] = 'Correct dimensions supplied (i.e. correct number of rows and columns), but some correct observations erroneously excluded as well as incorret patients included'
+        correct[num] = 'Correct!'
+        note[num] = ''
+
+def check_criteria(filename, sheet_name, answer_key, num, correct, note):
+    # Importing one criteria sheet of a submission and checking it, with any failure described in the note
+    if not os.path.isfile(filename):
+        note[num] = 'No submission found (%s)' % filename
+        return
+    try:
+        submission = load_workbook(filename)[sheet_name]
+    except Exception as e:
+        note[num] = '%s (%s: %s)' % (import_error_note, type(e).__name__, e)
+        return
+    try:
+        sln_check(answer_key, submission, num, correct, note)
+    except Exception as e:
+        correct[num] = 'Could not be checked'
+        note[num] = 'Error checking sheet %s of %s (%s: %s). Ensure the sheet contains the columns %s' % (sheet_name, filename, type(e).__name__, e, ', '.join(key_columns))
 
 
 # Initial Data Set
 
 ## Importing Data and Creating Answer Key/Solutions
-sln_hw = pd.read_excel('BMI_Data.xlsx', sheet_name = 'HeightWeight')
-sln_ctc = pd.read_excel('BMI_Data.xlsx', sheet_name = 'Contact Info')
-
-sln_hw['BMI'] = np.round(sln_hw['Weight (kg)'] / (sln_hw['Height (cm)']/100)**2, 2)
-sln_hw
+bmi_data = load_workbook('BMI_Data.xlsx')
 
-sln1 = pd.merge(sln_hw.loc[sln_hw['BMI']>=30, 'ID'], sln_ctc, on='ID')
-sln1 = sln1.sort_values('ID')
-
-sln2 = pd.merge(sln_hw.loc[sln_hw['BMI']>=35, 'ID'], sln_ctc, on='ID')
-sln2 = sln2.sort_values('ID')
-
-sln3 = pd.merge(sln_hw.loc[(sln_hw['BMI']>=30) & (sln_hw['Age']>=60), 'ID'], sln_ctc, on='ID')
-sln3 = sln3.sort_values('ID')
-
-sln4 = pd.merge(sln_hw.loc[(sln_hw['BMI']>=35) & (sln_hw['Age']>=60), 'ID'], sln_ctc, on='ID')
-sln4 = sln4.sort_values('ID')
+# BMI computed once and the four criteria (see bmi_cohorts.bmi_criteria) evaluated together, keyed by sheet name
+cohorts = CohortEngine(bmi_criteria).fit(bmi_data['HeightWeight'], bmi_data['Contact Info'])
+answer_keys = cohorts.cohorts()
 
 
 ## Excel Submission
 correct_xcl = [[], [], [], []]
 note_xcl = [[], [], [], []]
 
-### Criteria 1
-try:
-    excel_sln1 = pd.read_excel('BMI_Solution_Excel.xlsx', sheet_name='Criteria_1')
-    sln_check(sln1, excel_sln1, 0, correct_xcl, note_xcl)
-except:
-    note_xcl[0] = 'Error importing file, please check your submission. If you feel this is an error, please contact the instructors via GitHub and consult the manual submission key for feedback in the interim'   
-
-### Criteria 2 
-try:    
-    excel_sln2 = pd.read_excel('BMI_Solution_Excel.xlsx', sheet_name='Criteria_2')
-    sln_check(sln2, excel_sln2, 1, correct_xcl, note_xcl)
-except:
-    note_xcl[1] = 'Error importing file, please check your submission. If you feel this is an error, please contact the instructors via GitHub and consult the manual submission key for feedback in the interim'   
-
-### Criteria 3
-try:    
-    excel_sln3 = pd.read_excel('BMI_Solution_Excel.xlsx', sheet_name='Criteria_3')
-    sln_check(sln3, excel_sln3, 2, correct_xcl, note_xcl)
-except:
-    note_xcl[2] = 'Error importing file, please check your submission. If you feel this is an error, please contact the instructors via GitHub and consult the manual submission key for feedback in the interim'   
-
-### Criteria 4
-try:    
-    excel_sln4 = pd.read_excel('BMI_Solution_Excel.xlsx', sheet_name='Criteria_4')
-    sln_check(sln4, excel_sln4, 3, correct_xcl, note_xcl)
-except:
-    note_xcl[3] = 'Error importing file, please check your submission. If you feel this is an error, please contact the instructors via GitHub and consult the manual submission key for feedback in the interim'   
+for num, (sheet_name, answer_key) in enumerate(answer_keys.items()):
+    check_criteria('BMI_Solution_Excel.xlsx', sheet_name, answer_key, num, correct_xcl, note_xcl)
 
-    
 excel_df = pd.DataFrame({'Criteria':list(range(1, 5)),
                             'Correct':correct_xcl,
                             'Feedback':note_xcl})
@@ -107,35 +113,9 @@ excel_df = pd.DataFrame({'Criteria':list(range(1, 5)),
 correct_python = [[], [], [], []]
 note_python = [[], [], [], []]
 
-### Criteria 1
-try:
-    python_sln1 = pd.read_excel('BMI_Solution_Python.xlsx', sheet_name='Criteria_1')   
-    sln_check(sln1, python_sln1, 0, correct_python, note_python)
-except:
-    note_python[0] = 'Error importing file, please check your submission. If you feel this is an error, please contact the instructors via GitHub and consult the manual submission key for feedback in the interim'   
-
-### Criteria 2
-try:     
-    python_sln2 = pd.read_excel('BMI_Solution_Python.xlsx', sheet_name='Criteria_2')
-    sln_check(sln2, python_sln2, 1, correct_python, note_python)
-except:
-    note_python[1] = 'Error importing file, please check your submission. If you feel this is an error, please contact the instructors via GitHub and consult the manual submission key for feedback in the interim'   
-
-### Criteria 3
-try:    
-    python_sln3 = pd.read_excel('BMI_Solution_Python.xlsx', sheet_name='Criteria_3')
-    sln_check(sln3, python_sln3, 2, correct_python, note_python)
-except:
-    note_python[2] = 'Error importing file, please check your submission. If you feel this is an error, please contact the instructors via GitHub and consult the manual submission key for feedback in the interim'   
-
-### Criteria 4
-try:    
-    python_sln4 = pd.read_excel('BMI_Solution_Python.xlsx', sheet_name='Criteria_4')
-    sln_check(sln4, python_sln4, 3, correct_python, note_python)
-except:
-    note_python[3] = 'Error importing file, please check your submission. If you feel this is an error, please contact the instructors via GitHub and consult the manual submission key for feedback in the interim'   
+for num, (sheet_name, answer_key) in enumerate(answer_keys.items()):
+    check_criteria('BMI_Solution_Python.xlsx', sheet_name, answer_key, num, correct_python, note_python)
 
-    
 python_df = pd.DataFrame({'Criteria':list(range(1, 5)),
                             'Correct':correct_python,
                             'Feedback':note_python})  
@@ -144,44 +124,9 @@ python_df = pd.DataFrame({'Criteria':list(range(1, 5)),
 correct_R= [[], [], [], []]
 note_R= [[], [], [], []]
 
-try:
-    ### Criteria 1
-    R_sln1 = pd.read_excel('BMI_Solution_R.xlsx', sheet_name='Criteria_1')
-    R_sln1 = R_sln1[~np.isnan(R_sln1['ID'])]
-    R_sln1 = R_sln1.sort_values('ID')
-    
-    sln_check(sln1, R_sln1, 0, correct_R, note_R)
-except:
-    note_R[0] = 'Error importing file, please check your submission. If you feel this is an error, please contact the instructors via GitHub and consult the manual submission key for feedback in the interim'   
-
-try:    
-    ### Criteria 2 
-    R_sln2 = pd.read_excel('BMI_Solution_R.xlsx', sheet_name='Criteria_2')
-    R_sln2 = R_sln2[~np.isnan(R_sln2['ID'])]
-    
-    sln_check(sln2, R_sln2, 1, correct_R, note_R)
-except:
-    note_R[1] = 'Error importing file, please check your submission. If you feel this is an error, please contact the instructors via GitHub and consult the manual submission key for feedback in the interim'   
-
-try:    
-    ### Criteria 3
-    R_sln3 = pd.read_excel('BMI_Solution_R.xlsx', sheet_name='Criteria_3')
-    R_sln3  = R_sln3[~np.isnan(R_sln3['ID'])]
-    
-    sln_check(sln3, R_sln3, 2, correct_R, note_R)
-except:
-    note_R[2] = 'Error importing file, please check your submission. If you feel this is an error, please contact the instructors via GitHub and consult the manual submission key for feedback in the interim'   
-
-try:    
-    ### Criteria 4
-    R_sln4 = pd.read_excel('BMI_Solution_R.xlsx', sheet_name='Criteria_4')
-    R_sln4 = R_sln4[~np.isnan(R_sln4['ID'])]
-   
-    sln_check(sln4, R_sln4, 3, correct_R, note_R)
-except:
-    note_R[3] = 'Error importing file, please check your submission. If you feel this is an error, please contact the instructors via GitHub and consult the manual submission key for feedback in the interim'   
+for num, (sheet_name, answer_key) in enumerate(answer_keys.items()):
+    check_criteria('BMI_Solution_R.xlsx', sheet_name, answer_key, num, correct_R, note_R)
 
-    
 R_df = pd.DataFrame({'Criteria':list(range(1, 5)),
                             'Correct':correct_R,
                             'Feedback':note_R})  
@@ -189,57 +134,19 @@ R_df = pd.DataFrame({'Criteria':list(range(1, 5)),
 # Updated Data Submission Check
     
 ## Importing Data and Creating Answer Key/Solutions
-sln_upd_hw = pd.read_excel('BMI_Data_UPDATE.xlsx', sheet_name = 'HeightWeight')
-sln_upd_ctc = pd.read_excel('BMI_Data_UPDATE.xlsx', sheet_name = 'Contact Info')
-
-sln_upd_hw['BMI'] = np.round(sln_upd_hw['Weight (kg)'] / (sln_upd_hw['Height (cm)']/100)**2, 2)
-sln_upd_hw
-
-sln_upd_1 = pd.merge(sln_upd_hw.loc[sln_upd_hw['BMI']>=30, 'ID'], sln_upd_ctc, on='ID')
-sln_upd_1 = sln_upd_1.sort_values('ID')
+bmi_data_upd = load_workbook('BMI_Data_UPDATE.xlsx')
 
-sln_upd_2 = pd.merge(sln_upd_hw.loc[sln_upd_hw['BMI']>=35, 'ID'], sln_upd_ctc, on='ID')
-sln_upd_2 = sln_upd_2.sort_values('ID')
-
-sln_upd_3 = pd.merge(sln_upd_hw.loc[(sln_upd_hw['BMI']>=30) & (sln_upd_hw['Age']>=60), 'ID'], sln_upd_ctc, on='ID')
-sln_upd_3 = sln_upd_3.sort_values('ID')
-
-sln_upd_4 = pd.merge(sln_upd_hw.loc[(sln_upd_hw['BMI']>=35) & (sln_upd_hw['Age']>=60), 'ID'], sln_upd_ctc, on='ID')
-sln_upd_4 = sln_upd_4.sort_values('ID')
+# Only the patients added or changed in the updated data are re-evaluated
+upd_changes = cohorts.update(bmi_data_upd['HeightWeight'], bmi_data_upd['Contact Info'])
+answer_keys_upd = cohorts.cohorts()
 
 ## Creating submission check data frame
 correct_update = [[], [], [], []]
 note_update = [[], [], [], []]
 
-### Criteria 1
-try:
-    update_sln1 = pd.read_excel('BMI_Solution_UPDATE.xlsx', sheet_name='Criteria_1')
-    sln_check(sln_upd_1, update_sln1, 0, correct_update, note_update)
-except:
-    note_update[0] = 'Error importing file, please check your submission. If you feel this is an error, please contact the instructors via GitHub and consult the manual submission key for feedback in the interim'   
-
-### Criteria 2 
-try:    
-    update_sln2 = pd.read_excel('BMI_Solution_UPDATE.xlsx', sheet_name='Criteria_2')
-    sln_check(sln_upd_2, update_sln2, 1, correct_update, note_update)
-except:
-    note_update[1] = 'Error importing file, please check your submission. If you feel this is an error, please contact the instructors via GitHub and consult the manual submission key for feedback in the interim'   
-
-### Criteria 3
-try:    
-    update_sln3 = pd.read_excel('BMI_Solution_UPDATE.xlsx', sheet_name='Criteria_3')
-    sln_check(sln_upd_3, update_sln3, 2, correct_update, note_update)
-except:
-    note_update[2] = 'Error importing file, please check your submission. If you feel this is an error, please contact the instructors via GitHub and consult the manual submission key for feedback in the interim'   
-
-### Criteria 4
-try:    
-    update_sln4 = pd.read_excel('BMI_Solution_UPDATE.xlsx', sheet_name='Criteria_4')
-    sln_check(sln_upd_4, update_sln4, 3, correct_update, note_update)
-except:
-    note_update[3] = 'Error importing file, please check your submission. If you feel this is an error, please contact the instructors via GitHub and consult the manual submission key for feedback in the interim'   
+for num, (sheet_name, answer_key) in enumerate(answer_keys_upd.items()):
+    check_criteria('BMI_Solution_UPDATE.xlsx', sheet_name, answer_key, num, correct_update, note_update)
 
-    
 update_df = pd.DataFrame({'Criteria':list(range(1, 5)),
                             'Correct':correct_update,
                             'Feedback':note_update})
@@ -256,4 +163,7 @@ with pd.ExcelWriter('SolutionCheckResults.xlsx') as writer:
                     index = False)
     update_df.to_excel(excel_writer = writer,
                        sheet_name = "Updated Data Submission",
-                       index=False)
\ No newline at end of file
+                       index=False)
+    load_report().to_excel(excel_writer = writer,
+                           sheet_name = "Load Times",
+                           index=False)
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+BMI Cohort Criteria
+Written: 10/18/2026
+Updated: 10/18/2026
+
+Builds the contact lists of the BMI use case (BMI >= 30, BMI >= 35, and each
+with Age >= 60) from declared criteria rather than one mask and merge per
+subset. Each criterion is a set of column thresholds, e.g. {'BMI':30, 'Age':60}
+for BMI >= 30 & Age >= 60, or {'BMI':('<', 18.5)} for another comparison.
+
+BMI is computed once per patient. Every criterion is then evaluated into one
+bit of a per-patient mask in a single pass, and the patients meeting any
+criterion are joined with their contact information once for all cohorts.
+
+Given an updated data set (e.g. BMI_Data_UPDATE.xlsx, or a monthly registry
+refresh), update() finds the added, changed and removed patient IDs by
+comparing their rows with the current ones, and recomputes BMI, the masks and the contact join for
+those patients only.
+
+    cohorts = CohortEngine(bmi_criteria)
+    cohorts.fit(sheets['HeightWeight'], sheets['Contact Info'])
+    cohorts.cohorts()['Criteria_1']
+    cohorts.update(new_sheets['HeightWeight'], new_sheets['Contact Info'])
+"""
+
+# Modules
+
+import pandas as pd
+import numpy as np
+import operator
+
+
+# The four subsets of the use case, named as the sheets of the solution workbooks
+bmi_criteria = {'Criteria_1':{'BMI':30},
+                'Criteria_2':{'BMI':35},
+                'Criteria_3':{'BMI':30, 'Age':60},
+                'Criteria_4':{'BMI':35, 'Age':60}}
+
+comparisons = {'>=':operator.ge, '>':operator.gt, '<=':operator.le, '<':operator.lt, '==':operator.eq,
+               '!=':operator.ne}
+
+
+def bmi(hw, weight='Weight (kg)', height='Height (cm)'):
+    '''BMI rounded to 2 decimals, as in the walkthrough.'''
+    return np.round(hw[weight] / (hw[height] / 100)**2, 2)
+
+
+def conditions(criteria):
+    '''
+    The distinct (column, comparison, value) conditions of the criteria, and
+    for each criterion the positions of its conditions in that list. A bare
+    value means column >= value.
+    '''
+    distinct, used = [], {}
+    for name, thresholds in criteria.items():
+        positions = []
+        for column, value in thresholds.items():
+            op, value = value if isinstance(value, tuple) else ('>=', value)
+            if op not in comparisons:
+                raise ValueError('Unknown comparison %r in criterion %s' % (op, name))
+            if (column, op, value) not in distinct:
+                distinct.append((column, op, value))
+            positions.append(distinct.index((column, op, value)))
+        used[name] = positions
+    return distinct, used
+
+
+def changed_ids(new, old):
+    '''
+    IDs of the rows of `new` that are absent from `old` or differ from it in
+    any column of `new` (both indexed by ID, missing values comparing equal).
+    '''
+    pos = old.index.get_indexer(new.index)
+    differs = pos < 0
+    present = np.flatnonzero(~differs)
+    for column in new.columns:
+        a = new[column].iloc[present].reset_index(drop=True)
+        b = old[column].take(pos[present]).reset_index(drop=True)
+        both_na = a.isna().to_numpy() & b.isna().to_numpy()
+        differs[present] |= a.ne(b).to_numpy(dtype=bool, na_value=True) & ~both_na
+    return new.index[differs]
+
+
+def _rows(df, ids):
+    '''Rows of `df` (uniquely indexed) with the given IDs, looked up through its cached index.'''
+    pos = df.index.get_indexer(ids)
+    return df.iloc[pos[pos >= 0]]
+
+
+def _drop(df, ids):
+    pos = df.index.get_indexer(ids)
+    if not (pos >= 0).any():
+        return df
+    keep = np.ones(len(df), dtype=bool)
+    keep[pos[pos >= 0]] = False
+    return df[keep]
+
+
+def _upsert(df, rows, removed):
+    '''`df` with `rows` (same columns) replacing its rows of the same ID or appended, and `removed` dropped.'''
+    df = _drop(df, removed)
+    pos = df.index.get_indexer(rows.index)
+    found = pos >= 0
+    if found.any():
+        for k, column in enumerate(df.columns):
+            df.iloc[pos[found], k] = rows[column].to_numpy()[found]
+    if not found.all():
+        df = pd.concat([df, rows[~found]])
+    return df
+
+
+class CohortEngine:
+    '''
+    Cohorts of declared criteria (up to 64, {name: {column: threshold}}) over
+    a height/weight sheet and a contact sheet sharing an ID column.
+
+    `patients` holds each patient's height/weight columns, BMI and criteria
+    mask (bit k set when the patient meets the k-th criterion), indexed by ID.
+    `members` holds the contact rows of the patients meeting any criterion,
+    with their mask.
+    '''
+
+    def __init__(self, criteria=bmi_criteria, id_var='ID'):
+        if len(criteria) > 64:
+            raise ValueError('At most 64 criteria fit in a mask, got %d' % len(criteria))
+        self.criteria = dict(criteria)
+        self.id_var = id_var
+        self._conditions, used = conditions(self.criteria)
+        self._used = list(used.values())
+        self.patients = None
+        self.contact = None
+        self.members = None
+
+    def _indexed(self, df, sheet):
+        df = df.set_index(self.id_var)
+        if not df.index.is_unique:
+            duplicated = df.index[df.index.duplicated()].unique()
+            raise ValueError('Patient IDs repeated in the %s sheet: %s' % (sheet, ', '.join(map(str, duplicated[:10]))))
+        return df
+
+    def _input_columns(self):
+        '''The height/weight columns, without the computed BMI and mask.'''
+        return self.patients.columns.difference(['BMI', 'Mask'], sort=False)
+
+    def evaluate(self, hw):
+        '''Height/weight rows (indexed by ID) with their BMI and criteria mask.'''
+        out = hw.copy()
+        out['BMI'] = bmi(hw)
+
+        # Each distinct condition once, then every criterion as one bit of the mask
+        met = [comparisons[op](out[column].to_numpy(), value) for column, op, value in self._conditions]
+        mask = np.zeros(len(out), dtype=np.uint64)
+        for bit, positions in enumerate(self._used):
+            meets = np.ones(len(out), dtype=bool)
+            for k in positions:
+                meets &= met[k]
+            mask |= meets.astype(np.uint64) << np.uint64(bit)
+        out['Mask'] = mask
+        return out
+
+    def _join(self, patients, contact):
+        '''Contact rows of the given patients meeting any criterion, with their masks.'''
+        selected = patients.loc[patients['Mask'] != 0, ['Mask']]
+        return selected.join(contact, how='inner')
+
+    def fit(self, hw, contact):
+        '''Evaluates every patient of the height/weight and contact sheets.'''
+        self.patients = self.evaluate(self._indexed(hw, 'height/weight'))
+        self.contact = self._indexed(contact, 'contact')
+        self.members = self._join(self.patients, self.contact)
+        return self
+
+    def apply_changes(self, hw=None, contact=None, removed=(), removed_contact=None):
+        '''
+        Applies changed or added height/weight and contact rows (only those
+        rows, with an ID column) and the IDs removed from the height/weight
+        sheet (and from the contact sheet, `removed_contact`, by default the
+        same IDs), recomputing the affected patients only. Returns their IDs.
+        '''
+        removed = pd.Index(removed)
+        removed_contact = removed if removed_contact is None else pd.Index(removed_contact)
+        hw = self._indexed(hw, 'height/weight') if hw is not None else self.patients.iloc[:0]
+        contact = self._indexed(contact, 'contact') if contact is not None else self.contact.iloc[:0]
+
+        hw = self.evaluate(hw[self._input_columns()])
+        contact = contact[self.contact.columns]
+        self.patients = _upsert(self.patients, hw, removed)
+        self.contact = _upsert(self.contact, contact, removed_contact)
+
+        # Members re-joined for the affected patients only
+        affected = removed.union(removed_contact).union(hw.index).union(contact.index)
+        joined = self._join(_rows(self.patients, affected), _rows(self.contact, affected))
+        self.members = pd.concat([_drop(self.members, affected), joined])
+        return affected
+
+    def update(self, hw, contact):
+        '''
+        Brings the cohorts up to date with a full new copy of both sheets,
+        recomputing only the added, changed and removed patients. Returns a
+        dict of those IDs.
+        '''
+        hw, contact = self._indexed(hw, 'height/weight'), self._indexed(contact, 'contact')
+        hw, contact = hw[self._input_columns()], contact[self.contact.columns]
+        hw_changed, contact_changed = changed_ids(hw, self.patients), changed_ids(contact, self.contact)
+        removed = self.patients.index.difference(hw.index)
+        removed_contact = self.contact.index.difference(contact.index)
+        added = hw.index.difference(self.patients.index)
+        self.apply_changes(hw.loc[hw_changed].reset_index(), contact.loc[contact_changed].reset_index(), removed,
+                           removed_contact)
+        return {'Added':added, 'Changed':hw_changed.union(contact_changed).difference(added),
+                'Removed':removed.union(removed_contact)}
+
+    def cohort(self, name):
+        '''One criterion's patients with their contact information, sorted by ID.'''
+        bit = np.uint64(list(self.criteria).index(name))
+        rows = self.members[((self.members['Mask'].to_numpy() >> bit) & np.uint64(1)) == 1]
+        return rows.drop(columns='Mask').sort_index().reset_index()
+
+    def cohorts(self):
+        '''Every criterion's cohort, {name: data frame}.'''
+        return {name:self.cohort(name) for name in self.criteria}
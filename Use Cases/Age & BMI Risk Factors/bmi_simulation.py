@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+BMI Patient Data Simulation
+Written: 10/18/2026
+Updated: 10/18/2026
+
+A vectorized version of Instructor Materials/BMI_DataSim.ipynb that
+generates the patient data of the use case (the HeightWeight and Contact
+Info sheets of BMI_Data.xlsx) for any number of patients, e.g. to load test
+automate_data_check_bmi.py.
+
+The notebook's distributions are kept: Age ~ N(50, 10) truncated to an
+integer, Height (cm) ~ N(180, 20) and BMI ~ N(27, 5) to one decimal, and
+Weight (kg) back-calculated from BMI and height. IDs are distinct 9 digit
+numbers from cohort_sim.unique_ids, rather than drawn at random and checked
+for duplicates. Phone numbers and addresses are built from the word lists
+below in one pass, rather than one Faker call per patient.
+
+    sheets = bmi_sheets(bmi_cohort(756 + 145))
+    bmi_workbook(901, 'BMI_Data_UPDATE.xlsx')
+    bmi_cohort_csv(10_000_000, 'BMI_Data_10M.csv', chunksize=1_000_000)
+"""
+
+# Modules
+
+import pandas as pd
+import numpy as np
+import os, sys
+
+# The shared generator helpers sit one folder up, in Use Cases
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from cohort_sim import block_streams, generate, unique_ids, write_chunks
+
+
+default_seed = 15951
+
+# 9 digit IDs, 111111111 and up
+id_start, id_space = 111111111, 888888888
+
+# (mean, sd) of the simulated measures
+age_params, height_params, bmi_params = (50, 10), (180, 20), (27, 5)
+
+# Parts of the simulated contact information
+street_names = ['Jensen', 'Jennifer', 'Mahoney', 'Sanchez', 'Holland', 'Maple', 'Oak', 'Cedar', 'Lake', 'Hill',
+                'Washington', 'Lincoln', 'Park', 'River', 'Spring', 'Ridge', 'Forest', 'Meadow', 'Church', 'Mill']
+street_suffixes = ['Street', 'Avenue', 'Road', 'Lane', 'Drive', 'Court', 'Pike', 'Junction', 'Cove', 'Mountains']
+cities = ['Jonesmouth', 'South Donmouth', 'West Brandon', 'Michellestad', 'Coryburgh', 'Lake Amanda', 'Port Kevin',
+          'East Sarah', 'North Jamesville', 'New Lisa']
+states = ['AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'FL', 'GA', 'HI', 'ID', 'IL', 'IN', 'IA', 'KS', 'KY', 'LA',
+          'ME', 'MD', 'MA', 'MI', 'MN', 'MS', 'MO', 'MT', 'NE', 'NV', 'NH', 'NJ', 'NM', 'NY', 'NC', 'ND', 'OH', 'OK',
+          'OR', 'PA', 'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV', 'WI', 'WY']
+
+# Columns of each sheet of the use case workbooks
+sheet_columns = {'HeightWeight':['ID', 'Age', 'Height (cm)', 'Weight (kg)'],
+                 'Contact Info':['ID', 'PhoneNo', 'Address']}
+
+_streams = ['age', 'height', 'bmi', 'phone', 'address']
+
+
+def _digits(values, width):
+    '''Integers below 10**width as zero padded strings (offset by 10**width and sliced, no per-value formatting).'''
+    return pd.Series(values + 10**width).astype(str).str.slice(1)
+
+
+def bmi_block(seed, block, first, size, total):
+    '''The first `size` rows of one block of simulated patients (see cohort_sim.generate).'''
+    rng = block_streams(seed, block, _streams)
+    df = pd.DataFrame({'ID':id_start + unique_ids(np.arange(first, first + size), id_space, seed)})
+    df['Age'] = rng['age'].normal(*age_params, size).astype(int)
+    df['Height (cm)'] = np.round(rng['height'].normal(*height_params, size), 1)
+    df['BMI'] = np.round(rng['bmi'].normal(*bmi_params, size), 1)
+    df['Weight (kg)'] = np.round(df['BMI'] * (df['Height (cm)'] / 100)**2, 2)
+
+    # One row of integer draws per patient: area code, exchange, line / number, street, suffix, city, state, zip
+    phone = rng['phone'].integers(0, [800, 800, 10000], (size, 3))
+    df['PhoneNo'] = _digits(phone[:, 0] + 200, 3) + '-' + _digits(phone[:, 1] + 200, 3) + '-' + _digits(phone[:, 2], 4)
+    address = rng['address'].integers(0, [99999, len(street_names), len(street_suffixes), len(cities), len(states),
+                                          100000], (size, 6))
+    df['Address'] = (pd.Series(address[:, 0] + 1).astype(str) + ' ' +
+                     np.array(street_names, dtype=object)[address[:, 1]] + ' ' +
+                     np.array(street_suffixes, dtype=object)[address[:, 2]] + '\n' +
+                     np.array(cities, dtype=object)[address[:, 3]] + ', ' +
+                     np.array(states, dtype=object)[address[:, 4]] + ' ' + _digits(address[:, 5], 5))
+    return df
+
+
+def bmi_cohort(n, seed=default_seed):
+    '''n simulated patients, with every column of both sheets and the BMI used to derive the weight.'''
+    return generate(bmi_block, n, seed)
+
+
+def bmi_sheets(df):
+    '''The HeightWeight and Contact Info sheets of simulated patients, {sheet name: DataFrame}.'''
+    return {sheet:df[columns] for sheet, columns in sheet_columns.items()}
+
+
+def bmi_workbook(n, out_fp, seed=default_seed):
+    '''
+    Writes the first n simulated patients as a workbook of the use case. As in
+    the notebook, BMI_Data.xlsx (n = 756) holds the first rows of
+    BMI_Data_UPDATE.xlsx (n = 901) when both use the same seed.
+    '''
+    with pd.ExcelWriter(out_fp) as writer:
+        for sheet, df in bmi_sheets(bmi_cohort(n, seed)).items():
+            df.to_excel(excel_writer=writer, sheet_name=sheet, index=False)
+    return out_fp
+
+
+def bmi_cohort_csv(n, out_fp, seed=default_seed, chunksize=1_000_000):
+    '''Writes n simulated patients (all columns) to csv or parquet chunk by chunk, for sizes beyond Excel's row limit.'''
+    return write_chunks(bmi_block, n, out_fp, seed, chunksize)
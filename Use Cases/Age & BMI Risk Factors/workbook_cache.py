@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Cached Workbook Loader
+Written: 10/18/2026
+Updated: 10/18/2026
+
+Loads every sheet of an Excel workbook in one pass (sheet_name=None, with the
+calamine engine when python-calamine is installed) instead of re-opening and
+re-parsing the workbook once per sheet. The parsed sheets are kept in a
+sidecar cache of Feather (or Parquet) files keyed by the workbook's content
+hash, so a re-run with unchanged inputs skips Excel parsing altogether.
+
+The manifest records each workbook's size and mtime. While those match, the
+cached sheets are used without re-hashing the file. When they change, the
+file is hashed again, and a touched but otherwise identical workbook still
+hits the cache. Each load is timed in `load_times`.
+
+    sheets = load_workbook('BMI_Data.xlsx')
+    sheets['HeightWeight'], sheets['Contact Info']
+    load_report()
+"""
+
+# Modules
+
+import pandas as pd
+import hashlib, json, os, time
+
+# The calamine engine (pip install python-calamine) reads .xlsx files about 10x faster than openpyxl
+try:
+    import python_calamine
+    excel_engine = 'calamine'
+except ImportError:
+    excel_engine = None
+
+
+default_cache_dir = '.workbook_cache'
+
+# One record per load_workbook call: file, source (memory, cache or excel) and seconds
+load_times = []
+
+# Workbooks already loaded by this process, {path: (size, mtime, sheets)}
+_loaded = {}
+
+
+def file_hash(fp, chunk_size=1 << 20):
+    '''SHA-1 of a file's contents.'''
+    h = hashlib.sha1()
+    with open(fp, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _read_manifest(cache_dir):
+    fp = os.path.join(cache_dir, 'manifest.json')
+    if not os.path.isfile(fp):
+        return {}
+    try:
+        with open(fp) as f:
+            return json.load(f)
+    except ValueError: # a corrupt manifest only costs a re-parse
+        return {}
+
+
+def _write_manifest(cache_dir, manifest):
+    tmp = os.path.join(cache_dir, 'manifest.json.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, os.path.join(cache_dir, 'manifest.json'))
+
+
+def _read_cached(cache_dir, entry, fmt):
+    folder = os.path.join(cache_dir, entry['hash'])
+    read = pd.read_feather if fmt == 'feather' else pd.read_parquet
+    return {name:read(os.path.join(folder, '%d.%s' % (k, fmt))) for k, name in enumerate(entry['sheets'])}
+
+
+def _write_cached(cache_dir, digest, sheets, fmt):
+    '''Writes the parsed sheets, returning False when a sheet can't be stored (e.g. mixed-type columns).'''
+    folder = os.path.join(cache_dir, digest)
+    os.makedirs(folder, exist_ok=True)
+    try:
+        for k, df in enumerate(sheets.values()):
+            df = df.set_axis([str(c) for c in df.columns], axis=1).reset_index(drop=True)
+            if fmt == 'feather':
+                df.to_feather(os.path.join(folder, '%d.%s' % (k, fmt)))
+            else:
+                df.to_parquet(os.path.join(folder, '%d.%s' % (k, fmt)), index=False)
+    except Exception:
+        return False
+    return True
+
+
+def load_workbook(fp, cache_dir=default_cache_dir, engine=excel_engine, fmt='feather'):
+    '''
+    All sheets of a workbook as {sheet name: data frame}, from this process's
+    memory, the sidecar cache or (when neither holds the current file) Excel.
+    `cache_dir=None` disables the sidecar cache.
+    '''
+    start = time.perf_counter()
+    path = os.path.abspath(fp)
+    stat = os.stat(path)
+    size, mtime = stat.st_size, stat.st_mtime_ns
+
+    source = 'memory'
+    loaded = _loaded.get(path)
+    if loaded is not None and loaded[:2] == (size, mtime):
+        sheets = loaded[2]
+    else:
+        sheets = None
+        manifest = _read_manifest(cache_dir) if cache_dir else {}
+        entry = manifest.get(path)
+        if entry is not None and entry.get('fmt') != fmt:
+            entry = None
+
+        # A changed size or mtime means re-hashing, but an unchanged hash still uses the cache
+        digest = None
+        if entry is not None and (entry['size'], entry['mtime']) != (size, mtime):
+            digest = file_hash(path)
+            entry = dict(entry, size=size, mtime=mtime) if entry['hash'] == digest else None
+
+        if entry is not None:
+            try:
+                sheets = _read_cached(cache_dir, entry, fmt)
+                source = 'cache'
+            except (OSError, ValueError): # cache files removed or damaged
+                sheets = None
+
+        if sheets is None:
+            sheets = pd.read_excel(path, sheet_name=None, engine=engine)
+            source = 'excel'
+            if cache_dir:
+                digest = digest or file_hash(path)
+                if _write_cached(cache_dir, digest, sheets, fmt):
+                    entry = {'hash':digest, 'size':size, 'mtime':mtime, 'fmt':fmt, 'sheets':list(sheets)}
+                else:
+                    entry = None
+        if cache_dir and entry is not None and manifest.get(path) != entry:
+            manifest = _read_manifest(cache_dir)
+            manifest[path] = entry
+            _write_manifest(cache_dir, manifest)
+        _loaded[path] = (size, mtime, sheets)
+
+    load_times.append({'File':fp, 'Source':source, 'Seconds':time.perf_counter() - start})
+    # Shallow copies, so a caller adding columns doesn't change what later calls get
+    return {name:df.copy(deep=False) for name, df in sheets.items()}
+
+
+def load_report():
+    '''The recorded load times as a data frame.'''
+    return pd.DataFrame(load_times, columns=['File', 'Source', 'Seconds'])
@@ -2,7 +2,7 @@
 """
 FAERS Use Case Check Script
 Written: 12/23/2020
-Updated: 12/23/2020
+Updated: 10/18/2026
 @author: Dominic DiSanto
 """
 
@@ -12,10 +12,14 @@ import pandas as pd
 #import numpy as np 
 import os.path 
 
+# The checks themselves live in faers_grading.py, which also grades a whole directory of submissions at once
+# (python faers_grading.py submissions/ --out graded/)
+from faers_grading import load_solution, read_submission, check_submission, solution_output
+
 print('Solution script executing...')
 
-# Importing solution csv from GitHub 
-solution_df = pd.read_csv(r'https://raw.githubusercontent.com/domdisanto/Python_OER_Private/main/Rahim_FAERS/Instructor%20Materials/FAERS_Solution.csv?token=AIJQKGBBHOJHSF6MIPFKLT274UDOC')
+# Importing solution csv from GitHub (downloaded on the first run only, then read from the local copy)
+solution_df = load_solution()
 
 
 # Identifying student submission filepaths
@@ -34,31 +38,8 @@ data = filepath + python_sub_fp
 
 # Creating a function to chek student submissions across solution data frame
 def solution_check(data):
-    # Importing python file
-    student_sub = pd.read_excel(data)
-    
-    # Checking if index is present and deleting if so:
-    if 'Unnamed: 0' in student_sub.columns:
-        index_bool = True
-        del student_sub['Unnamed: 0']
-    else:
-        index_bool = False
-        
-    if set(student_sub['prod_ai']) == set(solution_df['prod_ai']):
-        meds_message = "Medications correctly identified!"
-    elif len(set(student_sub['prod_ai'])) > len(set(solution_df['prod_ai'])):
-        meds_message = 'You\'ved identified more meds than the list in the solution. See the medications tab and compare those in your final data set to the solution list'
-    elif len(set(student_sub['prod_ai'])) > len(set(solution_df['prod_ai'])):
-        meds_message = 'You\'ved identified fewer meds than the list in the solution. See the medications tab and compare those in your final data set to the solution list'
-    else:
-        meds_message = 'You\'ve identified some meds incorrectly and/or omitted some in comparison to the solution list. See the medications tab and compare those in your final data set to the solution list'
-        
-    if index_bool == True:
-        index_note = 'In your notebok, when exporting your data, you specified the option (index=True) or otherwise did not change the default behavior of the to_excel() function. This is okay! But you should be aware of the option and the difference between data imported with and without the reatined index'
-        output_list = [student_sub.shape[0], student_sub.shape[1], index_note, meds_message]
-    else:
-        output_list = [student_sub.shape[0], student_sub.shape[1], '', meds_message]
-    return(output_list) 
+    # Importing the submission and comparing it with the solution
+    return(check_submission(read_submission(data), solution_df))
     
     
 # Creating a solutions vector     
@@ -66,8 +47,7 @@ correct_list = [solution_df.shape[0], solution_df.shape[1], '']
 
 
 # and initializing a data frame to export 
-output_df = pd.DataFrame({'Row Names':['Number of Rows', 'Number of Columns', 'Index Note', 'Medication Note'],
-                          'Solution Characteristics':[solution_df.shape[0], solution_df.shape[1], '', '']})
+output_df = solution_output(solution_df)
 
 # Checking Python submission
 if os.path.isfile(filepath + python_sub_fp):
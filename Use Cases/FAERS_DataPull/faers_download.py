@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+FAERS Quarterly Data Download
+Written: 10/18/2026
+Updated: 10/18/2026
+
+Downloads the FDA's quarterly FAERS ASCII zip files into a local cache rather
+than holding each one in memory (as faers_phenytoin_extract does with
+requests.get + io.BytesIO). Quarters are fetched concurrently by a bounded
+thread pool, each zip is streamed straight to disk, and a partial download is
+resumed with an HTTP Range request on the next run.
+
+Cached files are content addressed: the file name combines the quarter with a
+hash of the server's ETag and size, and cache_index.json maps each quarter to
+its current file (an earlier version's file is removed once the new one is in
+place). Once a quarter is cached it is served without touching the network
+when offline=True (or when the server can't be reached).
+
+A quarter that fails doesn't stop the others: fetch_quarters returns the
+paths of the quarters fetched and the exception of each that failed.
+
+    paths, errors = fetch_quarters(fiscal_year_quarters(2019), workers=4)
+    zipfile.ZipFile(paths['2019Q1'])
+"""
+
+# Modules
+
+import requests
+import glob, hashlib, json, os, threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+base_url = 'https://fis.fda.gov/content/Exports/'
+
+default_cache_dir = os.path.join(os.path.expanduser('~'), '.cache', 'faers')
+
+_index_lock = threading.Lock()
+
+
+def quarter_url(quarter, base_url=base_url):
+    '''URL of a quarter's ASCII zip, e.g. quarter_url('2020Q3').'''
+    return base_url + 'faers_ascii_%s.zip' % quarter
+
+
+def fiscal_year_quarters(fy):
+    '''The calendar quarters of a federal fiscal year (10/1 of the prior year to 9/30).'''
+    return ['%dQ4' % (fy - 1), '%dQ1' % fy, '%dQ2' % fy, '%dQ3' % fy]
+
+
+def _read_index(cache_dir):
+    fp = os.path.join(cache_dir, 'cache_index.json')
+    if not os.path.isfile(fp):
+        return {}
+    with open(fp) as f:
+        return json.load(f)
+
+
+def _update_index(cache_dir, quarter, entry):
+    '''Points a quarter's index entry at its new file and removes the quarter's other files (earlier versions).'''
+    with _index_lock:
+        index = _read_index(cache_dir)
+        index[quarter] = entry
+        tmp = os.path.join(cache_dir, 'cache_index.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(index, f, indent=1, sort_keys=True)
+        os.replace(tmp, os.path.join(cache_dir, 'cache_index.json'))
+        for fp in glob.glob(os.path.join(cache_dir, 'faers_ascii_%s-*.zip*' % quarter)):
+            if os.path.basename(fp) != entry['file']:
+                os.remove(fp)
+
+
+def cached_quarter(quarter, cache_dir=default_cache_dir):
+    '''Path of a quarter's cached zip, or None if it hasn't been downloaded.'''
+    entry = _read_index(cache_dir).get(quarter)
+    if entry is None:
+        return None
+    fp = os.path.join(cache_dir, entry['file'])
+    return fp if os.path.isfile(fp) else None
+
+
+def fetch_quarter(quarter, cache_dir=default_cache_dir, session=None, base_url=base_url, offline=False,
+                  chunk_size=1 << 20, timeout=60):
+    '''
+    Returns the local path of a quarter's zip, downloading it only when the
+    cache has no copy matching the server's current ETag and size.
+    '''
+    os.makedirs(cache_dir, exist_ok=True)
+    cached = cached_quarter(quarter, cache_dir)
+    if offline:
+        if cached is None:
+            raise FileNotFoundError('FAERS %s is not in the cache (%s) and offline=True' % (quarter, cache_dir))
+        return cached
+
+    session = session or requests.Session()
+    url = quarter_url(quarter, base_url)
+    try:
+        head = session.head(url, allow_redirects=True, timeout=timeout)
+        head.raise_for_status()
+    except requests.RequestException:
+        if cached is not None:
+            return cached
+        raise
+
+    etag = head.headers.get('ETag', '')
+    size = int(head.headers.get('Content-Length', -1))
+    key = hashlib.sha1(('%s|%s|%d' % (quarter, etag, size)).encode()).hexdigest()[:16]
+    fp = os.path.join(cache_dir, 'faers_ascii_%s-%s.zip' % (quarter, key))
+    if os.path.isfile(fp):
+        return fp
+
+    # Streaming to a .part file, resuming from its current size when the server honours the Range request. A part
+    # already at full size (e.g. a run stopped before promoting it) is promoted without a request
+    part = fp + '.part'
+    have = os.path.getsize(part) if os.path.isfile(part) else 0
+    if size >= 0 and have > size:
+        have = 0 # not a prefix of the current file, start over
+    if not (size >= 0 and have == size):
+        headers = {}
+        if have:
+            headers['Range'] = 'bytes=%d-' % have
+            if etag:
+                headers['If-Range'] = etag
+
+        with session.get(url, headers=headers, stream=True, timeout=timeout) as resp:
+            # 416 means nothing follows the `have` bytes: the part is complete when its size matches (or there is
+            # no size to check), else it doesn't match the server's file and is dropped so the next run starts over
+            complete = have and resp.status_code == 416 and (size < 0 or have == size)
+            if not complete:
+                if resp.status_code == 416:
+                    os.remove(part)
+                resp.raise_for_status()
+                mode = 'ab' if have and resp.status_code == 206 else 'wb'
+                with open(part, mode) as f:
+                    for chunk in resp.iter_content(chunk_size=chunk_size):
+                        f.write(chunk)
+
+    if size >= 0 and os.path.getsize(part) != size:
+        raise IOError('Incomplete download of FAERS %s (%d of %d bytes), rerun to resume'
+                      % (quarter, os.path.getsize(part), size))
+    os.replace(part, fp)
+    _update_index(cache_dir, quarter, {'file':os.path.basename(fp), 'url':url, 'etag':etag, 'size':size})
+    return fp
+
+
+def fetch_quarters(quarters, cache_dir=default_cache_dir, workers=4, base_url=base_url, offline=False):
+    '''
+    Fetches several quarters with at most `workers` concurrent downloads.
+    Returns ({quarter: local zip path} of the quarters fetched, {quarter:
+    exception} of those that failed), so one failure doesn't lose the rest.
+    '''
+    quarters = list(quarters)
+    paths, errors = {}, {}
+    with requests.Session() as session:
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {q:pool.submit(fetch_quarter, q, cache_dir, session, base_url, offline) for q in quarters}
+            for quarter, future in futures.items():
+                try:
+                    paths[quarter] = future.result()
+                except Exception as e:
+                    errors[quarter] = e
+    return paths, errors
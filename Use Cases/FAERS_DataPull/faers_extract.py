@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+FAERS Streaming Extract
+Written: 10/18/2026
+Updated: 10/18/2026
+
+Chunked replacement for the read-everything-then-filter steps of
+faers_phenytoin_extract. A quarter's DRUG table is read straight out of its zip
+file in chunks, loading only the needed columns with explicit dtypes. Each
+chunk is filtered against a compiled, case-insensitive pattern list covering
+any number of ingredients, and only the matching rows are yielded. Each
+distinct prod_ai string is matched only once across all chunks, so the regex
+work scales with the vocabulary rather than the row count.
+
+    for chunk in iter_ingredient_rows('faers_ascii_2020Q3.zip', ['phenytoin', 'fosphenytoin']):
+        ...
+    fy19 = extract_ingredients(fetch_quarters(fiscal_year_quarters(2019))[0], ['phenytoin'])
+"""
+
+# Modules
+
+import pandas as pd
+import numpy as np
+import csv, re, zipfile
+from collections import defaultdict
+
+
+# Columns and dtypes of the DRUG table read by default (pass columns=None to keep all columns)
+drug_dtypes = {'primaryid':np.int64,
+               'caseid':np.int64,
+               'drug_seq':np.int32,
+               'role_cod':'category',
+               'drugname':'string',
+               'prod_ai':'string'}
+
+drug_columns = list(drug_dtypes)
+
+
+def table_member(zf, table='DRUG'):
+    '''Name of a quarter's ASCII table (e.g. ascii/DRUG20Q3.txt) within its zip file.'''
+    pattern = re.compile(r'(^|/)%s\d{2}Q\d\.txt$' % table, re.I)
+    for name in zf.namelist():
+        if pattern.search(name):
+            return name
+    raise KeyError('No %s table found in zip file' % table)
+
+
+def ingredient_pattern(ingredients, regex=False):
+    '''
+    Compiles a case-insensitive pattern with one named group per ingredient, so
+    a match also tells which ingredient it was.
+    '''
+    parts = [p if regex else re.escape(p) for p in ingredients]
+    return re.compile('|'.join('(?P<i%d>%s)' % (k, p) for k, p in enumerate(parts)), re.I)
+
+
+def iter_table(zip_fp, table='DRUG', columns=drug_columns, dtypes=drug_dtypes, chunksize=500000):
+    '''
+    Reads a quarter's `table` from its zip file in chunks of `chunksize` rows,
+    keeping only `columns` (all columns when None).
+    '''
+    with zipfile.ZipFile(zip_fp) as zf:
+        with zf.open(table_member(zf, table)) as f:
+            # Declared dtypes apply in either case, undeclared columns are read as strings
+            dtype = defaultdict(lambda: str, {case(c):t for c, t in dtypes.items()
+                                              if columns is None or c in columns
+                                              for case in (str.lower, str.upper)})
+            usecols = None if columns is None else (lambda col: col.lower() in columns)
+            reader = pd.read_csv(f, sep='$', usecols=usecols, dtype=dtype, index_col=False,
+                                 quoting=csv.QUOTE_NONE, encoding='latin-1', chunksize=chunksize)
+            for chunk in reader:
+                chunk.columns = chunk.columns.str.lower()
+                yield chunk
+
+
+def iter_ingredient_rows(zip_fp, ingredients=('phenytoin',), columns=drug_columns, regex=False, chunksize=500000,
+                         field='prod_ai'):
+    '''
+    Yields the DRUG rows of one quarter whose `field` (prod_ai by default)
+    mentions any of `ingredients`, chunk by chunk, with an `ingredient` column
+    naming the ingredient matched.
+    '''
+    ingredients = list(ingredients)
+    pattern = ingredient_pattern(ingredients, regex)
+    if columns is not None and field not in columns:
+        columns = list(columns) + [field]
+    dtypes = dict(drug_dtypes, **{field:'category'}) # each chunk arrives already factorized
+    seen = {}
+
+    for chunk in iter_table(zip_fp, 'DRUG', columns, dtypes, chunksize):
+        values = chunk[field].cat
+        for u in values.categories:
+            if u not in seen:
+                m = pattern.search(u)
+                seen[u] = int(m.lastgroup[1:]) if m else -1
+        lookup = np.array([seen[u] for u in values.categories] + [-1], dtype=np.int64) # code -1 is NA
+        matched = lookup[values.codes.to_numpy()]
+
+        keep = matched >= 0
+        if keep.any():
+            out = chunk[keep].copy()
+            out[field] = out[field].astype(drug_dtypes.get(field, 'string'))
+            out['ingredient'] = pd.Categorical.from_codes(matched[keep], categories=ingredients)
+            yield out
+
+
+def extract_ingredients(zip_fps, ingredients=('phenytoin',), columns=drug_columns, regex=False, chunksize=500000):
+    '''
+    Matching DRUG rows over several quarters, e.g. the {quarter: path} paths
+    returned by faers_download.fetch_quarters. Adds a `quarter` column when
+    given a dict.
+    '''
+    items = zip_fps.items() if isinstance(zip_fps, dict) else ((None, fp) for fp in zip_fps)
+    parts = []
+    for quarter, fp in items:
+        for chunk in iter_ingredient_rows(fp, ingredients, columns, regex, chunksize):
+            if quarter is not None:
+                chunk['quarter'] = quarter
+            parts.append(chunk)
+    if not parts:
+        return pd.DataFrame(columns=(columns or []) + ['ingredient'])
+    return pd.concat(parts, ignore_index=True)
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+FAERS Submission Grading
+Written: 10/18/2026
+Updated: 10/18/2026
+
+The checks of FAERS_SolutionCheck.py as importable functions (without that
+script's side effects), plus a batch mode for grading a whole class at once.
+The batch mode scans a directory tree for submissions and loads the solution
+once, sharing it read-only with a pool of worker processes that grade one
+student each. It writes a consolidated results workbook/CSV and each student's
+own Solution_Check_Output.xlsx. A submission that can't be read or checked is
+recorded as an error rather than stopping the run, and each submission's
+grading time is recorded.
+
+    python faers_grading.py submissions/ --out graded/ --workers 8
+
+Submissions are the .xlsx/.csv files named like FY2019_PhenytoinAERS*.xlsx,
+each student's files sitting in their own folder (the folder path relative to
+the submissions directory names the student).
+"""
+
+# Modules
+
+import pandas as pd
+import argparse, fnmatch, os, sys, time, traceback
+from concurrent.futures import ProcessPoolExecutor
+
+# row_diff.py, shared by the use case check scripts, sits in the Use Cases folder
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from row_diff import diff_frames
+
+# The calamine engine (pip install python-calamine) reads .xlsx files about 10x faster than openpyxl
+try:
+    import python_calamine
+    excel_engine = 'calamine'
+except ImportError:
+    excel_engine = None
+
+
+# Solution csv on GitHub (downloaded on the first run only, then read from the local copy)
+solution_url = r'https://raw.githubusercontent.com/domdisanto/Python_OER_Private/main/Rahim_FAERS/Instructor%20Materials/FAERS_Solution.csv?token=AIJQKGBBHOJHSF6MIPFKLT274UDOC'
+
+submission_patterns = ['FY2019_PhenytoinAERS*.xlsx', 'FY2019_PhenytoinAERS*.csv']
+
+output_name = 'Solution_Check_Output.xlsx'
+
+row_names = ['Number of Rows', 'Number of Columns', 'Index Note', 'Medication Note', 'Row Note']
+
+# Identifies a DRUG row, so rows with the same key but different values are reported as changed
+row_key = ['primaryid', 'drug_seq']
+
+# Rows listed per sheet of the missing/extra/changed rows in a student's output
+max_listed_rows = 10000
+
+index_note = 'In your notebok, when exporting your data, you specified the option (index=True) or otherwise did not change the default behavior of the to_excel() function. This is okay! But you should be aware of the option and the difference between data imported with and without the reatined index'
+
+
+def load_solution(url=solution_url, cache_fp='FAERS_Solution.csv'):
+    '''The solution data frame, downloaded to `cache_fp` on the first call only.'''
+    if not os.path.isfile(cache_fp):
+        pd.read_csv(url).to_csv(cache_fp, index=False)
+    return pd.read_csv(cache_fp)
+
+
+def read_submission(fp, engine=excel_engine):
+    '''Reads a submitted .xlsx or .csv file.'''
+    if fp.lower().endswith('.csv'):
+        return pd.read_csv(fp)
+    return pd.read_excel(fp, engine=engine)
+
+
+def submission_type(fp):
+    '''Python, R or General, from the suffix of the submission's file name.'''
+    stem = os.path.splitext(os.path.basename(fp))[0]
+    if stem.endswith('_Python'):
+        return 'Python'
+    if stem.endswith('_R'):
+        return 'R'
+    return 'General'
+
+
+def diff_submission(student_sub, solution_df):
+    '''Row-level differences between a submission and the solution (a row_diff.RowDiff).'''
+    key = [k for k in row_key if k in student_sub.columns and k in solution_df.columns]
+    return diff_frames(student_sub, solution_df, key=key or None)
+
+
+def check_submission(student_sub, solution_df, diff=None):
+    '''
+    Compares a submission with the solution, returning the rows, columns,
+    index note and medication note of the original solution_check, plus a note
+    on the missing, extra and changed rows.
+    '''
+    diff = diff_submission(student_sub, solution_df) if diff is None else diff
+
+    # Checking if index is present and dropping it if so
+    index_bool = 'Unnamed: 0' in student_sub.columns
+    if index_bool:
+        student_sub = student_sub.drop(columns='Unnamed: 0')
+
+    student_meds, solution_meds = set(student_sub['prod_ai']), set(solution_df['prod_ai'])
+    if student_meds == solution_meds:
+        meds_message = "Medications correctly identified!"
+    elif len(student_meds) > len(solution_meds):
+        meds_message = 'You\'ved identified more meds than the list in the solution. See the medications tab and compare those in your final data set to the solution list'
+    elif len(student_meds) < len(solution_meds):
+        meds_message = 'You\'ved identified fewer meds than the list in the solution. See the medications tab and compare those in your final data set to the solution list'
+    else:
+        meds_message = 'You\'ve identified some meds incorrectly and/or omitted some in comparison to the solution list. See the medications tab and compare those in your final data set to the solution list'
+
+    row_message = diff.summary()
+    if not diff.ok:
+        row_message += ' See the missing, extra and changed rows tabs for the rows themselves'
+
+    return [student_sub.shape[0], student_sub.shape[1], index_note if index_bool else '', meds_message, row_message]
+
+
+def solution_output(solution_df):
+    '''The first columns of a Solution_Check_Output.xlsx CheckResults sheet.'''
+    return pd.DataFrame({'Row Names':row_names,
+                         'Solution Characteristics':[solution_df.shape[0], solution_df.shape[1], '', '', '']})
+
+
+def write_output(fp, output_df, solution_df, diffs=None):
+    '''
+    Writes a Solution_Check_Output.xlsx workbook, with the missing, extra and
+    changed rows of each submission in `diffs` ({column name: RowDiff}).
+    '''
+    with pd.ExcelWriter(fp) as writer:
+        output_df.to_excel(writer, sheet_name='CheckResults', index=False)
+        pd.DataFrame(sorted(set(solution_df['prod_ai']), key=str)).to_excel(writer, sheet_name='Medication List',
+                                                                            index=False)
+        for column, diff in (diffs or {}).items():
+            for name, rows in (('Missing', diff.missing), ('Extra', diff.extra), ('Changed', diff.changed)):
+                if len(rows):
+                    rows.head(max_listed_rows).to_excel(writer, sheet_name='%s %s Rows' % (column, name),
+                                                        index=name == 'Changed')
+
+
+def find_submissions(root, patterns=submission_patterns):
+    '''
+    Submissions under `root` grouped by student, {student: [file paths]}, the
+    student being the folder path relative to `root` ('.' for files at the top).
+    '''
+    students = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        files = sorted(f for f in filenames if any(fnmatch.fnmatch(f, p) for p in patterns)
+                       and not f.startswith('~$')) # Excel lock files
+        if files:
+            students[os.path.relpath(dirpath, root)] = [os.path.join(dirpath, f) for f in files]
+    return students
+
+
+# Solution shared by the worker processes, set once per worker by _init_worker
+_solution = None
+
+
+def _init_worker(solution_df):
+    global _solution
+    _solution = solution_df
+
+
+def grade_student(student, files, out_dir=None, solution_df=None):
+    '''
+    Grades one student's submissions, writing their Solution_Check_Output.xlsx
+    under `out_dir` (when given). Returns one result record per submission.
+    '''
+    solution_df = _solution if solution_df is None else solution_df
+    output_df = solution_output(solution_df)
+    diffs = {}
+    records = []
+    for fp in files:
+        start = time.perf_counter()
+        record = {'Student':student, 'File':os.path.basename(fp), 'Submission':submission_type(fp)}
+        try:
+            student_sub = read_submission(fp)
+            diff = diff_submission(student_sub, solution_df)
+            check = check_submission(student_sub, solution_df, diff)
+            record.update(zip(row_names, check), Status='Checked', Error='', Missing=len(diff.missing),
+                          Extra=len(diff.extra), Changed=len(diff.changed))
+            column = record['Submission']
+            while column in output_df.columns: # e.g. both a .csv and an .xlsx General submission
+                column += '*'
+            output_df[column] = check
+            diffs[column] = diff
+        except Exception as e:
+            record.update(Status='Error', Error='%s: %s' % (type(e).__name__, e),
+                          Traceback=traceback.format_exc(limit=3))
+        record['Seconds'] = time.perf_counter() - start
+        records.append(record)
+
+    if out_dir is not None:
+        student_dir = os.path.join(out_dir, student)
+        try:
+            os.makedirs(student_dir, exist_ok=True)
+            write_output(os.path.join(student_dir, output_name), output_df, solution_df, diffs)
+        except Exception as e:
+            for record in records:
+                record['Error'] = (record['Error'] + '; ' if record['Error'] else '') + 'Output not written: %s' % e
+    return records
+
+
+def _grade_student(args):
+    return grade_student(*args)
+
+
+def grade_directory(root, out_dir, solution_df=None, workers=None, patterns=submission_patterns):
+    '''
+    Grades every submission under `root` in a pool of `workers` processes
+    (one process when workers=1). Writes per-student outputs under `out_dir`
+    along with Batch_Check_Results.xlsx / .csv, and returns the results frame.
+    '''
+    solution_df = load_solution() if solution_df is None else solution_df
+    students = find_submissions(root, patterns)
+    tasks = [(student, files, out_dir) for student, files in students.items()]
+
+    start = time.perf_counter()
+    if workers == 1:
+        _init_worker(solution_df)
+        records = [r for task in tasks for r in _grade_student(task)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(solution_df,)) as pool:
+            records = [r for result in pool.map(_grade_student, tasks, chunksize=max(1, len(tasks) // 64))
+                       for r in result]
+    elapsed = time.perf_counter() - start
+
+    results = pd.DataFrame(records, columns=['Student', 'File', 'Submission', 'Status'] + row_names
+                                            + ['Missing', 'Extra', 'Changed', 'Seconds', 'Error', 'Traceback'])
+    os.makedirs(out_dir, exist_ok=True)
+    results.to_csv(os.path.join(out_dir, 'Batch_Check_Results.csv'), index=False)
+    summary = pd.DataFrame({'Item':['Students', 'Submissions', 'Checked', 'Errors', 'Wall Seconds'],
+                            'Value':[len(students), len(results), (results['Status'] == 'Checked').sum(),
+                                     (results['Status'] == 'Error').sum(), round(elapsed, 3)]})
+    with pd.ExcelWriter(os.path.join(out_dir, 'Batch_Check_Results.xlsx')) as writer:
+        results.drop(columns='Traceback').to_excel(writer, sheet_name='Results', index=False)
+        results.loc[results['Status'] == 'Error', ['Student', 'File', 'Error', 'Traceback']].to_excel(
+            writer, sheet_name='Errors', index=False)
+        summary.to_excel(writer, sheet_name='Summary', index=False)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Grade a directory tree of FAERS use case submissions')
+    parser.add_argument('root', help='directory holding one folder of submissions per student')
+    parser.add_argument('--out', default='graded', help='directory for the results and per-student outputs')
+    parser.add_argument('--solution', default='FAERS_Solution.csv', help='local copy of the solution csv')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+    args = parser.parse_args()
+
+    results = grade_directory(args.root, args.out, load_solution(cache_fp=args.solution), args.workers)
+    print('%d submissions from %d students, %d errors, %.2f s grading'
+          % (len(results), results['Student'].nunique(), (results['Status'] == 'Error').sum(),
+             results['Seconds'].sum()))
@@ -0,0 +1,446 @@
+# -*- coding: utf-8 -*-
+"""
+FAERS Parquet Warehouse
+Written: 10/18/2026
+Updated: 10/18/2026
+
+A local columnar copy of the quarterly FAERS ASCII dumps, so questions can be
+asked repeatedly without re-downloading, re-unzipping and re-parsing the raw
+files. Each quarter's DRUG, DEMO and REAC tables are converted once into
+Parquet partitioned by quarter:
+
+    <root>/DRUG/2020Q3.parquet    DRUG rows sorted by active ingredient, then primaryid
+    <root>/DEMO/2020Q3.parquet    sorted by primaryid
+    <root>/REAC/2020Q3.parquet    sorted by primaryid
+    <root>/index/2020Q3.parquet   inverted index of the DRUG file (see below)
+    <root>/manifest.json          quarters ingested, their source file and row counts
+
+The inverted index maps each normalized active ingredient (prod_ai lower cased
+with whitespace collapsed, combination products split on backslashes) to the
+DRUG row groups holding it and their primaryid range. A query reads the index
+for the requested quarters, then only the matching DRUG row groups, and then
+only the DEMO/REAC row groups whose primaryid range overlaps the matches.
+
+Tables are sorted out of core: each chunk the reader yields is sorted and
+spilled to a run file under <root>/runs, and the runs are merged into the
+output a row group at a time (building the index as each DRUG row group is
+written), so ingest holds about one chunk in memory rather than whole tables.
+
+Quarters are ingested independently, so adding a new quarter leaves the
+existing files untouched.
+
+    ingest_quarters(fiscal_years(2015, 2020), root='faers_warehouse')
+    query_drug(['phenytoin'], fiscal_years(2015, 2020), root='faers_warehouse')
+
+or from the command line
+
+    python faers_warehouse.py ingest --fy 2015 2020 --root faers_warehouse
+    python faers_warehouse.py query phenytoin --fy 2015 2020 --root faers_warehouse --out phenytoin.csv
+
+Adding --fuzzy (or passing a med_names.MedicationNormalizer as `normalizer`)
+also matches misspelled and salt-suffixed ingredient names.
+"""
+
+# Modules
+
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import argparse, json, os, shutil, sys, time
+
+from faers_download import default_cache_dir, fiscal_year_quarters, fetch_quarters
+from faers_extract import drug_dtypes, iter_table
+
+# The shared medication name normalizer sits one folder up, in Use Cases
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from med_names import MedicationNormalizer
+
+
+default_root = 'faers_warehouse'
+
+# Declared dtypes per table, any other column is kept as a string
+table_dtypes = {'DRUG':drug_dtypes,
+                'DEMO':{'primaryid':np.int64, 'caseid':np.int64, 'sex':'category', 'age_cod':'category'},
+                'REAC':{'primaryid':np.int64, 'caseid':np.int64, 'pt':'string'}}
+
+row_group_size = 16384
+chunksize = 500000
+
+# Columns each table is sorted by, '_key' being the DRUG row's normalized prod_ai ('' when missing)
+sort_columns = {'DRUG':['_key', 'primaryid'], 'DEMO':['primaryid'], 'REAC':['primaryid']}
+
+
+def fiscal_years(first, last):
+    '''The calendar quarters of federal fiscal years `first` through `last`, e.g. fiscal_years(2015, 2020).'''
+    return [q for fy in range(first, last + 1) for q in fiscal_year_quarters(fy)]
+
+
+def normalize_ingredient(values):
+    '''
+    Normalized prod_ai strings: lower case, surrounding whitespace removed and
+    internal whitespace collapsed. Returns a string Series aligned with `values`.
+    '''
+    return pd.Series(values, dtype='string').str.strip().str.lower().str.replace(r'\s+', ' ', regex=True)
+
+
+def split_ingredients(values):
+    '''
+    Splits normalized prod_ai values into their active ingredients (combination
+    products list them separated by backslashes). Returns the position of each
+    ingredient's source value and the ingredient.
+    '''
+    parts = pd.Series(values, dtype='string').str.split('\\', regex=False).explode()
+    parts = parts.str.strip()
+    keep = parts.notna() & (parts != '')
+    return parts.index.to_numpy()[keep.to_numpy()], parts[keep].to_numpy(dtype=object)
+
+
+def _has_ingredient(prod_ai, keys):
+    '''Boolean mask of the prod_ai values listing any of the normalized ingredients `keys`.'''
+    codes, uniques = pd.factorize(prod_ai)
+    row, ingredient = split_ingredients(normalize_ingredient(pd.Series(np.asarray(uniques, dtype=object))))
+    hit = np.zeros(len(uniques) + 1, dtype=bool) # the extra False entry is picked up by NA's code of -1
+    hit[row[pd.Series(ingredient).isin(keys).to_numpy()]] = True
+    return hit[codes]
+
+
+def _read_manifest(root):
+    fp = os.path.join(root, 'manifest.json')
+    if not os.path.isfile(fp):
+        return {}
+    with open(fp) as f:
+        return json.load(f)
+
+
+def _write_atomic(table, fp, **kwargs):
+    os.makedirs(os.path.dirname(fp), exist_ok=True)
+    pq.write_table(table, fp + '.tmp', **kwargs)
+    os.replace(fp + '.tmp', fp)
+
+
+def ingested_quarters(root=default_root):
+    '''Quarters already in the warehouse.'''
+    return sorted(_read_manifest(root))
+
+
+def _concat(frames):
+    '''pd.concat of frames whose categorical columns may have different categories (kept categorical).'''
+    frames = [f for f in frames if len(f)] or frames[:1]
+    for col in [c for c in frames[0].columns if isinstance(frames[0][c].dtype, pd.CategoricalDtype)]:
+        categories = pd.api.types.union_categoricals([f[col] for f in frames]).categories
+        frames = [f.assign(**{col:f[col].cat.set_categories(categories)}) for f in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _write_runs(zip_fp, table, run_dir, chunksize=chunksize):
+    '''Writes each chunk of a quarter's `table`, sorted by sort_columns, to a run file in `run_dir`. Returns them.'''
+    os.makedirs(run_dir, exist_ok=True)
+    runs = []
+    for chunk in iter_table(zip_fp, table, columns=None, dtypes=table_dtypes[table], chunksize=chunksize):
+        if table == 'DRUG':
+            chunk['_key'] = normalize_ingredient(chunk['prod_ai']).fillna('')
+        chunk = chunk.sort_values(sort_columns[table], kind='stable')
+        runs.append(os.path.join(run_dir, '%s-%05d.parquet' % (table, len(runs))))
+        pq.write_table(pa.Table.from_pandas(chunk, preserve_index=False), runs[-1])
+    return runs
+
+
+def _merge_runs(runs, by, batch_rows):
+    '''
+    Yields the rows of sorted run files in `by` order (ties in run order, so
+    the result is a stable sort of the runs concatenated), reading
+    `batch_rows` rows of each run at a time.
+    '''
+    batches = [pq.ParquetFile(fp).iter_batches(batch_size=batch_rows) for fp in runs]
+    buffers = [None] * len(runs) # None once a run is used up
+    pending = list(range(len(runs)))
+    while True:
+        for k in pending:
+            batch = next(batches[k], None)
+            buffers[k] = None if batch is None else batch.to_pandas()
+        live = [k for k, buf in enumerate(buffers) if buf is not None]
+        if not live:
+            return
+
+        # Rows below the smallest last key of the runs' buffers can't be preceded by a row yet to be read. Rows equal
+        # to it wait in the runs after the first one ending on it, whose next batch may hold more of them.
+        last = [tuple(buffers[k][c].iat[-1] for c in by) for k in live]
+        bound = min(last)
+        first = live[last.index(bound)]
+        parts, pending = [], []
+        for k in live:
+            below, equal = np.zeros(len(buffers[k]), dtype=bool), np.ones(len(buffers[k]), dtype=bool)
+            for c, b in zip(by, bound):
+                values = buffers[k][c].to_numpy()
+                below |= equal & (values < b)
+                equal &= values == b
+            n = int((below | equal).sum() if k <= first else below.sum()) # a prefix, the run being sorted
+            parts.append(buffers[k].iloc[:n])
+            buffers[k] = buffers[k].iloc[n:]
+            if not len(buffers[k]):
+                pending.append(k)
+        yield _concat(parts).sort_values(by, kind='stable', ignore_index=True)
+
+
+def _write_sorted(frames, fp, row_group_size=row_group_size, drop=(), on_group=None):
+    '''
+    Writes a sequence of frames to one Parquet file (atomically) in row
+    groups of exactly `row_group_size` rows, the last one shorter, without
+    the `drop` columns. on_group(number, frame), when given, is called with
+    each row group before its columns are dropped. Returns the rows written.
+    '''
+    os.makedirs(os.path.dirname(fp), exist_ok=True)
+    writer, rows, group, pending = None, 0, 0, None
+    try:
+        for frame in frames:
+            pending = frame if pending is None else _concat([pending, frame])
+            while len(pending) >= row_group_size:
+                writer = _write_group(writer, fp, pending.iloc[:row_group_size], group, drop, on_group)
+                pending, rows, group = pending.iloc[row_group_size:], rows + row_group_size, group + 1
+        if pending is not None and (len(pending) or writer is None):
+            writer = _write_group(writer, fp, pending, group, drop, on_group)
+            rows += len(pending)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None: # no frames at all
+        pq.write_table(pa.table({}), fp + '.tmp')
+    os.replace(fp + '.tmp', fp)
+    return rows
+
+
+def _write_group(writer, fp, frame, group, drop, on_group):
+    '''Writes one row group, opening the writer on the first (with dictionary indices widened to int32).'''
+    if on_group is not None and len(frame):
+        on_group(group, frame)
+    table = pa.Table.from_pandas(frame.drop(columns=list(drop)), preserve_index=False)
+    if writer is None:
+        schema = pa.schema([pa.field(f.name, pa.dictionary(pa.int32(), f.type.value_type))
+                            if pa.types.is_dictionary(f.type) else f for f in table.schema],
+                           metadata=table.schema.metadata)
+        writer = pq.ParquetWriter(fp + '.tmp', schema)
+    writer.write_table(table.cast(writer.schema), row_group_size=len(frame) or None)
+    return writer
+
+
+def _sort_table(zip_fp, table, fp, run_dir, chunksize=chunksize, row_group_size=row_group_size, on_group=None):
+    '''Sorts a quarter's `table` by sort_columns out of core into `fp`. Returns the number of rows.'''
+    runs = _write_runs(zip_fp, table, run_dir, chunksize)
+    batch_rows = max(4096, chunksize // max(len(runs), 1))
+    extra = [c for c in sort_columns[table] if c.startswith('_')]
+    return _write_sorted(_merge_runs(runs, sort_columns[table], batch_rows), fp, row_group_size, extra, on_group)
+
+
+def ingest_quarter(zip_fp, quarter, root=default_root, row_group_size=row_group_size, chunksize=chunksize):
+    '''
+    Converts one quarter's zip file into the warehouse, replacing any earlier
+    copy of that quarter only, reading `chunksize` rows at a time. Returns the
+    quarter's manifest entry.
+    '''
+    entry = {'source':os.path.basename(zip_fp), 'tables':{}}
+    run_dir = os.path.join(root, 'runs', quarter)
+
+    # DRUG, clustered by ingredient so each ingredient lands in as few row groups as possible, with the inverted
+    # index: one row per (ingredient, row group) with its primaryid range
+    index = []
+
+    def index_group(group, frame):
+        codes, uniques = pd.factorize(frame['_key'])
+        row, ingredient = split_ingredients(pd.Series(np.asarray(uniques, dtype=object)))
+        value_ingredient = pd.DataFrame({'code':row, 'ingredient':ingredient})
+        rows = pd.DataFrame({'code':codes, 'primaryid':frame['primaryid'].to_numpy()}).merge(value_ingredient,
+                                                                                           on='code')
+        index.append(rows.groupby('ingredient', sort=False)['primaryid']
+                         .agg(min_primaryid='min', max_primaryid='max', rows='size')
+                         .reset_index().assign(row_group=np.int32(group)))
+
+    try:
+        entry['tables']['DRUG'] = _sort_table(zip_fp, 'DRUG', os.path.join(root, 'DRUG', quarter + '.parquet'),
+                                              run_dir, chunksize, row_group_size, index_group)
+        if index:
+            index = pd.concat(index, ignore_index=True).sort_values(['ingredient', 'row_group'], ignore_index=True)
+        else:
+            index = pd.DataFrame({'ingredient':pd.Series(dtype=object), 'row_group':pd.Series(dtype=np.int32),
+                                  'min_primaryid':pd.Series(dtype=np.int64), 'max_primaryid':pd.Series(dtype=np.int64),
+                                  'rows':pd.Series(dtype=np.int64)})
+        index = index[['ingredient', 'row_group', 'min_primaryid', 'max_primaryid', 'rows']]
+        _write_atomic(pa.Table.from_pandas(index, preserve_index=False),
+                      os.path.join(root, 'index', quarter + '.parquet'))
+
+        # DEMO and REAC, sorted by primaryid so row group statistics prune the report joins
+        for table in ('DEMO', 'REAC'):
+            entry['tables'][table] = _sort_table(zip_fp, table, os.path.join(root, table, quarter + '.parquet'),
+                                                 run_dir, chunksize, row_group_size)
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+        if os.path.isdir(os.path.join(root, 'runs')) and not os.listdir(os.path.join(root, 'runs')):
+            os.rmdir(os.path.join(root, 'runs'))
+
+    entry['ingested'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    manifest = _read_manifest(root)
+    manifest[quarter] = entry
+    with open(os.path.join(root, 'manifest.json.tmp'), 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(os.path.join(root, 'manifest.json.tmp'), os.path.join(root, 'manifest.json'))
+    return entry
+
+
+def ingest_quarters(quarters, root=default_root, cache_dir=default_cache_dir, workers=4, offline=False, force=False,
+                    chunksize=chunksize):
+    '''
+    Downloads (via faers_download's cache) and ingests every quarter not yet in
+    the warehouse, `chunksize` rows at a time. `force` re-ingests quarters
+    already present. Quarters that fail to download are skipped, the others
+    ingested, and then an IOError naming them is raised.
+    '''
+    done = set(ingested_quarters(root))
+    todo = [q for q in quarters if force or q not in done]
+    if not todo:
+        return {}
+    paths, errors = fetch_quarters(todo, cache_dir, workers=workers, offline=offline)
+    entries = {q:ingest_quarter(paths[q], q, root, chunksize=chunksize) for q in todo if q in paths}
+    if errors:
+        failed = '; '.join('%s: %s' % (q, e) for q, e in sorted(errors.items()))
+        raise IOError('FAERS quarters could not be downloaded (%s ingested), rerun to retry: %s'
+                      % (', '.join(sorted(entries)) or 'none', failed)) from next(iter(errors.values()))
+    return entries
+
+
+def read_index(quarters=None, root=default_root):
+    '''The inverted index of the given quarters (all ingested quarters when None), with a quarter column.'''
+    available = ingested_quarters(root)
+    quarters = available if quarters is None else [q for q in quarters if q in available]
+    if not quarters:
+        return pd.DataFrame(columns=['quarter', 'ingredient', 'row_group', 'min_primaryid', 'max_primaryid', 'rows'])
+    parts = [pq.read_table(os.path.join(root, 'index', q + '.parquet')).to_pandas().assign(quarter=q)
+             for q in quarters]
+    return pd.concat(parts, ignore_index=True)
+
+
+def match_ingredients(ingredients, index, contains=False, normalizer=None):
+    '''
+    The index rows of the requested ingredients, matched exactly after
+    normalization or, with contains=True, as substrings (as the notebook's
+    'phenytoin' in prod_ai test does, which also picks up fosphenytoin).
+
+    With a med_names.MedicationNormalizer, index ingredients it resolves to a
+    requested ingredient also match, e.g. misspelled or salt-suffixed prod_ai
+    values such as 'phenytion' or 'phenytoin sodium'.
+    '''
+    terms = list(normalize_ingredient(pd.Series(list(ingredients))))
+    names = index['ingredient'].astype('string')
+    vocab = names.dropna().unique()
+    if contains:
+        keys = {v for v in vocab if any(t in v for t in terms)}
+    else:
+        keys = set(terms)
+    if normalizer is not None:
+        wanted = {normalizer.normalize(t) or t for t in terms}
+        keys |= {v for v in vocab if wanted.intersection(normalizer.ingredients(v))}
+    return index[names.isin(keys).to_numpy()], keys
+
+
+def query_drug(ingredients, quarters=None, root=default_root, columns=None, contains=False, normalizer=None):
+    '''
+    DRUG rows of the requested active ingredients over `quarters`, reading only
+    the row groups the inverted index points to. Adds a quarter column.
+    '''
+    hits, keys = match_ingredients(ingredients, read_index(quarters, root), contains, normalizer)
+    parts = []
+    for quarter, groups in hits.groupby('quarter', sort=True)['row_group']:
+        pf = pq.ParquetFile(os.path.join(root, 'DRUG', quarter + '.parquet'))
+        cols = None if columns is None else list(dict.fromkeys(list(columns) + ['prod_ai']))
+        df = pf.read_row_groups(sorted(groups.unique()), columns=cols).to_pandas()
+
+        df = df[_has_ingredient(df['prod_ai'], keys)]
+        if columns is not None:
+            df = df[list(columns)]
+        parts.append(df.assign(quarter=quarter))
+    if not parts:
+        return pd.DataFrame(columns=(list(columns) if columns is not None else []) + ['quarter'])
+    return pd.concat(parts, ignore_index=True)
+
+
+def read_reports(table, primaryids, quarters, root=default_root, columns=None):
+    '''
+    DEMO or REAC rows of the given primaryids, reading only the row groups whose
+    primaryid statistics could contain them. `quarters` is a quarter per id.
+    '''
+    primaryids = np.asarray(primaryids, dtype=np.int64)
+    quarters = np.asarray(quarters)
+    parts = []
+    for quarter in np.unique(quarters):
+        ids = np.unique(primaryids[quarters == quarter])
+        pf = pq.ParquetFile(os.path.join(root, table, quarter + '.parquet'))
+        col = pf.schema_arrow.get_field_index('primaryid')
+        groups = []
+        for g in range(pf.metadata.num_row_groups):
+            stats = pf.metadata.row_group(g).column(col).statistics
+            if stats is None or not stats.has_min_max:
+                groups.append(g)
+                continue
+            if np.searchsorted(ids, stats.max, side='right') > np.searchsorted(ids, stats.min, side='left'):
+                groups.append(g)
+        if not groups:
+            continue
+        df = pf.read_row_groups(groups, columns=columns).to_pandas()
+        parts.append(df[df['primaryid'].isin(ids)].assign(quarter=quarter))
+    if not parts:
+        return pd.DataFrame(columns=(list(columns) if columns is not None else ['primaryid']) + ['quarter'])
+    return pd.concat(parts, ignore_index=True)
+
+
+def query_reports(ingredients, quarters=None, root=default_root, contains=False, normalizer=None):
+    '''
+    The DRUG rows of the requested ingredients together with the DEMO and REAC
+    rows of the same reports. Returns (drug, demo, reac).
+    '''
+    drug = query_drug(ingredients, quarters, root, contains=contains, normalizer=normalizer)
+    if len(drug) == 0:
+        return drug, read_reports('DEMO', [], [], root), read_reports('REAC', [], [], root)
+    ids = drug[['primaryid', 'quarter']].drop_duplicates()
+    return (drug,
+            read_reports('DEMO', ids['primaryid'], ids['quarter'], root),
+            read_reports('REAC', ids['primaryid'], ids['quarter'], root))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local Parquet warehouse of the quarterly FAERS files')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    ingest = sub.add_parser('ingest', help='download and convert quarters not yet in the warehouse')
+    ingest.add_argument('quarters', nargs='*', help='quarters such as 2020Q3')
+    ingest.add_argument('--fy', nargs=2, type=int, metavar=('FIRST', 'LAST'), help='fiscal year range')
+    ingest.add_argument('--cache-dir', default=default_cache_dir)
+    ingest.add_argument('--workers', type=int, default=4)
+    ingest.add_argument('--offline', action='store_true')
+    ingest.add_argument('--force', action='store_true', help='re-ingest quarters already present')
+    ingest.add_argument('--chunksize', type=int, default=chunksize, help='rows read (and sorted) at a time')
+
+    query = sub.add_parser('query', help='DRUG rows of one or more active ingredients')
+    query.add_argument('ingredients', nargs='+')
+    query.add_argument('--fy', nargs=2, type=int, metavar=('FIRST', 'LAST'), help='fiscal year range')
+    query.add_argument('--contains', action='store_true', help='substring rather than exact ingredient match')
+    query.add_argument('--fuzzy', action='store_true', help='also match misspelled or salt-suffixed ingredients')
+    query.add_argument('--out', help='CSV to write (prints a summary when omitted)')
+
+    for p in (ingest, query):
+        p.add_argument('--root', default=default_root)
+    args = parser.parse_args()
+
+    quarters = fiscal_years(*args.fy) if args.fy else None
+    if args.command == 'ingest':
+        quarters = (quarters or []) + args.quarters
+        for quarter, entry in ingest_quarters(quarters, args.root, args.cache_dir, args.workers, args.offline,
+                                              args.force, args.chunksize).items():
+            print(quarter, entry['tables'])
+    else:
+        start = time.perf_counter()
+        normalizer = MedicationNormalizer(args.ingredients) if args.fuzzy else None
+        drug = query_drug(args.ingredients, quarters, args.root, contains=args.contains, normalizer=normalizer)
+        print('%d rows in %.3f s' % (len(drug), time.perf_counter() - start))
+        if args.out:
+            drug.to_csv(args.out, index=False)
+        else:
+            print(drug.groupby('quarter').size().to_string())
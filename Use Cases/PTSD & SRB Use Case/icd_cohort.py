@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""
+ICD Cohort Extractor
+Written: 10/18/2026
+Updated: 10/18/2026
+
+Finds the distinct patients of a diagnosis extract (PossiblePatients_ICD.csv,
+or a warehouse extract of any size) with a code of interest, in one streaming
+pass and bounded memory, instead of str.contains or a GROUP BY over the
+whole table.
+
+Codes are kept in a prefix trie (CodeTrie) that gives each distinct ICD-9 or
+ICD-10 code an integer ID. Codes are compared without their dots, so
+'309.81' and '30981' are the same code. A requested pattern expands to the
+IDs of the codes under it:
+
+    'F43.10'        one code
+    'F43.1*'        every code starting with F43.1
+    'F40-F48'       a range of categories (both ends inclusive)
+    'ICD10:V'       an ICD-10-CM chapter, or 'ICD9:5' an ICD-9-CM chapter (see chapters)
+
+The extract is read in chunks. The codes of each chunk are factorized, each
+distinct code is looked up in the trie once, and the qualifying rows (code
+selected and Age >= 18) add their patient IDs to a PatientSet. This is a
+bitmap for integer IDs and a sorted array union otherwise. Memory is bounded
+by the chunk size, the number of distinct codes and the patient set.
+
+    patients = extract_cohort('PossiblePatients_ICD.csv', ptsd_codes)          # 383 patients
+    patients = extract_cohort('diagnoses.csv', ['F43.1*'], chunksize=5_000_000)
+
+The trie can be preloaded with a code list such as the ICD-9 descriptions in
+Instructor Materials/icd9codes.xlsx (load_codes), but codes first seen in the
+extract are added as they are read, so patterns also match them.
+"""
+
+# Modules
+
+import pandas as pd
+import numpy as np
+
+# pyarrow's streaming csv reader (multithreaded) is used when installed
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = pacsv = None
+
+
+# The PTSD diagnoses of the use case (ICD-9 and ICD-10)
+ptsd_codes = ['309.81', 'F43.10', 'F43.11', 'F43.12']
+
+# Chapters as ranges of undotted categories (ICD-9 and ICD-10 V codes overlap, so so do ICD9:V and ICD10:XX)
+chapters = {'ICD9:1':'001-139', 'ICD9:2':'140-239', 'ICD9:3':'240-279', 'ICD9:4':'280-289', 'ICD9:5':'290-319',
+            'ICD9:6':'320-389', 'ICD9:7':'390-459', 'ICD9:8':'460-519', 'ICD9:9':'520-579', 'ICD9:10':'580-629',
+            'ICD9:11':'630-679', 'ICD9:12':'680-709', 'ICD9:13':'710-739', 'ICD9:14':'740-759',
+            'ICD9:15':'760-779', 'ICD9:16':'780-799', 'ICD9:17':'800-999', 'ICD9:V':'V01-V91', 'ICD9:E':'E000-E999',
+            'ICD10:I':'A00-B99', 'ICD10:II':'C00-D49', 'ICD10:III':'D50-D89', 'ICD10:IV':'E00-E89',
+            'ICD10:V':'F01-F99', 'ICD10:VI':'G00-G99', 'ICD10:VII':'H00-H59', 'ICD10:VIII':'H60-H95',
+            'ICD10:IX':'I00-I99', 'ICD10:X':'J00-J99', 'ICD10:XI':'K00-K95', 'ICD10:XII':'L00-L99',
+            'ICD10:XIII':'M00-M99', 'ICD10:XIV':'N00-N99', 'ICD10:XV':'O00-O9A', 'ICD10:XVI':'P00-P96',
+            'ICD10:XVII':'Q00-Q99', 'ICD10:XVIII':'R00-R99', 'ICD10:XIX':'S00-T88', 'ICD10:XX':'V00-Y99',
+            'ICD10:XXI':'Z00-Z99', 'ICD10:XXII':'U00-U85'}
+
+
+def normalize_code(code):
+    '''An ICD code upper cased, without surrounding whitespace or dots.'''
+    return str(code).strip().upper().replace('.', '')
+
+
+def load_codes(fp, column='DIAGNOSIS CODE'):
+    '''The codes of a code list (.xlsx or .csv), e.g. load_codes('Instructor Materials/icd9codes.xlsx').'''
+    df = pd.read_excel(fp, dtype=str) if fp.endswith(('.xlsx', '.xls')) else pd.read_csv(fp, dtype=str)
+    return df[column].dropna().tolist()
+
+
+class CodeTrie:
+    '''
+    Prefix trie of ICD codes, each node a dict of its children by character,
+    with the code's integer ID under the '' key. `codes` holds each ID's code
+    as first added.
+    '''
+
+    def __init__(self, codes=()):
+        self._root = {}
+        self.codes = []
+        for code in codes:
+            self.add(code)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def add(self, code):
+        '''The ID of `code`, adding it when new.'''
+        node = self._root
+        for char in normalize_code(code):
+            node = node.setdefault(char, {})
+        if '' not in node:
+            node[''] = len(self.codes)
+            self.codes.append(code)
+        return node['']
+
+    def _node(self, key):
+        node = self._root
+        for char in key:
+            node = node.get(char)
+            if node is None:
+                return None
+        return node
+
+    def get(self, code):
+        '''The ID of `code`, or -1 when absent.'''
+        node = self._node(normalize_code(code))
+        return -1 if node is None else node.get('', -1)
+
+    @staticmethod
+    def _subtree(node, out):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for char, child in node.items():
+                if char == '':
+                    out.append(child)
+                else:
+                    stack.append(child)
+
+    def prefix(self, prefix):
+        '''IDs of the codes starting with `prefix`.'''
+        out = []
+        node = self._node(normalize_code(prefix))
+        if node is not None:
+            self._subtree(node, out)
+        return out
+
+    def between(self, first, last):
+        '''IDs of the codes whose first len(first) characters are >= first and first len(last) are <= last.'''
+        first, last = normalize_code(first), normalize_code(last)
+        depth = max(len(first), len(last))
+        out, stack = [], [('', self._root)]
+        while stack:
+            key, node = stack.pop()
+            k = len(key)
+            if key[:len(first)] < first[:k] or key[:len(last)] > last[:k]:
+                continue
+            if k >= depth: # every code below is within the range
+                self._subtree(node, out)
+                continue
+            if '' in node and key >= first and key[:len(last)] <= last:
+                out.append(node[''])
+            stack.extend((key + char, child) for char, child in node.items() if char != '')
+        return out
+
+    def expand(self, patterns):
+        '''Sorted IDs of the codes matching any pattern (a code, 'prefix*', 'first-last' or a chapter).'''
+        ids = []
+        for pattern in patterns:
+            pattern = chapters.get(pattern, pattern).strip()
+            if pattern.endswith('*'):
+                ids += self.prefix(pattern[:-1])
+            elif '-' in pattern:
+                ids += self.between(*pattern.split('-', 1))
+            else:
+                code = self.get(pattern)
+                ids += [code] if code >= 0 else []
+        return np.unique(np.array(ids, dtype=np.int64))
+
+
+class PatientSet:
+    '''
+    Distinct patient IDs. Non-negative integer IDs below `bitmap_limit` are
+    kept as a bitmap (one bit per possible ID). Any other IDs switch the set
+    to a sorted array, merged with the newly added IDs once those outnumber it.
+    '''
+
+    def __init__(self, bitmap_limit=1 << 31):
+        self.bitmap_limit = bitmap_limit
+        self._bits = np.zeros(0, dtype=np.uint8)
+        self._sorted = None
+        self._pending = []
+
+    def add(self, ids):
+        ids = np.asarray(ids)
+        if len(ids) == 0:
+            return
+        if self._sorted is None:
+            if ids.dtype.kind in 'iu' and ids.min() >= 0 and ids.max() < self.bitmap_limit:
+                ids = ids.astype(np.int64)
+                need = int(ids.max() >> 3) + 1
+                if need > len(self._bits):
+                    self._bits = np.concatenate([self._bits, np.zeros(max(need, 2 * len(self._bits)) - len(self._bits),
+                                                                      dtype=np.uint8)])
+                np.bitwise_or.at(self._bits, ids >> 3, (1 << (ids & 7)).astype(np.uint8))
+                return
+            self._sorted = self._from_bits()
+        self._pending.append(np.unique(ids))
+        if sum(len(p) for p in self._pending) > len(self._sorted):
+            self._merge()
+
+    def _from_bits(self):
+        return np.flatnonzero(np.unpackbits(self._bits, bitorder='little'))
+
+    def _merge(self):
+        if self._pending:
+            parts = [self._sorted] + self._pending
+            if len({p.dtype.kind for p in parts if len(p)}) > 1:
+                parts = [p.astype(object) for p in parts]
+            self._sorted = np.unique(np.concatenate(parts))
+            self._pending = []
+
+    def ids(self):
+        '''The patient IDs, sorted.'''
+        if self._sorted is None:
+            return self._from_bits()
+        self._merge()
+        return self._sorted
+
+    def __len__(self):
+        if self._sorted is None:
+            return int(np.unpackbits(self._bits).sum())
+        return len(self.ids())
+
+
+class CohortExtractor:
+    '''
+    Patients with a code matching `patterns` (and, unless `min_age` is None,
+    an age of at least `min_age` on that row), accumulated over chunks of a
+    diagnosis extract. `rows_read` and `rows_matched` count the rows seen and
+    the qualifying rows.
+    '''
+
+    def __init__(self, patterns=ptsd_codes, trie=None, min_age=18, id_column='PatientID', code_column='ICDCode',
+                 age_column='Age', bitmap_limit=1 << 31):
+        self.patterns = list(patterns)
+        self.trie = trie if trie is not None else CodeTrie()
+        self.min_age = min_age
+        self.id_column, self.code_column, self.age_column = id_column, code_column, age_column
+        self.patients = PatientSet(bitmap_limit)
+        self.rows_read = self.rows_matched = 0
+        self._ids = {}  # raw code text -> trie ID, so each distinct string is normalized once
+        self._selected = np.zeros(0, dtype=bool)
+        self._expand()
+
+    def _expand(self):
+        self._selected = np.zeros(len(self.trie), dtype=bool)
+        self._selected[self.trie.expand(self.patterns)] = True
+
+    def _code_ids(self, uniques):
+        size = len(self.trie)
+        ids = np.empty(len(uniques), dtype=np.int64)
+        for k, code in enumerate(uniques):
+            found = self._ids.get(code)
+            if found is None:
+                found = self._ids[code] = self.trie.add(code)
+            ids[k] = found
+        if len(self.trie) > size: # patterns may match the new codes
+            self._expand()
+        return ids
+
+    def add_chunk(self, df):
+        '''Adds the qualifying patients of one chunk of the extract.'''
+        codes, uniques = pd.factorize(df[self.code_column])
+        ids = self._code_ids(np.asarray(uniques, dtype=object))
+        keep = np.append(self._selected[ids], False)[codes] # code -1 (missing) is never selected
+        if self.min_age is not None:
+            age = pd.to_numeric(df[self.age_column], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+            keep &= age >= self.min_age
+        self.patients.add(df[self.id_column].to_numpy()[keep])
+        self.rows_read += len(df)
+        self.rows_matched += int(keep.sum())
+        return self
+
+    def extract(self, chunks):
+        '''Adds every chunk of an iterable of data frames, returning the sorted patient IDs.'''
+        for chunk in chunks:
+            self.add_chunk(chunk)
+        return self.patients.ids()
+
+    def matched_codes(self):
+        '''The codes seen so far that match the patterns.'''
+        return [self.trie.codes[k] for k in np.flatnonzero(self._selected)]
+
+
+def iter_chunks(fp, columns=('PatientID', 'ICDCode', 'Age'), chunksize=5_000_000, block_size=16 << 20):
+    '''
+    Chunks of a diagnosis csv file, reading only `columns` (the code column,
+    listed second, as categorical). With pyarrow installed the file is read
+    by its streaming reader in blocks of `block_size` bytes, otherwise by
+    pandas in chunks of `chunksize` rows.
+    '''
+    columns = list(columns)
+    if pacsv is None:
+        yield from pd.read_csv(fp, usecols=columns, chunksize=chunksize, dtype={columns[1]:'category'})
+        return
+    reader = pacsv.open_csv(fp, read_options=pacsv.ReadOptions(block_size=block_size),
+                            convert_options=pacsv.ConvertOptions(include_columns=columns, column_types={
+                                columns[1]:pa.dictionary(pa.int32(), pa.string())}))
+    for batch in reader:
+        yield batch.to_pandas()
+
+
+def extract_cohort(fp, patterns=ptsd_codes, chunksize=5_000_000, trie=None, **kwargs):
+    '''
+    Sorted distinct IDs of the patients of a diagnosis csv file with a code
+    matching `patterns`, read in one pass (keyword arguments as CohortExtractor).
+    '''
+    extractor = CohortExtractor(patterns, trie, **kwargs)
+    columns = (extractor.id_column, extractor.code_column) + ((extractor.age_column,) if extractor.min_age is not None
+                                                              else ())
+    return extractor.extract(iter_chunks(fp, columns, chunksize))
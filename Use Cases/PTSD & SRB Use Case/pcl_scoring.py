@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+PCL-5 and PHQ-9 Scoring
+Written: 10/18/2026
+Updated: 10/18/2026
+
+Scores the PTSD checklist (PCL-5) and the PHQ-9 suicidality item of the PTSD
+use case for every respondent at once, replacing the per-row loop over the
+cluster slices 1:6, 6:8, 8:15 and 15:21 of the walkthrough and simulation
+notebooks. The instrument is declared by column name rather than position:
+
+  - pcl5_items: the PCL-5 question numbers of each DSM-5 symptom cluster
+    (B intrusion 1-5, C avoidance 6-7, D negative mood 8-14, E arousal 15-20)
+  - pcl5_clusters(wave): the cluster columns of one wave, e.g. PTSD_Q1_6mo
+  - walkthrough_rule / dsm5_rule: symptoms required per cluster, a symptom
+    being an item rated 2 ("Moderately") or higher. The walkthrough asks for
+    one per cluster. The DSM-5 provisional diagnosis asks for 1 B, 1 C, 2 D
+    and 2 E.
+
+The items are read into one int8 matrix, a row per item (missing answers as
+-1), and cluster maxima, symptom counts, the total severity (0-80) and each
+diagnostic rule come from a few NumPy reductions over its rows. SRB is PHQ_Q9 >= 1. Files too large
+for memory are scored chunk by chunk.
+
+    scores = score(cohort)                      # PTSD_6mo, PTSD_DSM5_6mo, SRB_6mo, cluster maxima, ...
+    cohort['PTSD_6mo'] = scores['PTSD_6mo']
+    counts = score_csv('PTSD_ResearchCohort.csv', 'PTSD_Scores.csv')
+"""
+
+# Modules
+
+import pandas as pd
+import numpy as np
+import os
+
+
+# PCL-5 questions of each DSM-5 symptom cluster
+pcl5_items = {'Intrusion':range(1, 6), 'Avoidance':range(6, 8), 'Negative Mood':range(8, 15),
+              'Arousal':range(15, 21)}
+
+# Symptoms (items rated >= symptom_threshold) required per cluster
+walkthrough_rule = {'Intrusion':1, 'Avoidance':1, 'Negative Mood':1, 'Arousal':1}
+dsm5_rule = {'Intrusion':1, 'Avoidance':1, 'Negative Mood':2, 'Arousal':2}
+symptom_threshold = 2
+
+# Highest answer of a PCL-5 item (0 = Not at all ... 4 = Extremely)
+max_answer = 4
+
+# SRB columns and the PHQ-9 item each is derived from (present when the answer is 1 or more)
+srb_items = {'SRB_6mo':'PHQ_Q9_6mo'}
+
+
+def pcl5_clusters(wave='6mo', prefix='PTSD_Q'):
+    '''The PCL-5 columns of each cluster for one survey wave, {cluster: [column, ...]}.'''
+    return {name:['%s%d_%s' % (prefix, q, wave) for q in items] for name, items in pcl5_items.items()}
+
+
+def pcl5_outcomes(wave='6mo'):
+    '''The diagnosis columns of one wave and their rules, {column: rule}.'''
+    return {'PTSD_%s' % wave:walkthrough_rule, 'PTSD_DSM5_%s' % wave:dsm5_rule}
+
+
+def item_matrix(df, columns, max_value=max_answer):
+    '''
+    The answers of `columns` as an int8 matrix with one row per item (column)
+    and one column per respondent, missing answers as -1. Raises ValueError
+    for answers outside 0-max_value.
+    '''
+    out = np.empty((len(columns), len(df)), dtype=np.int8)
+    for k, column in enumerate(columns):
+        values = df[column].to_numpy()
+        if values.dtype.kind in 'iu': # no missing answers, no conversion needed
+            bad = (values < 0) | (values > max_value)
+        else:
+            values = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+            missing = np.isnan(values)
+            bad = ~missing & ((values < 0) | (values > max_value) | (values != np.round(values)))
+            values = np.where(missing, -1, values)
+        if bad.any():
+            raise ValueError('%s has %d answers outside 0-%d, e.g. %r' % (column, bad.sum(), max_value,
+                                                                         df[column].to_numpy()[bad][0]))
+        out[k] = values
+    return out
+
+
+def score(df, clusters=None, outcomes=None, srb=None, threshold=symptom_threshold):
+    '''
+    Scores of every respondent of `df` (aligned with its index): each
+    cluster's maximum answer ('<cluster> Max') and symptom count
+    ('<cluster> Symptoms'), the PCL-5 total (NaN when an item is missing),
+    the number of missing items, a 0/1 column per diagnostic rule of
+    `outcomes` and a 0/1 SRB column per PHQ item of `srb` ({column: item},
+    a missing answer counting as 0). Defaults are the 6 month columns of the
+    use case.
+    '''
+    clusters = pcl5_clusters() if clusters is None else clusters
+    outcomes = pcl5_outcomes() if outcomes is None else outcomes
+    srb = srb_items if srb is None else srb
+    names = list(clusters)
+    for column, rule in outcomes.items():
+        unknown = set(rule) - set(names)
+        if unknown:
+            raise ValueError('Rule %s uses clusters not in clusters: %s' % (column, ', '.join(sorted(unknown))))
+
+    items = item_matrix(df, [c for cluster in clusters.values() for c in cluster])
+    ends = np.cumsum([len(cluster) for cluster in clusters.values()])
+    blocks = list(zip(ends - [len(cluster) for cluster in clusters.values()], ends))
+
+    # Each statistic is a reduction over the cluster's rows of the item matrix
+    endorsed = items >= threshold
+    symptoms = {name:endorsed[a:b].sum(axis=0, dtype=np.int8) for name, (a, b) in zip(names, blocks)}
+    out = {}
+    for name, (a, b) in zip(names, blocks):
+        out[name + ' Max'] = items[a:b].max(axis=0)
+        out[name + ' Symptoms'] = symptoms[name]
+
+    missing = (items < 0).sum(axis=0, dtype=np.int8)
+    if missing.any():
+        total = np.where(items < 0, 0, items).sum(axis=0, dtype=np.int16)
+        out['PCL Total'] = np.where(missing > 0, np.nan, total)
+    else:
+        out['PCL Total'] = items.sum(axis=0, dtype=np.int16)
+    out['PCL Missing Items'] = missing
+
+    for column, rule in outcomes.items():
+        meets = np.ones(len(df), dtype=bool)
+        for name, required in rule.items():
+            meets &= symptoms[name] >= required
+        out[column] = meets.astype(np.int8)
+    for column, item in srb.items():
+        answer = pd.to_numeric(df[item], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        out[column] = (answer >= 1).astype(np.int8)
+    return pd.DataFrame(out, index=df.index)
+
+
+def iter_scores(fp, chunksize=1_000_000, keep=('UID',), **kwargs):
+    '''Yields the scores of each chunk of a survey csv file, with the `keep` columns (e.g. the ID) in front.'''
+    for chunk in pd.read_csv(fp, chunksize=chunksize):
+        scores = score(chunk, **kwargs)
+        yield pd.concat([chunk[[c for c in keep if c in chunk.columns]], scores], axis=1)
+
+
+def score_csv(fp, out_fp=None, chunksize=1_000_000, keep=('UID',), **kwargs):
+    '''
+    Scores a survey csv file of any size chunk by chunk, writing the scores to
+    `out_fp` when given. Returns the respondent counts of each combination of
+    the diagnosis and SRB columns, summed over the chunks.
+    '''
+    if out_fp is not None and os.path.exists(out_fp):
+        os.remove(out_fp)
+    outcomes, srb = kwargs.get('outcomes'), kwargs.get('srb')
+    flags = list(pcl5_outcomes() if outcomes is None else outcomes) + list(srb_items if srb is None else srb)
+    counts = []
+    for k, scores in enumerate(iter_scores(fp, chunksize, keep, **kwargs)):
+        if out_fp is not None:
+            scores.to_csv(out_fp, mode='a', header=k == 0, index=False)
+        counts.append(scores.groupby(flags).size() if flags else pd.Series([len(scores)], dtype=np.int64))
+    if not counts:
+        return pd.Series(dtype=np.int64)
+    return pd.concat(counts).groupby(level=list(range(counts[0].index.nlevels))).sum()
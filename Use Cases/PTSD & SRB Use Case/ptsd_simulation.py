@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+PTSD Research Cohort Simulation
+Written: 10/18/2026
+Updated: 10/18/2026
+
+A vectorized version of Instructor Materials/PTSD_DataSimulation.ipynb that
+generates research cohorts of any size (PTSD_ResearchCohort.csv's columns)
+for load testing. The notebook loops over rows to draw each attribute given
+the patient's PTSD and SRB status. Here every attribute is drawn for a whole
+block of rows at once, with the probabilities of each row's stratum looked
+up from the tables below (the notebook's values):
+
+  - PCL-5 items: 0-4 with item_probs. PTSD_6mo follows the walkthrough rule (pcl_scoring.py).
+  - PHQ_Q9_6mo: 0-3 with phq9_probs by PTSD. SRB_6mo is PHQ_Q9 >= 1.
+  - Age: normal by PTSD x SRB (age_params), at least 18.
+  - AlcAbuse by PTSD x SRB, IncomeCat and SocialSupport (clipped to 0-84) by SRB.
+  - BeckAnxiety_BL (clipped to 0-63) and TimeFirstDiagnosis_Months, as in the notebook.
+  - PTSD_Rx: a medication group by the PTSD/SRB medication indicators (rx_probs), then a medication of the group.
+
+UIDs keep the notebook's U/Z + 3 digit form up to 1,800 patients and gain
+digits for larger cohorts. The randomness comes from cohort_sim's
+SeedSequence block streams.
+
+    cohort = ptsd_cohort(401)
+    ptsd_cohort_csv(10_000_000, 'PTSD_ResearchCohort_10M.csv', chunksize=1_000_000)
+"""
+
+# Modules
+
+import pandas as pd
+import numpy as np
+import os, sys
+
+from pcl_scoring import pcl5_clusters, score, walkthrough_rule
+
+# The shared generator helpers sit one folder up, in Use Cases
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from cohort_sim import block_streams, draw_categories, generate, strata_codes, unique_ids, write_chunks
+
+
+default_seed = 1415
+
+# Answer probabilities of every PCL-5 item (0-4)
+item_probs = [0.4, 0.3, 0.15, 0.1, 0.05]
+
+# PHQ-9 question 9 answer probabilities (0-3), by PTSD_6mo
+phq9_probs = {0:[0.65, 0.15, 0.1, 0.1], 1:[0.45, 0.25, 0.2, 0.1]}
+
+# Covariates by (PTSD_6mo, SRB_6mo): age (mean, sd) and the probability of alcohol abuse
+age_params = {(0, 0):(40, 10), (0, 1):(19, 1), (1, 0):(40, 6), (1, 1):(25, 3)}
+alc_abuse_probs = {(0, 0):0.3, (0, 1):0.5, (1, 0):0.3, (1, 1):0.7}
+
+# Covariates by SRB_6mo: income category probabilities and social support (mean, sd)
+income_categories = ['<125% FPL', '125%-200% FPL', '200%-400% FPL', '400%+ FPL']
+income_probs = {0:[0.2, 0.25, 0.2, 0.35], 1:[0.3, 0.4, 0.2, 0.1]}
+support_params = {0:(50, 10), 1:(30, 10)}
+
+# Probability of each medication indicator by (PTSD_6mo, SRB_6mo)
+ptsd_med_probs = {(0, 0):0.8, (0, 1):0.7, (1, 0):0.3, (1, 1):0.3}
+srb_med_probs = {(0, 0):0.2, (0, 1):0.3, (1, 0):0.3, (1, 1):0.7}
+
+# Medication groups, and their probabilities by (SRB_MedInd, PTSD_MedInd)
+medications = {'evidence_against':['sertraline', 'paroxetine'], 'evidence_high':['nefazodone', 'phenelzine'],
+               'evidence_low':['midazolam', 'clonazepam']}
+rx_probs = {(0, 0):[0.1, 0.1, 0.8], (0, 1):[0.1, 0.7, 0.2], (1, 0):[0.7, 0.15, 0.15], (1, 1):[0.42, 0.42, 0.16]}
+
+_streams = ['items', 'phq', 'age', 'diagnosis', 'alcohol', 'beck', 'income', 'support', 'ptsd_med', 'srb_med',
+            'rx_group', 'rx_med']
+
+
+def _table(table, keys):
+    '''Rows of a table keyed by stratum, in stratum code order (see cohort_sim.strata_codes).'''
+    return np.array([table[k] for k in keys], dtype=np.float64)
+
+
+def uids(index, total, seed=default_seed):
+    '''UIDs of rows `index` of a cohort of `total` patients: U or Z and a number, 100-998 while they fit.'''
+    digits = 3
+    while 2 * 9 * 10**(digits - 1) - 2 < total:
+        digits += 1
+    numbers = unique_ids(index, 2 * (9 * 10**(digits - 1) - 1), seed)
+    letters = np.array(['U', 'Z'])[numbers % 2]
+    return pd.Series(np.char.add(letters, (numbers // 2 + 10**(digits - 1)).astype(str)))
+
+
+def ptsd_block(seed, block, first, size, total):
+    '''The first `size` rows of one block of a simulated cohort of `total` patients (see cohort_sim.generate).'''
+    rng = block_streams(seed, block, _streams)
+    four = [(0, 0), (0, 1), (1, 0), (1, 1)]
+
+    columns = [c for items in pcl5_clusters().values() for c in items]
+    df = pd.DataFrame({'UID':uids(np.arange(first, first + size), total, seed)})
+    answers = draw_categories(rng['items'].random((size, len(columns))).ravel(), None, item_probs)
+    df = pd.concat([df, pd.DataFrame(answers.reshape(size, len(columns)), columns=columns)], axis=1)
+
+    ptsd = score(df, outcomes={'PTSD_6mo':walkthrough_rule}, srb={})['PTSD_6mo'].to_numpy()
+    phq = draw_categories(rng['phq'].random(size), ptsd, _table(phq9_probs, [0, 1]))
+    srb = (phq >= 1).astype(np.int8)
+    strata = strata_codes(ptsd, srb)
+    df['PHQ_Q9_6mo'] = phq.astype(np.float64)
+
+    mean, sd = _table(age_params, four).T
+    df['Age'] = np.round(np.maximum(rng['age'].normal(mean[strata], sd[strata]), 18), 0)
+    df['TimeFirstDiagnosis_Months'] = ((rng['diagnosis'].beta(0.78, 0.78, size) + 1) * 12).round(0)
+    df['AlcAbuse'] = (rng['alcohol'].random(size) < _table(alc_abuse_probs, four)[strata]).astype(np.float64)
+    df['BeckAnxiety_BL'] = np.clip(rng['beck'].normal(15, 15, size).round(0), 0, 63)
+    income = draw_categories(rng['income'].random(size), srb, _table(income_probs, [0, 1]))
+    df['IncomeCat'] = np.array(income_categories, dtype=object)[income]
+    mean, sd = _table(support_params, [0, 1]).T
+    df['SocialSupport'] = np.clip(np.round(rng['support'].normal(mean[srb], sd[srb]), 0), 0, 84)
+
+    ptsd_med = (rng['ptsd_med'].random(size) < _table(ptsd_med_probs, four)[strata]).astype(np.int8)
+    srb_med = (rng['srb_med'].random(size) < _table(srb_med_probs, four)[strata]).astype(np.int8)
+    group = draw_categories(rng['rx_group'].random(size), strata_codes(srb_med, ptsd_med), _table(rx_probs, four))
+    names = np.array(list(medications.values()), dtype=object) # groups x medications
+    df['PTSD_Rx'] = names[group, rng['rx_med'].integers(0, names.shape[1], size)]
+
+    # The outcomes are dropped from the exported cohort, as in the notebook, but kept for checking
+    df['PTSD_6mo'], df['SRB_6mo'] = ptsd, srb
+    return df
+
+
+def ptsd_cohort(n, seed=default_seed, outcomes=False):
+    '''A simulated research cohort of n patients (with the PTSD_6mo and SRB_6mo columns when `outcomes`).'''
+    df = generate(ptsd_block, n, seed)
+    return df if outcomes else df.drop(columns=['PTSD_6mo', 'SRB_6mo'])
+
+
+def ptsd_cohort_csv(n, out_fp, seed=default_seed, chunksize=1_000_000):
+    '''Writes a simulated research cohort of n patients (with outcomes) to csv or parquet chunk by chunk.'''
+    return write_chunks(ptsd_block, n, out_fp, seed, chunksize)
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 """
 Created on Fri Feb  5 08:01:14 2021
-Most recently updated: 4.21.2021 
+Most recently updated: 10.18.2026
 @author: Dominic DiSanto
 """
 
@@ -13,8 +13,8 @@ Most recently updated: 4.21.2021
 
 import pandas as pd 
 import numpy as np 
-import random, string 
-import datetime
+
+from stockout_engine import id_space, id_stream, transaction_ids, decode_ids, simulate_machine, assign_days
 
 np.random.seed(8114)
 
@@ -56,8 +56,11 @@ stockout_range = {'SpecialLow':range(2, 8),
                   }
 
 
-def ID(): return(''.join(random.choices(string.ascii_uppercase + string.digits, k=12)))
-ID()
+# Each machine draws its TransactionIDs from its own third of the ID space so IDs are unique across files. IDs
+# come from their own stream (id_rs) so they don't shift the seed 8114 withdrawal and day draws
+id_ranges = {m:((m-1)*(id_space//3), m*(id_space//3)) for m in machines}
+id_rs = id_stream(8114)
+
 
 
 
@@ -90,42 +93,21 @@ meds_ED.loc[meds_ED['Med_Name'].isin(['metoprolol succinate ER 25mg TAB',
 
 
 
-ED_meds_df = pd.DataFrame(data=None, columns=['TransactionID', 'Machine', 'Day',
-                                         'Medication', 'Type', 'AmtRemaining'])
+ED_meds_df = simulate_machine(meds_ED['Med_Name'], meds_ED['ED_Rarity'], 1, init_units, stockout_range,
+                              id_range=id_ranges[1], id_rs=id_rs)
 
-for med in meds_ED.loc[meds_ED['ED_Rarity']!='', 'Med_Name']:
-    rarity = meds_ED.loc[meds_ED['Med_Name']==med, 'ED_Rarity'].item()    
-    ED_meds_df .loc[ED_meds_df .shape[0], :] = [ID(), 1, 'day', med, 'Withdrawal', init_units[rarity]-1]    
-    stockouts = 0
-    limit = np.random.choice(stockout_range[rarity])    
-    while stockouts<=limit:
-        if ED_meds_df .loc[ED_meds_df .shape[0]-1, 'AmtRemaining']>0:
-            ED_meds_df .loc[ED_meds_df .shape[0], :] = [ID(), 1, 'day', med, 'Withdrawal', 
-                                            max(0, ED_meds_df .loc[ED_meds_df .shape[0]-1, 'AmtRemaining']-np.random.choice([1, 2, 3]))]
-        else:
-            ED_meds_df .loc[ED_meds_df .shape[0], :] = [ID(), 1, 'day', med, 'Refill', init_units[rarity]]
-            stockouts += 1
-
-ED_meds_df .loc[ED_meds_df .shape[0], :] = [ID(), 1, 'day', 'pravastatin 10mg TAB','Withdrawal', 14]
+ED_meds_df = pd.concat([ED_meds_df,
+                        pd.DataFrame([[transaction_ids(1, id_rs, id_ranges[1], decode_ids(ED_meds_df['TransactionID']))[0].decode(), 1, 'day',
+                                       'pravastatin 10mg TAB','Withdrawal', 14]], columns=ED_meds_df.columns)],
+                       ignore_index=True)
             
 
 # Checking frequency of stock-outs
-pd.crosstab(ED_meds_df ['Medication'], ED_meds_df ['Type']).sort_values('Refill')
-
-transact_tot = ED_meds_df ['Medication'].value_counts().reset_index() 
-transact_tot.columns = ['Medication', 'StockOutFreq'] 
+pd.crosstab(ED_meds_df['Medication'], ED_meds_df['Type']).sort_values('Refill')
 
+em_dept_meds = assign_days(ED_meds_df)
 
-m1_df_freq = ED_meds_df .merge(transact_tot, on='Medication')
-m1_df_freq['TransactNo'] = m1_df_freq.groupby('Medication').cumcount()+1
-m1_df_freq['DayNum'] = round(365*m1_df_freq['TransactNo'] / m1_df_freq['StockOutFreq'])
-
-for i in range(m1_df_freq.shape[0]):
-    m1_df_freq.loc[i, 'Day'] = (datetime.date(2020, 1, 1) + datetime.timedelta(m1_df_freq.loc[i, 'DayNum'])).strftime('%Y-%m-%d')
-
-em_dept_meds = m1_df_freq.drop(['StockOutFreq', 'TransactNo', 'DayNum'], axis=1)
-
-em_dept_meds.to_csv('EmergencyDepartmentTransactions.csv')
+em_dept_meds.to_csv('EmergencyDepartmentTransactions.csv', index=False)
 
 ####################################################################################
 
@@ -164,42 +146,17 @@ meds_2.loc[meds_2['Med_Name'].isin(['acetaZOLAMIDE 125mg TAB',
 
 
 
-mach2_meds_df = pd.DataFrame(data=None, columns=['TransactionID', 'Machine', 'Day',
-                                         'Medication', 'Type', 'AmtRemaining'])
-
+# arbitrarily prioritizing gen surgery over neuro
+meds_2['Rarity'] = np.where(meds_2['GenSurgery_Rarity']!='None', meds_2['GenSurgery_Rarity'], meds_2['Neurology_Rarity'])
 
-for med in meds_2.loc[(meds_2['Neurology_Rarity']!='') | (meds_2['GenSurgery_Rarity']!=''), 'Med_Name']:
-    rarity = np.where(meds_2.loc[meds_2['Med_Name']==med, 'GenSurgery_Rarity'].item()!='None', # arbitrarily prioritizing gen surgery over neuro
-                      meds_2.loc[meds_2['Med_Name']==med, 'GenSurgery_Rarity'].item(),
-                      meds_2.loc[meds_2['Med_Name']==med, 'Neurology_Rarity'].item()).item()
-    meds_2.loc[meds_2['Med_Name']==med, 'ED_Rarity'].item()    
-    mach2_meds_df .loc[mach2_meds_df .shape[0], :] = [ID(), 1, 'day', med, 'Withdrawal', init_units[rarity]-1]    
-    stockouts = 0
-    limit = np.random.choice(stockout_range[rarity])    
-    while stockouts<=limit:
-        if mach2_meds_df .loc[mach2_meds_df .shape[0]-1, 'AmtRemaining']>0:
-            mach2_meds_df .loc[mach2_meds_df .shape[0], :] = [ID(), 1, 'day', med, 'Withdrawal', 
-                                            max(0, mach2_meds_df .loc[mach2_meds_df .shape[0]-1, 'AmtRemaining']-np.random.choice([1, 2, 3]))]
-        else:
-            mach2_meds_df.loc[mach2_meds_df.shape[0], :] = [ID(), 1, 'day', med, 'Refill', init_units[rarity]]
-            stockouts += 1
+mach2_meds_df = simulate_machine(meds_2['Med_Name'], meds_2['Rarity'], 1, init_units, stockout_range,
+                                 id_range=id_ranges[2], id_rs=id_rs)
 
 
 # Checking frequency of stock-outs
 pd.crosstab(mach2_meds_df['Medication'], mach2_meds_df['Type']).sort_values('Refill')
 
-transact_tot = mach2_meds_df['Medication'].value_counts().reset_index() 
-transact_tot.columns = ['Medication', 'StockOutFreq'] 
-
-
-m2_df_freq = mach2_meds_df.merge(transact_tot, on='Medication')
-m2_df_freq['TransactNo'] = m2_df_freq.groupby('Medication').cumcount()+1
-m2_df_freq['DayNum'] = round(365*m2_df_freq['TransactNo'] / m2_df_freq['StockOutFreq'])
-
-for i in range(m2_df_freq.shape[0]):
-    m2_df_freq.loc[i, 'Day'] = (datetime.date(2020, 1, 1) + datetime.timedelta(m2_df_freq.loc[i, 'DayNum'])).strftime('%Y-%m-%d')
-
-neuro_surg_meds = m2_df_freq.drop(['StockOutFreq', 'TransactNo', 'DayNum'], axis=1) 
+neuro_surg_meds = assign_days(mach2_meds_df)
 
 neuro_surg_meds.to_csv('Neuro_Surgery_Transactions.csv', index=False)
 
@@ -222,40 +179,17 @@ meds_3.loc[meds_3['Med_Name'] == 'furosemide 40mg TAB' , 'ED_Rarity'] = 'Special
 
 
 
-mach3_meds_df = pd.DataFrame(data=None, columns=['TransactionID', 'Machine', 'Day',
-                                         'Medication', 'Type', 'AmtRemaining'])
+# arbitrarily prioritizing oncology over dermatology
+meds_3['Rarity'] = np.where(meds_3['Oncology_Rarity']!='None', meds_3['Oncology_Rarity'], meds_3['Dermatology_Rarity'])
 
-for med in meds_3.loc[meds_3['ED_Rarity']!='', 'Med_Name']:
-    rarity = np.where(meds_3.loc[meds_3['Med_Name']==med, 'Oncology_Rarity'].item()!='None', # arbitrarily prioritizing gen surgery over neuro
-                      meds_3.loc[meds_3['Med_Name']==med, 'Oncology_Rarity'].item(),
-                      meds_3.loc[meds_3['Med_Name']==med, 'Dermatology_Rarity'].item()).item()
-    mach3_meds_df.loc[mach3_meds_df.shape[0], :] = [ID(), 1, 'day', med, 'Withdrawal', init_units[rarity]-1]    
-    stockouts = 0
-    limit = np.random.choice(stockout_range[rarity])    
-    while stockouts<=limit:
-        if mach3_meds_df.loc[mach3_meds_df.shape[0]-1, 'AmtRemaining']>0:
-            mach3_meds_df.loc[mach3_meds_df.shape[0], :] = [ID(), 1, 'day', med, 'Withdrawal', 
-                                            max(0, mach3_meds_df.loc[mach3_meds_df.shape[0]-1, 'AmtRemaining']-np.random.choice([1, 2, 3]))]
-        else:
-            mach3_meds_df.loc[mach3_meds_df.shape[0], :] = [ID(), 1, 'day', med, 'Refill', init_units[rarity]]
-            stockouts += 1
+mach3_meds_df = simulate_machine(meds_3['Med_Name'], meds_3['Rarity'], 1, init_units, stockout_range,
+                                 id_range=id_ranges[3], id_rs=id_rs)
 
 
 # Checking frequency of stock-outs
-pd.crosstab(mach3_meds_df['Medication'], mach2_meds_df['Type']).sort_values('Refill')
-
-transact_tot = mach3_meds_df['Medication'].value_counts().reset_index() 
-transact_tot.columns = ['Medication', 'StockOutFreq'] 
-
-
-m3_df_freq = mach3_meds_df.merge(transact_tot, on='Medication')
-m3_df_freq['TransactNo'] = m3_df_freq.groupby('Medication').cumcount()+1
-m3_df_freq['DayNum'] = round(365*m3_df_freq['TransactNo'] / m3_df_freq['StockOutFreq'])
-
-for i in range(m3_df_freq.shape[0]):
-    m3_df_freq.loc[i, 'Day'] = (datetime.date(2020, 1, 1) + datetime.timedelta(m3_df_freq.loc[i, 'DayNum'])).strftime('%Y-%m-%d')
+pd.crosstab(mach3_meds_df['Medication'], mach3_meds_df['Type']).sort_values('Refill')
 
-derm_onc_meds = m3_df_freq.drop(['StockOutFreq', 'TransactNo', 'DayNum'], axis=1) 
+derm_onc_meds = assign_days(mach3_meds_df)
 
 derm_onc_meds .to_csv('Onc_Derm_Transactions.csv', index=False)
 
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Stock-Out Analytics
+Written: 10/18/2026
+Updated: 10/18/2026
+
+Loads the stock-out use case's transaction, medication and machine files once
+into a compact columnar store (categorical Medication/Type, datetime64 Day,
+int16 amounts, read by the shared datasets.read_dataset so repeat loads map
+its Feather cache) sorted by machine, medication and day. Per-(machine, medication)
+summaries are precomputed on load, so the crosstab/value_counts questions of the
+assessment become index lookups rather than rescans of the raw strings.
+
+    store = StockOutStore.from_csv('..')
+    store.summary.loc[(1, 'furosemide 40mg TAB')]
+    store.top_stockouts(10, machine=2)
+    store.history(3, 'levothyroxine 100mcg TAB')
+"""
+
+# Modules
+
+import pandas as pd
+import numpy as np
+import os, sys
+
+from stockout_engine import default_machines, machine_rarity
+
+# The shared dataset loader sits two folders up, in Use Cases
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from datasets import read_dataset
+
+
+# Transaction files shipped with the use case and the machine each one belongs to (the Machine column of the
+# shipped files is 1 throughout, so the machine is taken from the file)
+transaction_files = {'EmergencyDepartmentTransactions.csv':1,
+                     'Neuro_Surgery_Transactions.csv':2,
+                     'Onc_Derm_Transactions.csv':3}
+
+transaction_cols = ['TransactionID', 'Machine', 'Day', 'Medication', 'Type', 'AmtRemaining']
+
+
+def read_transactions(fp, machine=None, medications=None):
+    '''
+    Reads one transaction CSV with compact dtypes (the transactions schema of
+    datasets.py), dropping any stray index column. `machine` overrides the
+    file's Machine column when given.
+    '''
+    df = read_dataset(fp, schema='transactions', columns=transaction_cols)
+    df['Machine'] = df['Machine'].astype(np.int16)
+    if machine is not None:
+        df['Machine'] = np.int16(machine)
+    if medications is not None:
+        df['Medication'] = df['Medication'].cat.set_categories(medications)
+    df['Type'] = df['Type'].cat.set_categories(['Refill', 'Withdrawal'])
+    return df
+
+
+class StockOutStore:
+    '''
+    Columnar store of ADS transactions with precomputed per-(machine,
+    medication) summaries.
+
+    `transactions` is sorted by (Machine, Medication, Day) and `summary` is
+    indexed by (Machine, Medication) over every machine and every medication in
+    the medication table, with Withdrawals, Refills, Transactions,
+    MeanDaysBetweenStockouts, EmergencyStatus, Stocked and
+    EmergencyNeverDispensed (emergency medications on the machine's stock list
+    never withdrawn on it).
+
+    `stock` gives each machine's stock list, {machine: medication names}. By
+    default it comes from the medication table's rarity columns (a medication
+    is stocked where its departments' rarity isn't 'None', see
+    stockout_engine.machine_rarity) when the table has them, as
+    Sample_Med_Names.xlsx does, and otherwise from the medications each
+    machine has transactions for (MEDICATIONS.csv has no rarity columns).
+    '''
+
+    def __init__(self, transactions, medications, machines, stock=None):
+        self.medications = medications.set_index('Med_Name')
+        self.machines = machines
+        self.stock = stock
+
+        med_names = list(self.medications.index)
+        medication = transactions['Medication'].astype('category')
+        extra = sorted(set(medication.cat.categories) - set(med_names))
+        transactions = transactions.assign(Medication=medication.cat.set_categories(med_names + extra))
+
+        order = np.lexsort((transactions['Day'].to_numpy(),
+                            transactions['Medication'].cat.codes.to_numpy(),
+                            transactions['Machine'].to_numpy()))
+        self.transactions = transactions.iloc[order].reset_index(drop=True)
+
+        self._build_summary()
+
+    @classmethod
+    def from_csv(cls, data_dir='.', files=transaction_files, stock=None):
+        '''Loads the shipped transaction files plus MEDICATIONS.csv and Machines.csv from `data_dir`.'''
+        medications = read_dataset(os.path.join(data_dir, 'MEDICATIONS.csv'))
+        machines = read_dataset(os.path.join(data_dir, 'Machines.csv'))
+        transactions = pd.concat([read_transactions(os.path.join(data_dir, fp), machine, list(medications['Med_Name']))
+                                  for fp, machine in files.items()], ignore_index=True)
+        return cls(transactions, medications, machines, stock)
+
+    def _stock_lists(self, machine_ids):
+        '''{machine: stocked medication names}, see the class docstring.'''
+        if self.stock is not None:
+            return {m:set(self.stock.get(m, [])) for m in machine_ids}
+        meds = self.medications.reset_index()
+        configs = {config['machine']:config for config in default_machines}
+        if all(m in configs and set(configs[m]['rarity_cols']) <= set(meds.columns) for m in machine_ids):
+            return {m:set(machine_rarity(meds, configs[m])['Med_Name']) for m in machine_ids}
+        observed = self.transactions.groupby('Machine', observed=True)['Medication'].unique()
+        return {m:set(observed.get(m, [])) for m in machine_ids}
+
+    def _build_summary(self):
+        tx = self.transactions
+        machine = tx['Machine'].to_numpy()
+        med = tx['Medication'].cat.codes.to_numpy().astype(np.int64)
+        refill = (tx['Type'] == 'Refill').to_numpy()
+        day = tx['Day'].to_numpy()
+
+        # Group boundaries of the (Machine, Medication) sort, used by history()
+        new_group = np.ones(len(tx), dtype=bool)
+        new_group[1:] = (machine[1:] != machine[:-1]) | (med[1:] != med[:-1])
+        starts = np.flatnonzero(new_group)
+        stops = np.append(starts[1:], len(tx))
+        self._offsets = {(machine[s], med[s]):(s, e) for s, e in zip(starts, stops)}
+
+        group = np.cumsum(new_group) - 1
+        n_refills = np.bincount(group, weights=refill, minlength=len(starts))
+        n_total = np.bincount(group, minlength=len(starts))
+
+        # Days between consecutive refills within each group
+        refill_group = group[refill]
+        refill_day = day[refill].astype('datetime64[D]').astype(np.int64)
+        gaps = np.diff(refill_day)
+        same = refill_group[1:] == refill_group[:-1]
+        gap_sum = np.bincount(refill_group[1:][same], weights=gaps[same], minlength=len(starts))
+        gap_n = np.bincount(refill_group[1:][same], minlength=len(starts))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_gap = np.where(gap_n > 0, gap_sum / gap_n, np.nan)
+
+        categories = tx['Medication'].cat.categories
+        observed = pd.DataFrame({'Withdrawals':(n_total - n_refills).astype(np.int64),
+                                 'Refills':n_refills.astype(np.int64),
+                                 'Transactions':n_total,
+                                 'MeanDaysBetweenStockouts':mean_gap},
+                                index=pd.MultiIndex.from_arrays([machine[starts], categories[med[starts]]],
+                                                                names=['Machine', 'Medication']))
+
+        all_machines = np.union1d(self.machines['Machine ID'].unique(), np.unique(machine))
+        full_index = pd.MultiIndex.from_product([all_machines, categories], names=['Machine', 'Medication'])
+        summary = observed.reindex(full_index)
+        count_cols = ['Withdrawals', 'Refills', 'Transactions']
+        summary[count_cols] = summary[count_cols].fillna(0).astype(np.int64)
+
+        status = self.medications['EmergencyStatus'].reindex(categories).fillna('No')
+        summary['EmergencyStatus'] = pd.Categorical(status.to_numpy()[full_index.codes[1]], categories=['No', 'Yes'])
+        stock = self._stock_lists(all_machines)
+        summary['Stocked'] = [med in stock[m] for m, med in full_index]
+        summary['EmergencyNeverDispensed'] = ((summary['EmergencyStatus'] == 'Yes') & summary['Stocked'] &
+                                              (summary['Withdrawals'] == 0))
+        self.summary = summary
+
+    def history(self, machine, medication):
+        '''Transactions of one medication on one machine, in day order.'''
+        code = self.transactions['Medication'].cat.categories.get_loc(medication)
+        start, stop = self._offsets.get((machine, code), (0, 0))
+        return self.transactions.iloc[start:stop]
+
+    def counts(self, machine=None):
+        '''Medication x Type counts (the original crosstab), for one machine or the whole fleet.'''
+        summary = self.summary if machine is None else self.summary.xs(machine, level='Machine', drop_level=False)
+        counts = summary[['Refills', 'Withdrawals']].groupby(level='Medication', observed=True).sum()
+        return counts[counts.sum(axis=1) > 0].rename(columns={'Refills':'Refill', 'Withdrawals':'Withdrawal'})
+
+    def top_stockouts(self, n=10, machine=None):
+        '''The `n` (machine, medication) pairs with the most stock-outs.'''
+        summary = self.summary if machine is None else self.summary.xs(machine, level='Machine', drop_level=False)
+        return summary.nlargest(n, 'Refills')
+
+    def emergency_flags(self):
+        '''
+        Emergency status medications never dispensed: those on a machine's
+        stock list it never withdrew (Scope 'Machine'), and those of the
+        medication table no machine has a transaction for and no stock list
+        covers (Scope 'Fleet', Machine <NA>).
+        '''
+        columns = ['Withdrawals', 'Refills', 'Transactions']
+        flagged = self.summary.loc[self.summary['EmergencyNeverDispensed'], columns].reset_index()
+        flagged['Scope'] = 'Machine'
+
+        by_med = self.summary.groupby(level='Medication', observed=False)[['Transactions', 'Stocked']].sum()
+        emergency = self.medications.index[self.medications['EmergencyStatus'] == 'Yes']
+        unseen = by_med.reindex(emergency)
+        unseen = unseen[(unseen['Transactions'] == 0) & (unseen['Stocked'] == 0)].index
+        fleet = pd.DataFrame({'Machine':pd.NA, 'Medication':unseen, 'Withdrawals':0, 'Refills':0, 'Transactions':0,
+                              'Scope':'Fleet'})
+
+        flags = pd.concat([flagged, fleet], ignore_index=True)
+        flags['Machine'] = flags['Machine'].astype('Int16')
+        return flags
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Stock-Out Seasonal Demand Model
+Written: 10/18/2026
+Updated: 10/18/2026
+
+Builds the weekly and annual trends noted at the bottom of StockOuts_DataSim.py
+(ONDANsetron early in the week, DOPamine in the summer, hydrocortisone cream in
+July/August). Daily withdrawals for every medication on every machine are
+sampled from a non-homogeneous Poisson process in one batch:
+
+    rate[series, day] = base rate (by rarity) * weekday multiplier * month multiplier
+
+The withdrawn units (1-3 per withdrawal) and refills at each stock-out are
+then resolved for all series together, and Day is returned as datetime64.
+"""
+
+# Modules
+
+import pandas as pd
+import numpy as np
+
+from stockout_engine import (transaction_cols, transaction_types, default_machines, default_init_units,
+                             default_stockout_range, machine_rarity, transaction_ids)
+
+
+def demand_calendar(start='2020-01-01', days=365):
+    '''Returns the simulated days (datetime64[D]) with their weekday (Mon=0) and month (Jan=0).'''
+    day = np.datetime64(start, 'D') + np.arange(days)
+    weekday = (day.astype(np.int64) + 3) % 7 # 1970-01-01 was a Thursday
+    month = day.astype('datetime64[M]').astype(np.int64) % 12
+    return day, weekday, month
+
+
+def rarity_daily_rate(init_units=default_init_units, stockout_range=default_stockout_range, days=365):
+    '''
+    Mean daily withdrawals per rarity class, matched to the original simulation:
+    a medication stocks out about mean(stockout_range) + 1 times a year and each
+    stock-out takes init_units / 2 withdrawals of 1-3 units.
+    '''
+    return {rarity:(np.mean(stockout_range[rarity]) + 1) * init_units[rarity] / 2 / days
+            for rarity in stockout_range}
+
+
+def demand_rates(base_rates, weekday_mult, month_mult, start='2020-01-01', days=365):
+    '''
+    Builds the (series x day) Poisson rate matrix from per-series base rates
+    and (series x 7) weekday / (series x 12) month multipliers.
+    '''
+    _, weekday, month = demand_calendar(start, days)
+    base_rates = np.asarray(base_rates, dtype=np.float64)
+    return base_rates[:, None] * np.asarray(weekday_mult)[:, weekday] * np.asarray(month_mult)[:, month]
+
+
+def inventory_levels(draws, lo, hi, init):
+    '''
+    Resolves the amount remaining after each withdrawal for many series at once.
+
+    `draws` holds the units taken by every withdrawal, series s owning
+    draws[lo[s]:hi[s]] and starting with init[s] units. Each pass of the loop
+    finds the next stock-out of every active series with one searchsorted over
+    the global cumulative sum, so the loop runs once per stock-out rather than
+    once per withdrawal. Returns the remaining amounts and a stock-out mask.
+    '''
+    n = len(draws)
+    series = np.repeat(np.arange(len(lo)), hi - lo)
+    cum = np.concatenate([[0], np.cumsum(draws, dtype=np.int64)])
+
+    stockout = np.zeros(n, dtype=bool)
+    seg_start = lo.copy()
+    active = np.flatnonzero(lo < hi)
+    while len(active):
+        end = np.searchsorted(cum, cum[seg_start[active]] + init[active], side='left') - 1
+        hit = end < hi[active]
+        stockout[end[hit]] = True
+        active, end = active[hit], end[hit]
+        seg_start[active] = end + 1
+        active = active[seg_start[active] < hi[active]]
+
+    # Each withdrawal's segment starts at its series' first draw or just after the last stock-out
+    reset = np.zeros(n, dtype=np.int64)
+    reset[lo[lo < hi]] = lo[lo < hi]
+    after = np.flatnonzero(stockout) + 1
+    after = after[after < n]
+    reset[after] = after
+    reset = np.maximum.accumulate(reset)
+
+    amounts = np.maximum(0, init[series] - (cum[1:] - cum[reset]))
+    return amounts, stockout
+
+
+def simulate_demand(meds, machines=default_machines, seed=8114, start='2020-01-01', days=365,
+                    init_units=default_init_units, stockout_range=default_stockout_range):
+    '''
+    Simulates `days` of transactions for every medication on every machine
+    with seasonal demand, returning one data frame with datetime64 Day values.
+
+    Machine configs are those of stockout_engine.iter_fleet, optionally with
+    `weekday_multipliers` (7 values, Mon-Sun) and `month_multipliers` (12
+    values, Jan-Dec) keyed by medication name. Withdrawals on a given day are
+    Poisson distributed and a refill follows each stock-out on the same day.
+    '''
+    rs = np.random.RandomState(np.random.MT19937(np.random.SeedSequence(seed)))
+
+    # One row per (machine, medication) series
+    series = []
+    for config in machines:
+        med_rarity = machine_rarity(meds, config)
+        units = config.get('init_units', init_units)
+        rates = rarity_daily_rate(units, config.get('stockout_range', stockout_range), days)
+        weekday = config.get('weekday_multipliers', {})
+        month = config.get('month_multipliers', {})
+        series.append(pd.DataFrame({'Machine':config['machine'],
+                                    'Medication':med_rarity['Med_Name'],
+                                    'Init':med_rarity['Rarity'].map(units),
+                                    'Rate':med_rarity['Rarity'].map(rates),
+                                    'Weekday':[weekday.get(med, [1] * 7) for med in med_rarity['Med_Name']],
+                                    'Month':[month.get(med, [1] * 12) for med in med_rarity['Med_Name']]}))
+    series = pd.concat(series, ignore_index=True)
+
+    # Daily withdrawal counts for all series in one draw, expanded to one entry per withdrawal
+    rate = demand_rates(series['Rate'], np.stack(series['Weekday']), np.stack(series['Month']), start, days)
+    counts = rs.poisson(rate)
+    per_series = counts.sum(axis=1)
+    hi = np.cumsum(per_series)
+    lo = hi - per_series
+    day_idx = np.repeat(np.tile(np.arange(days), len(series)), counts.ravel())
+    draws = rs.randint(1, 4, size=hi[-1] if len(hi) else 0)
+
+    init = series['Init'].to_numpy(dtype=np.int64)
+    amounts, stockout = inventory_levels(draws, lo, hi, init)
+    event_series = np.repeat(np.arange(len(series)), per_series)
+
+    # Interleaving a refill after each stock-out
+    n_rows = len(draws) + stockout.sum()
+    withdraw_pos = np.arange(len(draws)) + np.cumsum(stockout) - stockout
+    refill_pos = withdraw_pos[stockout] + 1
+    row_series = np.empty(n_rows, dtype=np.int64)
+    row_series[withdraw_pos] = event_series
+    row_series[refill_pos] = event_series[stockout]
+    row_day = np.empty(n_rows, dtype=np.int64)
+    row_day[withdraw_pos] = day_idx
+    row_day[refill_pos] = day_idx[stockout]
+    row_amt = np.empty(n_rows, dtype=np.int64)
+    row_amt[withdraw_pos] = amounts
+    row_amt[refill_pos] = init[event_series[stockout]]
+    is_refill = np.zeros(n_rows, dtype=bool)
+    is_refill[refill_pos] = True
+
+    medications = sorted(series['Medication'].unique())
+    med_codes = pd.Categorical(series['Medication'], categories=medications).codes
+
+    return pd.DataFrame({'TransactionID':pd.array(transaction_ids(n_rows, rs), dtype='str'),
+                         'Machine':series['Machine'].to_numpy()[row_series],
+                         'Day':np.datetime64(start, 'D') + row_day,
+                         'Medication':pd.Categorical.from_codes(med_codes[row_series], categories=medications),
+                         'Type':pd.Categorical.from_codes(np.where(is_refill, 0, 1).astype(np.int8), categories=transaction_types),
+                         'AmtRemaining':row_amt}, columns=transaction_cols)
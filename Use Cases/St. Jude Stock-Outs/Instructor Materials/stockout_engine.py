@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+"""
+Stock-Out Simulation Engine
+Written: 10/18/2026
+Updated: 10/18/2026
+
+Array-based core for StockOuts_DataSim.py. Each medication's withdrawal/refill
+history is built from one batch of NumPy draws and each machine's transaction
+data frame is created once, rather than appended to one row at a time.
+
+simulate_fleet() runs any number of machines described by a configuration
+(see default_machines) in a process pool. Each machine draws from its own
+child seed stream of a single root seed, so results do not depend on the
+number of workers.
+
+Usage: python stockout_engine.py Sample_Med_Names.xlsx --config fleet.json --workers 8
+       python stockout_engine.py Sample_Med_Names.xlsx --format parquet --out fleet_transactions/
+"""
+
+# Modules
+
+import pandas as pd
+import numpy as np
+import string
+import argparse, json, os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+transaction_cols = ['TransactionID', 'Machine', 'Day', 'Medication', 'Type', 'AmtRemaining']
+
+transaction_types = ['Refill', 'Withdrawal']
+
+
+# Default starting inventory and stock-out limits by rarity class (SpecialHigh/SpecialLow fixed at the
+# midpoint of the 30-45 range StockOuts_DataSim.py draws from)
+default_init_units = {'SpecialHigh':37,
+                      'Common':30,
+                      'Moderate':20,
+                      'Rare':10,
+                      'SpecialLow':37
+                      }
+
+default_stockout_range = {'SpecialLow':range(2, 8),
+                          'Rare':range(10, 30),
+                          'Moderate':range(25, 50),
+                          'Common':range(65, 105),
+                          'SpecialHigh':range(150, 200)
+                          }
+
+
+# The three St. Jude ADS machines. Rarity columns are listed in priority order, the first
+# column that isn't 'None' sets a medication's rarity on that machine. The weekday (Mon-Sun) and
+# month (Jan-Dec) multipliers are only used by the seasonal demand model in stockout_demand.py
+default_machines = [
+    {'machine':1,
+     'departments':['Emergency Department'],
+     'rarity_cols':['ED_Rarity'],
+     'special_low':['ibuprofen 200mg TAB', 'ibuprofen 400mg TAB', 'furosemide 40mg TAB'],
+     'special_high':['metoprolol succinate ER 25mg TAB', 'metoprolol tartrate 25mg TAB'],
+     'month_multipliers':{'DOPamine in D5W 800mcg/1mL 250mL INJ':[0.8, 0.8, 0.9, 1, 1.1, 1.4, 1.5, 1.4, 1.1, 1, 0.9, 0.8]}},
+    {'machine':2,
+     'departments':['Surgery', 'Neurology'],
+     'rarity_cols':['GenSurgery_Rarity', 'Neurology_Rarity'],
+     'special_low':['DAPTomycin PFI 50mg/1mL 10mL INJ', 'enoxaparin 120mg/0.8mL 0.8mL SYRINGE'],
+     'special_high':['acetaZOLAMIDE 125mg TAB', 'acetaZOLAMIDE 250mg TAB', 'EPINEPHrine 0.3mg/0.3mL 0.3mL PEN',
+                     'enoxaparin 60mg/0.6mL 0.6mL SYRINGE', 'enoxaparin 80mg/0.8mL 0.8mL SYRINGE'],
+     'weekday_multipliers':{'ONDANsetron ODT 4mg TAB':[1.6, 1.6, 1.6, 0.9, 0.7, 0.3, 0.3]}},
+    {'machine':3,
+     'departments':['Dermatology', 'Oncology'],
+     'rarity_cols':['Oncology_Rarity', 'Dermatology_Rarity'],
+     'special_low':['furosemide 40mg TAB'],
+     'special_high':['levothyroxine 100mcg TAB'],
+     'month_multipliers':{'hydrocortisone 1% 1app CREAM':[0.7, 0.7, 0.7, 0.8, 0.9, 1.1, 2, 2, 1.2, 0.9, 0.7, 0.7]}}
+    ]
+
+
+# TransactionIDs are 12 characters from A-Z0-9, handled internally as their base-36 integer codes
+id_alphabet = np.frombuffer((string.ascii_uppercase + string.digits).encode(), dtype=np.uint8)
+id_length = 12
+id_space = 36**id_length
+_id_powers = 36 ** np.arange(id_length - 1, -1, -1, dtype=np.int64)
+_id_lookup = np.zeros(256, dtype=np.int64)
+_id_lookup[id_alphabet] = np.arange(len(id_alphabet))
+
+
+def encode_ids(codes, chunk=1 << 20):
+    '''
+    Maps integer ID codes onto their 12-character A-Z0-9 IDs, returned as an
+    S12 (bytes) array of 12 bytes per ID. Codes are encoded `chunk` at a time
+    so the digit temporaries stay small for any number of IDs.
+    '''
+    codes = np.asarray(codes, dtype=np.int64)
+    chars = np.empty((len(codes), id_length), dtype=np.uint8)
+    for start in range(0, len(codes), chunk):
+        rest = codes[start:start + chunk]
+        for k in range(id_length - 1, -1, -1):
+            rest, digit = np.divmod(rest, 36)
+            chars[start:start + chunk, k] = id_alphabet[digit]
+    return chars.view('S%d' % id_length).ravel()
+
+
+def decode_ids(ids):
+    '''Inverse of encode_ids, returns the int64 codes of TransactionID strings.'''
+    chars = np.asarray(ids, dtype='S%d' % id_length).view(np.uint8).reshape(-1, id_length)
+    return _id_lookup[chars] @ _id_powers
+
+
+def id_stream(seed):
+    '''
+    The RandomState TransactionIDs are drawn from for a simulation seeded with
+    `seed`: a spawned child of SeedSequence(seed), so drawing IDs never shifts
+    the simulation's own draws.
+    '''
+    return np.random.RandomState(np.random.MT19937(np.random.SeedSequence(seed).spawn(1)[0]))
+
+
+def _repeats(codes):
+    '''Mask of the codes equal to an earlier code. A plain sort rules out repeats, the usual case, in one pass.'''
+    ordered = np.sort(codes)
+    if not (ordered[1:] == ordered[:-1]).any():
+        return np.zeros(len(codes), dtype=bool)
+    _, first = np.unique(codes, return_index=True)
+    repeats = np.ones(len(codes), dtype=bool)
+    repeats[first] = False
+    return repeats
+
+
+def transaction_ids(n, rs=np.random, id_range=(0, id_space), exclude=None):
+    '''
+    Draws `n` unique TransactionIDs (an S12 array, see encode_ids) in one
+    vectorized call from the generator `rs`, so IDs are reproducible from the
+    seed of its stream (see id_stream).
+
+    Codes are drawn uniformly from `id_range` (a sub-range of the ID space lets
+    machines generated independently never collide) and any duplicates, or
+    codes already in `exclude`, are redrawn until every ID is unique.
+    '''
+    low, high = id_range
+    if high - low < n:
+        raise ValueError('id_range is too small for %d unique IDs' % n)
+    exclude = np.unique(exclude) if exclude is not None else np.empty(0, dtype=np.int64)
+
+    codes = rs.randint(low, high, size=n, dtype=np.int64)
+    while True:
+        redraw = _repeats(codes)
+        if len(exclude):
+            redraw |= np.isin(codes, exclude)
+        n_redraw = redraw.sum()
+        if not n_redraw:
+            break
+        codes[redraw] = rs.randint(low, high, size=n_redraw, dtype=np.int64)
+
+    return encode_ids(codes)
+
+
+def withdrawal_sequence(init, limit, rs=np.random):
+    '''
+    Simulates one medication's inventory level until its (limit + 1)th refill.
+
+    The first transaction withdraws a single unit from the starting inventory
+    (`init`), after which 1-3 units are withdrawn at a time until the machine
+    stocks out and is refilled back to `init`. The withdrawals are drawn as a
+    single cumulative sum and split at each stock-out, consuming exactly the
+    same random numbers (in the same order) as the original row-wise loop.
+
+    Returns the remaining amounts and a boolean mask of refill transactions.
+    '''
+    n_segments = limit + 1
+    state = rs.get_state()
+    draws = rs.choice([1, 2, 3], n_segments * init) # upper bound, each withdrawal takes at least 1 unit
+    cum = np.cumsum(draws)
+
+    seg_start = np.full(n_segments, init)
+    seg_start[0] = init - 1
+    seg_base = np.zeros(n_segments, dtype=np.int64)
+    seg_len = np.zeros(n_segments, dtype=np.int64)
+
+    # Locating each stock-out, i.e. the first draw where the running withdrawal total meets the segment's inventory
+    pos, base = 0, 0
+    for s in range(n_segments):
+        seg_base[s] = base
+        if seg_start[s] > 0:
+            end = np.searchsorted(cum, base + seg_start[s], side='left')
+            seg_len[s] = end - pos + 1
+            pos, base = end + 1, cum[end]
+
+    # Re-winding the generator and consuming only the draws that were used
+    rs.set_state(state)
+    if pos > 0:
+        rs.choice([1, 2, 3], pos)
+
+    withdrawn = np.maximum(0, np.repeat(seg_start, seg_len) - (cum[:pos] - np.repeat(seg_base, seg_len)))
+
+    n_rows = 1 + pos + n_segments
+    refill_pos = 1 + np.cumsum(seg_len) + np.arange(n_segments)
+    is_refill = np.zeros(n_rows, dtype=bool)
+    is_refill[refill_pos] = True
+
+    amounts = np.empty(n_rows, dtype=np.int64)
+    amounts[0] = init - 1
+    amounts[refill_pos] = init
+    amounts[1:][~is_refill[1:]] = withdrawn
+
+    return amounts, is_refill
+
+
+def simulate_machine(med_names, rarities, machine, init_units, stockout_range, rs=np.random,
+                     id_range=(0, id_space), id_rs=None):
+    '''
+    Builds the transaction data frame for one ADS machine.
+
+    `med_names` and `rarities` are parallel sequences giving each stocked
+    medication and its rarity class, which keys both `init_units` and
+    `stockout_range`. Medications are simulated in the order given and the
+    data frame is constructed once from the concatenated arrays. TransactionIDs
+    are drawn within `id_range` from `id_rs`, a stream of their own (see
+    id_stream), so the withdrawal draws from `rs` are the same with or without
+    them. Without `id_rs` the stream is seeded from the current state of `rs`,
+    which is left as it is.
+    '''
+    amounts, refills, meds = [], [], []
+    for med, rarity in zip(med_names, rarities):
+        limit = rs.choice(stockout_range[rarity])
+        med_amounts, med_refills = withdrawal_sequence(init_units[rarity], limit, rs)
+        amounts.append(med_amounts)
+        refills.append(med_refills)
+        meds.append(np.repeat(med, len(med_amounts)))
+
+    amounts = np.concatenate(amounts) if amounts else np.empty(0, dtype=np.int64)
+    refills = np.concatenate(refills) if refills else np.empty(0, dtype=bool)
+    n_rows = len(amounts)
+    if id_rs is None:
+        id_rs = np.random.RandomState(np.random.MT19937(np.random.SeedSequence(rs.get_state()[1])))
+
+    return pd.DataFrame({'TransactionID':pd.array(transaction_ids(n_rows, id_rs, id_range), dtype='str'),
+                         'Machine':machine,
+                         'Day':'day',
+                         'Medication':np.concatenate(meds) if meds else np.empty(0, dtype=object),
+                         'Type':np.where(refills, 'Refill', 'Withdrawal'),
+                         'AmtRemaining':amounts}, columns=transaction_cols)
+
+
+def assign_days(transactions, start='2020-01-01', days=365):
+    '''
+    Spreads each medication's transactions evenly over the year, replacing the
+    per-row datetime loop. Rows are numbered within each medication and mapped
+    to day round(days * TransactNo / StockOutFreq) after `start`.
+    '''
+    transactions = transactions.reset_index(drop=True)
+    by_med = transactions.groupby('Medication', sort=False)
+    transact_no = by_med.cumcount() + 1
+    stockout_freq = by_med['Medication'].transform('size')
+    day_num = np.round(days * transact_no / stockout_freq)
+
+    transactions['Day'] = (pd.Timestamp(start) + pd.to_timedelta(day_num, unit='D')).dt.strftime('%Y-%m-%d')
+    return transactions
+
+
+def machine_rarity(meds, config):
+    '''
+    Resolves each medication's rarity class on one machine from the machine's
+    `rarity_cols` (first non-'None' column wins) and its `special_low` /
+    `special_high` overrides. Medications not stocked on the machine are dropped.
+    '''
+    rarity = pd.Series('None', index=meds.index, dtype=object)
+    for col in reversed(config['rarity_cols']):
+        rarity = rarity.where(meds[col].isna() | (meds[col] == 'None'), meds[col])
+
+    stocked = rarity != 'None'
+    rarity[meds['Med_Name'].isin(config.get('special_low', [])) & stocked] = 'SpecialLow'
+    rarity[meds['Med_Name'].isin(config.get('special_high', [])) & stocked] = 'SpecialHigh'
+
+    return pd.DataFrame({'Med_Name':meds['Med_Name'], 'Rarity':rarity})[stocked].reset_index(drop=True)
+
+
+def _run_machine(args):
+    med_rarity, config, seed_seq, init_units, stockout_range, id_range = args
+
+    rs = np.random.RandomState(np.random.MT19937(seed_seq))
+    id_rs = np.random.RandomState(np.random.MT19937(seed_seq.spawn(1)[0]))
+
+    transactions = simulate_machine(med_rarity['Med_Name'], med_rarity['Rarity'], config['machine'],
+                                    config.get('init_units', init_units),
+                                    config.get('stockout_range', stockout_range), rs, id_range, id_rs)
+    return assign_days(transactions)
+
+
+def iter_fleet(meds, machines=default_machines, seed=8114, workers=None,
+               init_units=default_init_units, stockout_range=default_stockout_range):
+    '''
+    Simulates every machine in `machines`, yielding one transaction data frame
+    per machine in config order.
+
+    Each machine config is a dict with a `machine` ID, its `rarity_cols` in
+    priority order and optional `special_low` / `special_high` medication lists.
+    A machine may also carry its own `init_units` / `stockout_range`, otherwise
+    the fleet-wide dictionaries are used. Machines run in a process pool of
+    `workers` processes (all cores by default, run in-process when workers=1),
+    and each is seeded with its own child of SeedSequence(seed). Each machine
+    also draws its TransactionIDs, from a child stream of its own seed, within
+    its own slice of the ID space, so IDs are unique across the fleet. At most two machines per worker are in flight, so
+    memory stays bounded for any fleet size.
+    '''
+    seed_seqs = np.random.SeedSequence(seed).spawn(len(machines))
+    id_span = id_space // len(machines)
+    tasks = ((machine_rarity(meds, config), config, seed_seq, init_units, stockout_range,
+              (k * id_span, (k + 1) * id_span))
+             for k, (config, seed_seq) in enumerate(zip(machines, seed_seqs)))
+
+    if workers == 1:
+        for task in tasks:
+            yield _run_machine(task)
+        return
+
+    window = 2 * (workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(_run_machine, task))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def simulate_fleet(meds, machines=default_machines, seed=8114, workers=None,
+                   init_units=default_init_units, stockout_range=default_stockout_range):
+    '''
+    Simulates every machine in `machines` (see iter_fleet) and returns one
+    transaction data frame.
+    '''
+    return pd.concat(iter_fleet(meds, machines, seed, workers, init_units, stockout_range), ignore_index=True)
+
+
+def load_machines(config_fp):
+    '''
+    Reads a JSON list of machine configs. `stockout_range` entries may be given
+    as [low, high] pairs and are converted to ranges.
+    '''
+    with open(config_fp) as f:
+        machines = json.load(f)
+    for config in machines:
+        if 'stockout_range' in config:
+            config['stockout_range'] = {k:range(*v) for k, v in config['stockout_range'].items()}
+    return machines
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simulate ADS machine transactions for a fleet of machines')
+    parser.add_argument('meds', help='medication workbook with Med_Name and *_Rarity columns (e.g. Sample_Med_Names.xlsx)')
+    parser.add_argument('--config', help='JSON list of machine configs, defaults to the three St. Jude machines')
+    parser.add_argument('--seed', type=int, default=8114)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--out', default='Fleet_Transactions.csv',
+                        help='output CSV, or the output directory when --format is given')
+    parser.add_argument('--format', choices=['parquet', 'csv'],
+                        help='stream machine/month partitions to --out instead of writing one CSV')
+    parser.add_argument('--overwrite', action='store_true', help='replace partitions already in --out')
+    args = parser.parse_args()
+
+    meds = pd.read_excel(args.meds, keep_default_na=False)
+    machines = load_machines(args.config) if args.config else default_machines
+
+    if args.format:
+        from stockout_writer import write_partitioned
+        write_partitioned(iter_fleet(meds, machines, args.seed, args.workers), args.out, args.format,
+                          medications=sorted(meds['Med_Name']), overwrite=args.overwrite)
+    else:
+        simulate_fleet(meds, machines, args.seed, args.workers).to_csv(args.out, index=False)
@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming Stock-Out Monitor
+Written: 10/18/2026
+Updated: 10/18/2026
+
+Follows ADS cabinet transactions as they arrive rather than counting refills
+after the fact. Events are (TransactionID, Machine, Day, Medication, Type,
+AmtRemaining) tuples, the schema of the transaction files, from any iterator
+(iter_csv), a file that is still being written (tail_csv) or an asyncio queue
+(consume).
+
+The monitor keeps one slot per (machine, medication) in flat arrays: the
+units remaining, the largest level seen (the capacity the low-stock
+threshold is a fraction of), withdrawal, refill and stock-out counts, and
+the slot's alert state. An event costs one dict lookup and a few array
+updates. An alert is raised when a slot goes from ok to low stock
+(AmtRemaining at or below low_stock x capacity) or from ok or low to out
+of stock, and a refill resets the slot to ok.
+
+Alerts are queued by priority: emergency medications (EmergencyStatus ==
+'Yes' in MEDICATIONS.csv) first, stock-outs before low stock. The queue keeps
+the max_alerts highest priority alerts, so an undrained monitor (and its
+checkpoints) stays bounded. The state can
+be checkpointed and restored, together with how far its source got (the
+byte offset reached in a followed file, or the number of events taken from a
+queue), so a restart picks up where it left off instead of replaying the
+history.
+
+    monitor = InventoryMonitor.from_csv('../MEDICATIONS.csv')
+    monitor.run(replay_events('..'))
+    monitor.drain_alerts(10), monitor.status()
+    tail_csv(monitor, 'live_transactions.csv', 'monitor.ckpt')        # follows the file until stopped
+    tail_csv(monitor, '../Onc_Derm_Transactions.csv', machine=3, idle_timeout=1)
+
+Usage: python stockout_monitor.py .. --repeat 5
+"""
+
+# Modules
+
+import pandas as pd
+import numpy as np
+import argparse, asyncio, csv, heapq, json, os, sys, time
+from array import array
+from collections import namedtuple
+
+# The shared dataset loader sits two folders up, in Use Cases
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from datasets import read_dataset
+
+
+# Transaction files shipped with the use case and the machine each one belongs to (the Machine column of the
+# shipped files is 1 throughout, see stockout_analytics.py)
+transaction_files = {'EmergencyDepartmentTransactions.csv':1,
+                     'Neuro_Surgery_Transactions.csv':2,
+                     'Onc_Derm_Transactions.csv':3}
+
+transaction_cols = ['TransactionID', 'Machine', 'Day', 'Medication', 'Type', 'AmtRemaining']
+
+# Slot states, and the alert raised on entering each
+OK, LOW, OUT = 0, 1, 2
+alert_kinds = {LOW:'Low Stock', OUT:'Stock-Out'}
+
+Alert = namedtuple('Alert', ['priority', 'kind', 'machine', 'medication', 'emergency', 'level', 'capacity', 'day',
+                             'transaction_id'])
+
+
+def alert_priority(emergency, state):
+    '''0 (emergency stock-out) to 3 (non-emergency low stock), lower first.'''
+    return 2 * (not emergency) + (state == LOW)
+
+
+class InventoryMonitor:
+    '''
+    Running stock levels and alerts per (machine, medication).
+
+    `emergency` is the set of emergency status medication names. A slot is
+    low on stock when AmtRemaining <= low_stock x its capacity (the most
+    units seen in it). `on_alert`, when given, is called with each Alert as
+    it is raised. Alerts are also queued until drain_alerts(), up to
+    `max_alerts` of them (None for no limit): past that the lowest priority,
+    newest alerts are dropped and counted in alerts_dropped.
+    '''
+
+    def __init__(self, emergency=(), low_stock=0.25, on_alert=None, max_alerts=10000):
+        self.emergency = set(emergency)
+        self.low_stock = low_stock
+        self.on_alert = on_alert
+        self.max_alerts = max_alerts
+        self.events = 0
+        self.alerts_dropped = 0
+        # How far the event source got, saved with checkpoints: bytes of the file tail_csv follows, and events taken
+        # from consume's queue
+        self.byte_offset = None
+        self.events_consumed = 0
+
+        self._slots = {}
+        self.keys = [] # (machine, medication) of each slot
+        self.level = array('i')
+        self.capacity = array('i')
+        self.withdrawals = array('q')
+        self.refills = array('q')
+        self.stockouts = array('q')
+        self.state = array('b')
+        self.is_emergency = array('b')
+        self._alerts = []
+        self._alert_no = 0
+
+    @classmethod
+    def from_csv(cls, medications_fp, **kwargs):
+        '''A monitor with the emergency medications of a MEDICATIONS.csv file.'''
+        meds = read_dataset(medications_fp, schema='medications', columns=['Med_Name', 'EmergencyStatus'])
+        return cls(meds.loc[meds['EmergencyStatus'] == 'Yes', 'Med_Name'], **kwargs)
+
+    def _add_slot(self, key):
+        slot = len(self.keys)
+        self._slots[key] = slot
+        self.keys.append(key)
+        for values in (self.level, self.capacity, self.withdrawals, self.refills, self.stockouts, self.state):
+            values.append(0)
+        self.is_emergency.append(key[1] in self.emergency)
+        return slot
+
+    def update(self, event):
+        '''Applies one event (a tuple in transaction_cols order), returning its alert or None.'''
+        transaction_id, machine, day, medication, kind, amount = event
+        slot = self._slots.get((machine, medication))
+        if slot is None:
+            slot = self._add_slot((machine, medication))
+        self.events += 1
+        self.level[slot] = amount
+        if amount > self.capacity[slot]:
+            self.capacity[slot] = amount
+
+        if kind == 'Refill':
+            self.refills[slot] += 1
+            self.state[slot] = OK
+            return None
+        self.withdrawals[slot] += 1
+        if amount <= 0:
+            state = OUT
+        elif amount <= self.low_stock * self.capacity[slot]:
+            state = LOW
+        else:
+            state = OK
+        if state <= self.state[slot]: # already alerted (or recovered without a refill)
+            if state == OK:
+                self.state[slot] = OK
+            return None
+
+        self.state[slot] = state
+        if state == OUT:
+            self.stockouts[slot] += 1
+        emergency = bool(self.is_emergency[slot])
+        alert = Alert(alert_priority(emergency, state), alert_kinds[state], machine, medication, emergency, amount,
+                      self.capacity[slot], day, transaction_id)
+        self._alert_no += 1
+        heapq.heappush(self._alerts, (alert.priority, self._alert_no, alert))
+        if self.max_alerts is not None and len(self._alerts) >= 2 * self.max_alerts + 1: # trimmed in batches
+            self._trim_alerts()
+        if self.on_alert is not None:
+            self.on_alert(alert)
+        return alert
+
+    def run(self, events):
+        '''Applies every event of an iterable, returning the number applied.'''
+        update, n = self.update, 0
+        for event in events:
+            update(event)
+            n += 1
+        return n
+
+    def _trim_alerts(self):
+        '''Drops all but the max_alerts highest priority queued alerts.'''
+        if self.max_alerts is not None and len(self._alerts) > self.max_alerts:
+            self.alerts_dropped += len(self._alerts) - self.max_alerts
+            self._alerts = heapq.nsmallest(self.max_alerts, self._alerts) # sorted, so still a heap
+
+    def drain_alerts(self, n=None):
+        '''Removes and returns the `n` (default all) highest priority queued alerts, oldest first within a priority.'''
+        self._trim_alerts()
+        out = []
+        while self._alerts and (n is None or len(out) < n):
+            out.append(heapq.heappop(self._alerts)[2])
+        return out
+
+    def status(self):
+        '''Current state of every (machine, medication) seen, as a data frame.'''
+        index = pd.MultiIndex.from_tuples(self.keys, names=['Machine', 'Medication'])
+        states = np.array(['OK', 'Low Stock', 'Stock-Out'])
+        return pd.DataFrame({'AmtRemaining':np.frombuffer(self.level, dtype=np.int32),
+                             'Capacity':np.frombuffer(self.capacity, dtype=np.int32),
+                             'Withdrawals':np.frombuffer(self.withdrawals, dtype=np.int64),
+                             'Refills':np.frombuffer(self.refills, dtype=np.int64),
+                             'StockOuts':np.frombuffer(self.stockouts, dtype=np.int64),
+                             'State':states[np.frombuffer(self.state, dtype=np.int8)],
+                             'Emergency':np.frombuffer(self.is_emergency, dtype=np.int8).astype(bool)}, index=index)
+
+    def save(self, fp):
+        '''Checkpoints the state (with byte_offset and events_consumed) to `fp`, replacing it atomically.'''
+        self._trim_alerts()
+        arrays = {name:np.frombuffer(getattr(self, name), dtype=getattr(self, name).typecode)
+                  for name in ('level', 'capacity', 'withdrawals', 'refills', 'stockouts', 'state', 'is_emergency')}
+        meta = {'keys':[[int(m) if isinstance(m, (int, np.integer)) else m, med] for m, med in self.keys],
+                'emergency':sorted(self.emergency), 'low_stock':self.low_stock, 'events':self.events,
+                'byte_offset':self.byte_offset, 'events_consumed':self.events_consumed,
+                'max_alerts':self.max_alerts, 'alerts_dropped':self.alerts_dropped,
+                'alerts':[[p, k, [_plain(v) for v in a], isinstance(a.day, pd.Timestamp)] for p, k, a in self._alerts],
+                'alert_no':self._alert_no}
+        tmp = fp + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(tmp, fp)
+
+    @classmethod
+    def load(cls, fp, on_alert=None):
+        '''A monitor restored from a checkpoint.'''
+        with np.load(fp) as saved:
+            meta = json.loads(str(saved['meta']))
+            monitor = cls(meta['emergency'], meta['low_stock'], on_alert, meta['max_alerts'])
+            for name in ('level', 'capacity', 'withdrawals', 'refills', 'stockouts', 'state', 'is_emergency'):
+                getattr(monitor, name).frombytes(saved[name].tobytes())
+        monitor.keys = [tuple(key) for key in meta['keys']]
+        monitor._slots = {key:slot for slot, key in enumerate(monitor.keys)}
+        monitor.events, monitor.byte_offset, monitor.events_consumed = (meta['events'], meta['byte_offset'],
+                                                                        meta['events_consumed'])
+        monitor.alerts_dropped = meta['alerts_dropped']
+        monitor._alerts = [(p, k, Alert(*a)._replace(day=pd.Timestamp(a[7])) if timestamp else Alert(*a))
+                           for p, k, a, timestamp in meta['alerts']]
+        heapq.heapify(monitor._alerts)
+        monitor._alert_no = meta['alert_no']
+        return monitor
+
+
+def _plain(value):
+    '''An alert field as json can write it: Timestamps as ISO strings, numpy scalars as Python ones.'''
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _parser(header, machine=None):
+    '''Turns a csv row into an event tuple, given the file's header (any extra columns, e.g. an index, are skipped).'''
+    k = [header.index(c) for c in transaction_cols]
+    if machine is None:
+        return lambda row: (row[k[0]], int(row[k[1]]), row[k[2]], row[k[3]], row[k[4]], int(row[k[5]]))
+    return lambda row: (row[k[0]], machine, row[k[2]], row[k[3]], row[k[4]], int(row[k[5]]))
+
+
+def iter_csv(fp, machine=None):
+    '''The events of a transaction csv file in file order, the Machine column replaced by `machine` when given.'''
+    with open(fp, newline='') as f:
+        reader = csv.reader(f)
+        parse = _parser(next(reader), machine)
+        for row in reader:
+            yield parse(row)
+
+
+def replay_events(data_dir='.', files=transaction_files):
+    '''
+    The shipped transaction files as one event stream in day order (each file
+    lists a medication's transactions together, so they are merged by Day,
+    keeping file order within a day).
+    '''
+    events = [event for fp, machine in files.items() for event in iter_csv(os.path.join(data_dir, fp), machine)]
+    events.sort(key=lambda event: event[2]) # stable, ISO dates sort as text
+    return events
+
+
+def tail_csv(monitor, fp, checkpoint_fp=None, machine=None, checkpoint_every=100000, poll=1.0, idle_timeout=None):
+    '''
+    Follows a transaction csv file that is being appended to, applying each
+    complete line as it arrives, the Machine column replaced by `machine`
+    when given (as in iter_csv). The byte offset reached is kept in
+    monitor.byte_offset and checkpointed every `checkpoint_every` events (and
+    on return), so a monitor restored from the checkpoint resumes at that
+    offset. Returns after `idle_timeout` seconds without new lines (never by
+    default).
+    '''
+    with open(fp, 'rb') as f:
+        header = f.readline().decode().rstrip('\r\n')
+        parse = _parser(next(csv.reader([header])), machine)
+        if monitor.byte_offset:
+            if monitor.byte_offset > os.fstat(f.fileno()).st_size:
+                raise ValueError('%s is shorter than the checkpointed offset (%d bytes), it is not the file the '
+                                 'checkpoint followed' % (fp, monitor.byte_offset))
+            f.seek(monitor.byte_offset)
+        update, since_checkpoint, idle = monitor.update, 0, 0.0
+        partial = b''
+        try:
+            while True:
+                lines = f.readlines()
+                if lines and partial:
+                    lines[0], partial = partial + lines[0], b''
+                if lines and not lines[-1].endswith(b'\n'): # keep a line still being written for later
+                    partial = lines.pop()
+                if not lines:
+                    if idle_timeout is not None and idle >= idle_timeout:
+                        break
+                    time.sleep(poll)
+                    idle += poll
+                    continue
+                idle = 0.0
+                for row in csv.reader(line.decode() for line in lines):
+                    if row:
+                        update(parse(row))
+                monitor.byte_offset = f.tell() - len(partial)
+                since_checkpoint += len(lines)
+                if checkpoint_fp and since_checkpoint >= checkpoint_every:
+                    monitor.save(checkpoint_fp)
+                    since_checkpoint = 0
+        finally:
+            if checkpoint_fp:
+                monitor.save(checkpoint_fp)
+    return monitor
+
+
+async def consume(monitor, queue, checkpoint_fp=None, checkpoint_every=100000):
+    '''
+    Applies events from an asyncio queue until it yields None. Events already
+    queued are applied without awaiting each one. monitor.events_consumed
+    counts the events taken from the queue.
+    '''
+    update, since_checkpoint = monitor.update, 0
+    while True:
+        event = await queue.get()
+        while event is not None:
+            update(event)
+            monitor.events_consumed += 1
+            since_checkpoint += 1
+            try:
+                event = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+        if checkpoint_fp and since_checkpoint >= checkpoint_every:
+            monitor.save(checkpoint_fp)
+            since_checkpoint = 0
+        if event is None:
+            break
+    if checkpoint_fp:
+        monitor.save(checkpoint_fp)
+    return monitor
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay the stock-out transaction files through the streaming monitor')
+    parser.add_argument('data_dir', nargs='?', default='..', help='folder of the transaction files and MEDICATIONS.csv')
+    parser.add_argument('--repeat', type=int, default=1, help='replay the files this many times (for timing)')
+    parser.add_argument('--low-stock', type=float, default=0.25)
+    args = parser.parse_args()
+
+    events = replay_events(args.data_dir)
+    monitor = InventoryMonitor.from_csv(os.path.join(args.data_dir, 'MEDICATIONS.csv'), low_stock=args.low_stock,
+                                        max_alerts=None) # all drained below
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        monitor.run(events)
+    seconds = time.perf_counter() - start
+    print('%d events in %.2f s (%.0f events/s)' % (monitor.events, seconds, monitor.events / seconds))
+
+    alerts = pd.DataFrame(monitor.drain_alerts(), columns=Alert._fields)
+    print(alerts.groupby(['priority', 'kind', 'emergency']).size().rename('Alerts').to_string())
+    print(monitor.status().sort_values('StockOuts', ascending=False).head(10).to_string())
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+Stock-Out Par-Level Optimizer
+Written: 10/18/2026
+Updated: 10/18/2026
+
+Computes par levels rather than hard-coding them (as init_units does in
+StockOuts_DataSim.py). Every medication on every machine is simulated under a
+grid of (reorder point, max level) policies in one Monte Carlo batch: the state
+is a (series x policy x path) array stepped one day at a time, and every policy
+sees the same simulated demand. The cheapest policy meeting the target
+stock-out rate is returned, with a stricter target for EmergencyStatus == 'Yes'
+medications.
+
+Daily demand (units) comes either from the transaction CSVs, by resampling
+each series' observed daily usage (demand_from_store), or from the simulator's
+rarity classes as compound Poisson draws (demand_from_rarity).
+"""
+
+# Modules
+
+import pandas as pd
+import numpy as np
+
+from stockout_demand import rarity_daily_rate
+from stockout_engine import default_init_units, default_stockout_range
+
+
+def demand_from_store(store):
+    '''
+    Units withdrawn per calendar day for each (machine, medication) series of a
+    stockout_analytics.StockOutStore. A withdrawal's units are the drop in
+    AmtRemaining from the previous transaction of the same series.
+
+    Returns the series (Machine, Medication) and a (series x day) array.
+    '''
+    tx = store.transactions
+    machine = tx['Machine'].to_numpy()
+    med = tx['Medication'].cat.codes.to_numpy()
+    amt = tx['AmtRemaining'].to_numpy().astype(np.int64)
+    withdrawal = (tx['Type'] == 'Withdrawal').to_numpy()
+    day = tx['Day'].to_numpy().astype('datetime64[D]')
+
+    new_group = np.ones(len(tx), dtype=bool)
+    new_group[1:] = (machine[1:] != machine[:-1]) | (med[1:] != med[:-1])
+    group = np.cumsum(new_group) - 1
+    starts = np.flatnonzero(new_group)
+
+    units = np.zeros(len(tx), dtype=np.int64)
+    units[1:] = amt[:-1] - amt[1:]
+    units[new_group | ~withdrawal] = 0
+    units = np.maximum(units, 0)
+
+    first_day = day.min() if len(day) else np.datetime64('2020-01-01')
+    n_days = int((day.max() - first_day).astype(np.int64)) + 1 if len(day) else 1
+    day_idx = (day - first_day).astype(np.int64)
+
+    daily = np.zeros((len(starts), n_days), dtype=np.int64)
+    np.add.at(daily, (group, day_idx), units)
+
+    categories = tx['Medication'].cat.categories
+    series = pd.DataFrame({'Machine':machine[starts], 'Medication':categories[med[starts]]})
+    return series, daily
+
+
+def demand_from_rarity(rarities, n_paths, n_days, rng, init_units=default_init_units,
+                       stockout_range=default_stockout_range):
+    '''
+    Compound Poisson daily demand for a sequence of rarity classes: a Poisson
+    number of withdrawals per day (rate as in stockout_demand) of 1-3 units each.
+    Returns a (series x path x day) array.
+    '''
+    rates = rarity_daily_rate(init_units, stockout_range)
+    lam = np.array([rates[r] for r in rarities], dtype=np.float64)
+    n = rng.poisson(lam[:, None, None], size=(len(lam), n_paths, n_days))
+    n1 = rng.binomial(n, 1/3)
+    n2 = rng.binomial(n - n1, 1/2)
+    return n1 + 2 * n2 + 3 * (n - n1 - n2)
+
+
+def policy_grid(mean_demand, reorder_days=(0, 0.5, 1, 2, 3, 5), order_days=(1, 2, 3, 5, 7, 14)):
+    '''
+    (reorder point, max level) policies per series, scaled by its mean daily
+    demand: reorder at `reorder_days` of cover, top up by `order_days` of cover.
+    Returns two (series x policy) integer arrays.
+    '''
+    mu = np.asarray(mean_demand, dtype=np.float64)[:, None, None]
+    reorder = np.ceil(mu * np.asarray(reorder_days)[None, :, None])
+    order = np.maximum(1, np.ceil(mu * np.asarray(order_days)[None, None, :]))
+    reorder, order = np.broadcast_arrays(reorder, order)
+    reorder = reorder.reshape(len(mu), -1).astype(np.int64)
+    return reorder, reorder + order.reshape(len(mu), -1).astype(np.int64)
+
+
+def simulate_policies(demand, reorder, max_level, lead_time=1):
+    '''
+    Runs every (s, S) policy against simulated demand.
+
+    `demand` is (series x path x day), `reorder` and `max_level` are
+    (series x policy). Inventory starts at S; a day is a stock-out when demand
+    exceeds what is on hand. When inventory ends a day at or below s (with no
+    order outstanding) it is topped up to S after `lead_time` days (0 refills
+    immediately). Returns the stock-out rate, refills per day and mean units on
+    hand, each (series x policy).
+    '''
+    n_series, n_paths, n_days = demand.shape
+    s = reorder[:, :, None].astype(np.int32)
+    S = max_level[:, :, None].astype(np.int32)
+    by_day = np.ascontiguousarray(np.moveaxis(demand, 2, 0), dtype=np.int32)[:, :, None, :]
+
+    shape = (n_series, reorder.shape[1], n_paths)
+    inv = np.broadcast_to(S, shape).astype(np.int32)
+    due = np.full(shape, -1, dtype=np.int32) # days until an outstanding order arrives, -1 when none
+    qty = np.zeros(shape, dtype=np.int32)
+    stockouts = np.zeros(shape, dtype=np.int32)
+    refills = np.zeros(shape, dtype=np.int32)
+    on_hand = np.zeros(shape, dtype=np.int64)
+
+    for t in range(n_days):
+        if lead_time:
+            inv += qty * (due == 0)
+            due -= due >= 0
+
+        d = by_day[t]
+        stockouts += d > inv
+        np.subtract(inv, d, out=inv)
+        np.maximum(inv, 0, out=inv)
+        on_hand += inv
+
+        order = inv <= s
+        if lead_time == 0:
+            refills += order
+            np.copyto(inv, S, where=order)
+        else:
+            order &= due < 0
+            refills += order
+            np.copyto(qty, S - inv, where=order)
+            np.copyto(due, lead_time - 1, where=order)
+
+    return stockouts.mean(axis=2) / n_days, refills.mean(axis=2) / n_days, on_hand.mean(axis=2) / n_days
+
+
+def optimize_par_levels(series, demand, emergency, target=0.02, emergency_target=0.002, lead_time=1,
+                        refill_cost=1.0, holding_cost=0.01, reorder_days=(0, 0.5, 1, 2, 3, 5),
+                        order_days=(1, 2, 3, 5, 7, 14)):
+    '''
+    Picks each series' cheapest (s, S) policy meeting its target stock-out rate
+    (share of days with a stock-out). Cost per day is refill_cost per refill
+    plus holding_cost per unit on hand. Series with no feasible policy get the
+    one with the lowest stock-out rate and Feasible = False.
+
+    `series` is a data frame with one row per series, `demand` its
+    (series x path x day) demand and `emergency` a boolean array marking
+    EmergencyStatus == 'Yes' series.
+    '''
+    reorder, max_level = policy_grid(demand.mean(axis=(1, 2)), reorder_days, order_days)
+    rate, refills, on_hand = simulate_policies(demand, reorder, max_level, lead_time)
+    cost = refill_cost * refills + holding_cost * on_hand
+
+    series_target = np.where(emergency, emergency_target, target)
+    feasible = rate <= series_target[:, None]
+    best = np.where(feasible.any(axis=1),
+                    np.argmin(np.where(feasible, cost, np.inf), axis=1),
+                    np.argmin(rate, axis=1))
+    rows = np.arange(len(best))
+
+    return series.reset_index(drop=True).assign(EmergencyStatus=np.where(emergency, 'Yes', 'No'),
+                                                ReorderPoint=reorder[rows, best],
+                                                MaxLevel=max_level[rows, best],
+                                                StockoutRate=rate[rows, best],
+                                                TargetRate=series_target,
+                                                RefillsPerYear=refills[rows, best] * 365,
+                                                MeanOnHand=on_hand[rows, best],
+                                                Cost=cost[rows, best],
+                                                Feasible=feasible[rows, best])
+
+
+def optimize_from_store(store, n_paths=200, n_days=365, seed=8114, **kwargs):
+    '''Par levels for every series in a StockOutStore, resampling its observed daily demand.'''
+    rng = np.random.default_rng(seed)
+    series, daily = demand_from_store(store)
+    demand = np.take_along_axis(daily[:, None, :],
+                                rng.integers(0, daily.shape[1], size=(len(series), n_paths, n_days)), axis=2)
+    status = store.medications['EmergencyStatus'].reindex(series['Medication']).to_numpy()
+    return optimize_par_levels(series, demand, status == 'Yes', **kwargs)
+
+
+def optimize_from_rarity(med_rarity, emergency, n_paths=200, n_days=365, seed=8114, **kwargs):
+    '''
+    Par levels from the simulator's rarity classes, e.g. for the output of
+    stockout_engine.machine_rarity (columns Med_Name and Rarity).
+    '''
+    rng = np.random.default_rng(seed)
+    demand = demand_from_rarity(med_rarity['Rarity'], n_paths, n_days, rng)
+    return optimize_par_levels(med_rarity, demand, np.asarray(emergency), **kwargs)
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Stock-Out Transaction Writer
+Written: 10/18/2026
+Updated: 10/18/2026
+
+Streams simulated ADS transactions to disk as they are generated. Chunks (e.g.
+one machine at a time from stockout_engine.iter_fleet) are cast to a fixed
+schema and written to CSV or Parquet files partitioned by machine and month:
+
+    out_dir/machine_1/2020-01/part-00000.parquet
+
+Only one chunk is held in memory at a time, so the simulated horizon and fleet
+size are limited by disk rather than RAM. read_partitions() loads back only the
+machines/months requested. Part files are numbered by chunk, so an out_dir
+holding an earlier run is refused (or cleared with overwrite=True) rather than
+mixed with the new parts.
+"""
+
+# Modules
+
+import pandas as pd
+import numpy as np
+import glob, os, shutil
+
+from stockout_engine import transaction_cols, transaction_types
+
+
+def conform(chunk, medications=None):
+    '''
+    Casts a chunk of transactions to the fixed output schema: Day as a date,
+    Medication and Type as categoricals and Machine/AmtRemaining as small ints.
+    Passing the full `medications` list keeps the Medication categories
+    identical across every chunk and partition.
+    '''
+    chunk = chunk[transaction_cols]
+    return pd.DataFrame({'TransactionID':chunk['TransactionID'].astype(str),
+                         'Machine':chunk['Machine'].astype(np.int16),
+                         'Day':pd.to_datetime(chunk['Day']).dt.normalize(),
+                         'Medication':pd.Categorical(chunk['Medication'], categories=medications),
+                         'Type':pd.Categorical(chunk['Type'], categories=transaction_types),
+                         'AmtRemaining':chunk['AmtRemaining'].astype(np.int16)})
+
+
+def _arrow_schema():
+    import pyarrow as pa
+    return pa.schema([('TransactionID', pa.string()),
+                      ('Machine', pa.int16()),
+                      ('Day', pa.date32()),
+                      ('Medication', pa.dictionary(pa.int32(), pa.string())),
+                      ('Type', pa.dictionary(pa.int8(), pa.string())),
+                      ('AmtRemaining', pa.int16())])
+
+
+def _write_part(part, fp, fmt, schema):
+    if fmt == 'parquet':
+        import pyarrow as pa, pyarrow.parquet as pq
+        pq.write_table(pa.Table.from_pandas(part, schema=schema, preserve_index=False), fp)
+    else:
+        part.to_csv(fp, index=False, date_format='%Y-%m-%d')
+
+
+def write_partitioned(chunks, out_dir, fmt='parquet', medications=None, overwrite=False):
+    '''
+    Writes each chunk yielded by `chunks` as it arrives, one part file per
+    (machine, month) partition per chunk. `fmt` is 'parquet' or 'csv'.
+    Raises FileExistsError if `out_dir` already holds machine partitions,
+    unless `overwrite`, which removes them first. Returns the number of
+    transactions written.
+    '''
+    if fmt not in ('parquet', 'csv'):
+        raise ValueError('fmt must be "parquet" or "csv"')
+    existing = [d for d in glob.glob(os.path.join(out_dir, 'machine_*')) if os.path.isdir(d)]
+    if existing and not overwrite:
+        raise FileExistsError('%s already holds partitions from an earlier run, pass overwrite=True to replace them'
+                              % out_dir)
+    for d in existing:
+        shutil.rmtree(d)
+    schema = _arrow_schema() if fmt == 'parquet' else None
+
+    n_rows = 0
+    for chunk_no, chunk in enumerate(chunks):
+        chunk = conform(chunk, medications)
+        month = chunk['Day'].dt.strftime('%Y-%m')
+        for (machine, mon), part in chunk.groupby([chunk['Machine'], month], sort=False, observed=True):
+            part_dir = os.path.join(out_dir, 'machine_%d' % machine, mon)
+            os.makedirs(part_dir, exist_ok=True)
+            _write_part(part, os.path.join(part_dir, 'part-%05d.%s' % (chunk_no, fmt)), fmt, schema)
+        n_rows += len(chunk)
+
+    return n_rows
+
+
+def read_partitions(out_dir, machines=None, months=None, fmt='parquet', medications=None):
+    '''
+    Reads back the transactions for the requested machines and months
+    ('YYYY-MM' strings), defaulting to everything under `out_dir`.
+    '''
+    machine_dirs = ['machine_%d' % m for m in machines] if machines is not None else ['machine_*']
+    month_dirs = list(months) if months is not None else ['*']
+
+    files = sorted(fp for m in machine_dirs for mon in month_dirs
+                   for fp in glob.glob(os.path.join(out_dir, m, mon, '*.' + fmt)))
+    if not files:
+        return conform(pd.DataFrame(columns=transaction_cols), medications)
+
+    if fmt == 'parquet':
+        parts = [pd.read_parquet(fp) for fp in files]
+    else:
+        parts = [pd.read_csv(fp) for fp in files]
+    return conform(pd.concat(parts, ignore_index=True), medications)
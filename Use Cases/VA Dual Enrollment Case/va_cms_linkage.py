@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+"""
+VA and CMS Patient Linkage
+Written: 10/18/2026
+Updated: 10/18/2026
+
+Links the VA and CMS prescriptions by patient (steps 3b, 5 and 6 of the
+walkthrough) and finds the opioid exposure the two systems overlap on.
+
+Both ID formats (the VA's integers and the CMS's 123-45-6789 strings) are
+normalized to int64 keys in one vectorized pass. The keys are sorted once,
+so a patient's rows are found by binary search instead of a boolean mask
+over the whole frame, and dual enrollment is a merge join of the sorted
+distinct keys.
+
+Each prescription covers the days [Visit Date, Visit Date + Duration), e.g.
+a 30 day supply covers the visit day and the following 29. The interval join
+pairs each VA prescription with the same patient's overlapping CMS
+prescriptions by binary search over the sorted CMS rows, in chunks of
+bounded size. The concurrent MME is a sweep over the start and end events of
+every prescription, giving each patient's VA, CMS and total MME for every
+stretch of days on which it is constant (expandable to one row per
+patient-day).
+
+For extracts larger than memory, partition_csv splits each file by patient
+key into parquet partitions in one pass. Each partition pair then holds
+every prescription of its patients and is processed on its own. An out_dir
+holding partitions from an earlier run is refused (or cleared with
+overwrite=True) rather than mixed with the new ones.
+
+    va = prepare(read_dataset('VA_data.csv'), va_columns)          # datasets.py, in the Use Cases folder
+    cms = prepare(read_dataset('CMS_data.csv'), cms_columns)
+    dual_enrollment(va, cms)
+    overlapping_prescriptions(va, cms)
+    daily_mme(concurrent_mme(va, cms))
+"""
+
+# Modules
+
+import pandas as pd
+import numpy as np
+import glob, os
+
+from va_cms_normalize import normalize_claims, va_columns, cms_columns, output_columns
+
+# pyarrow writes the patient partitions of partition_csv
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+key_column = 'Patient Key'
+
+# Columns kept by prepare() for the linkage
+linkage_columns = [key_column, 'Visit Date', output_columns['medication'], output_columns['duration'],
+                   output_columns['opioid'], output_columns['mme']]
+
+
+def patient_keys(ids):
+    '''
+    int64 patient keys from integer IDs or formatted strings (e.g.
+    '646-97-9801'), with -1 where an ID has no digits or is missing.
+    '''
+    ids = pd.Series(ids)
+    if pd.api.types.is_integer_dtype(ids):
+        return ids.to_numpy(dtype=np.int64)
+    if not pd.api.types.is_numeric_dtype(ids):
+        ids = ids.astype('string').str.replace(r'\D', '', regex=True)
+    return pd.to_numeric(ids, errors='coerce').fillna(-1).to_numpy(dtype=np.int64)
+
+
+def day_numbers(dates):
+    '''Dates (strings or datetimes) as int64 days since 1970-01-01, with NaT as the minimum int64.'''
+    return pd.to_datetime(pd.Series(dates)).to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+
+def _dates(days):
+    '''Day numbers as datetime64[s] (which pandas stores without a conversion pass).'''
+    return (days * 86400).astype('datetime64[s]')
+
+
+def prepare(df, columns, id_column='Patient ID'):
+    '''
+    A VA or CMS frame normalized by va_cms_normalize (columns as in
+    va_columns/cms_columns) and reduced to the linkage columns, with the
+    patient key.
+    '''
+    out, _ = normalize_claims(df, columns)
+    out[key_column] = patient_keys(df[id_column])
+    return out[linkage_columns]
+
+
+class PatientIndex:
+    '''
+    Rows of a frame grouped by patient key: `keys` (the sorted distinct keys)
+    and, for the i-th key, the row positions order[starts[i]:starts[i + 1]].
+    '''
+
+    def __init__(self, keys):
+        keys = np.asarray(keys, dtype=np.int64)
+        self.order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[self.order]
+        first = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]) if len(keys) else np.zeros(0, int)
+        self.keys = sorted_keys[first]
+        self.starts = np.r_[first, len(keys)]
+
+    def rows(self, key):
+        '''Row positions of one patient (empty when absent).'''
+        i = np.searchsorted(self.keys, key)
+        if i == len(self.keys) or self.keys[i] != key:
+            return self.order[:0]
+        return self.order[self.starts[i]:self.starts[i + 1]]
+
+    def contains(self, keys):
+        '''Whether each of `keys` has rows in the index.'''
+        keys = np.asarray(keys, dtype=np.int64)
+        i = np.minimum(np.searchsorted(self.keys, keys), max(len(self.keys) - 1, 0))
+        return (self.keys[i] == keys) if len(self.keys) else np.zeros(len(keys), dtype=bool)
+
+    def counts(self):
+        return np.diff(self.starts)
+
+
+def dual_enrollment(va, cms):
+    '''
+    One row per VA patient with their VA and CMS prescription counts and the
+    Dual Enrollment indicator (1 when they have any CMS prescription).
+    '''
+    va_index, cms_index = PatientIndex(va[key_column]), PatientIndex(cms[key_column])
+    cms_counts = np.zeros(len(va_index.keys), dtype=np.int64)
+    both, va_pos, cms_pos = np.intersect1d(va_index.keys, cms_index.keys, assume_unique=True, return_indices=True)
+    cms_counts[va_pos] = cms_index.counts()[cms_pos]
+    return pd.DataFrame({key_column:va_index.keys, 'VA Prescriptions':va_index.counts(),
+                         'CMS Prescriptions':cms_counts, 'Dual Enrollment':(cms_counts > 0).astype(int)})
+
+
+def _windows(df, duration=output_columns['duration']):
+    '''Patient keys and [start, end) day numbers of each prescription, and which rows have a usable window.'''
+    key = df[key_column].to_numpy(dtype=np.int64)
+    start = day_numbers(df['Visit Date'])
+    days = pd.to_numeric(df[duration], errors='coerce').to_numpy(dtype=np.float64)
+    valid = (key >= 0) & (start != np.iinfo(np.int64).min) & np.isfinite(days) & (days > 0)
+    end = start + np.where(valid, np.ceil(days), 0).astype(np.int64)
+    return key, start, end, valid
+
+
+def _patient_day_order(key, day):
+    '''Order sorting rows by patient key then day, as one int64 argsort when the pair fits in an int64.'''
+    if len(key) == 0:
+        return np.zeros(0, dtype=np.int64)
+    low, span = day.min(), int(day.max()) - int(day.min()) + 1
+    if key.min() >= 0 and int(key.max()) < (1 << 62) // span:
+        return np.argsort(key * span + (day - low))
+    return np.lexsort((day, key))
+
+
+def overlapping_prescriptions(va, cms, opioids_only=True, max_pairs=5_000_000):
+    '''
+    Pairs of a VA and a CMS prescription of the same patient whose windows
+    overlap, with the overlap's first day, end (exclusive) and length. `VA Row`
+    and `CMS Row` are the rows' index labels. Candidate pairs are generated in
+    chunks of at most `max_pairs` (beyond a single prescription's own).
+    '''
+    parts = []
+    frames = []
+    for df in (va, cms):
+        key, start, end, valid = _windows(df)
+        if opioids_only:
+            valid &= df[output_columns['opioid']].to_numpy() == 1
+        frames.append((df.index.to_numpy()[valid], key[valid], start[valid], end[valid],
+                       df[output_columns['mme']].to_numpy(dtype=np.float64)[valid]))
+
+    (va_label, va_key, va_start, va_end, va_mme), (cms_label, cms_key, cms_start, cms_end, cms_mme) = frames
+    # Both sides sorted by patient, so the binary searches below walk the CMS keys in order
+    order = np.argsort(va_key, kind='stable')
+    va_label, va_key, va_start, va_end, va_mme = (a[order] for a in (va_label, va_key, va_start, va_end, va_mme))
+    order = np.argsort(cms_key, kind='stable')
+    cms_label, cms_key, cms_start, cms_end, cms_mme = (a[order] for a in (cms_label, cms_key, cms_start, cms_end,
+                                                                          cms_mme))
+
+    # The CMS rows of each VA prescription's patient, as a range of the sorted CMS rows
+    lo = np.searchsorted(cms_key, va_key, side='left')
+    n = np.searchsorted(cms_key, va_key, side='right') - lo
+    total = np.cumsum(n)
+    first = 0
+    while first < len(n):
+        done = total[first - 1] if first else 0
+        last = max(np.searchsorted(total, done + max_pairs, side='right'), first + 1)
+        counts = n[first:last]
+        va_rows = np.repeat(np.arange(first, last), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cms_rows = lo[va_rows] + offsets
+
+        overlap_start = np.maximum(va_start[va_rows], cms_start[cms_rows])
+        overlap_end = np.minimum(va_end[va_rows], cms_end[cms_rows])
+        hit = overlap_start < overlap_end
+        va_rows, cms_rows = va_rows[hit], cms_rows[hit]
+        parts.append(pd.DataFrame({key_column:va_key[va_rows], 'VA Row':va_label[va_rows],
+                                   'CMS Row':cms_label[cms_rows],
+                                   'Overlap Start':_dates(overlap_start[hit]),
+                                   'Overlap End':_dates(overlap_end[hit]),
+                                   'Overlap Days':overlap_end[hit] - overlap_start[hit],
+                                   'VA MME':va_mme[va_rows], 'CMS MME':cms_mme[cms_rows]}))
+        first = last
+    if not parts:
+        return pd.DataFrame(columns=[key_column, 'VA Row', 'CMS Row', 'Overlap Start', 'Overlap End', 'Overlap Days',
+                                     'VA MME', 'CMS MME'])
+    return pd.concat(parts, ignore_index=True)
+
+
+def concurrent_mme(va, cms, opioids_only=True):
+    '''
+    Each patient's concurrent VA, CMS and total MME over the stretches of days
+    on which they are constant: Start, End (exclusive), Days, the MME sums, the
+    number of active prescriptions per system and whether both are active.
+    Days without an active prescription are left out.
+    '''
+    keys, days, sources, signs, mmes = [], [], [], [], []
+    for source, df in enumerate((va, cms)):
+        key, start, end, valid = _windows(df)
+        mme = df[output_columns['mme']].to_numpy(dtype=np.float64)
+        if opioids_only:
+            valid &= df[output_columns['opioid']].to_numpy() == 1
+        valid &= np.isfinite(mme)
+        key, start, end, mme = key[valid], start[valid], end[valid], mme[valid]
+
+        # A prescription adds its MME on its first day and removes it on its end day
+        keys += [key, key]
+        days += [start, end]
+        sources.append(np.full(2 * len(key), source, dtype=np.int8))
+        signs.append(np.repeat(np.array([1, -1], dtype=np.int64), len(key)))
+        mmes += [mme, mme]
+    key, day = np.concatenate(keys), np.concatenate(days)
+    order = _patient_day_order(key, day)
+    key, day, source = key[order], day[order], np.concatenate(sources)[order]
+    sign, mme = np.concatenate(signs)[order], np.concatenate(mmes)[order]
+
+    # Running totals per system, restarted for each patient (the counts return to 0 by themselves)
+    patient_first = np.r_[True, key[1:] != key[:-1]] if len(key) else np.zeros(0, dtype=bool)
+    patient = np.cumsum(patient_first) - 1
+    totals = {}
+    for k, name in enumerate(('VA', 'CMS')):
+        delta = np.where(source == k, sign * mme, 0.0)
+        running = np.cumsum(delta)
+        totals[name + ' MME'] = running - (running - delta)[patient_first][patient]
+        totals[name + ' Prescriptions'] = np.cumsum(np.where(source == k, sign, 0))
+
+    # A stretch runs from one event day to the patient's next, while any prescription is active
+    last = np.r_[(key[1:] != key[:-1]) | (day[1:] != day[:-1]), True] if len(key) else np.zeros(0, dtype=bool)
+    key, day = key[last], day[last]
+    totals = {name:values[last] for name, values in totals.items()}
+    active = np.r_[key[1:] == key[:-1], False] & ((totals['VA Prescriptions'] + totals['CMS Prescriptions']) > 0)
+    start, end = day[active], np.r_[day[1:], 0][active]
+    va_rx, cms_rx = totals['VA Prescriptions'][active], totals['CMS Prescriptions'][active]
+    va_mme = np.where(va_rx > 0, totals['VA MME'][active], 0.0)
+    cms_mme = np.where(cms_rx > 0, totals['CMS MME'][active], 0.0)
+    return pd.DataFrame({key_column:key[active], 'Start':_dates(start),
+                         'End':_dates(end), 'Days':end - start,
+                         'VA MME':va_mme, 'CMS MME':cms_mme, 'Total MME':va_mme + cms_mme,
+                         'VA Prescriptions':va_rx, 'CMS Prescriptions':cms_rx,
+                         'Concurrent':(va_rx > 0) & (cms_rx > 0)})
+
+
+def daily_mme(stretches):
+    '''The stretches of concurrent_mme expanded to one row per patient-day.'''
+    days = stretches['Days'].to_numpy()
+    rows = np.repeat(np.arange(len(stretches)), days)
+    offset = np.arange(days.sum()) - np.repeat(np.cumsum(days) - days, days)
+    out = stretches.iloc[rows].drop(columns=['Start', 'End', 'Days']).reset_index(drop=True)
+    out.insert(1, 'Day', stretches['Start'].to_numpy()[rows] + offset.astype('timedelta64[D]'))
+    return out
+
+
+def partition_csv(fp, out_dir, columns, n_partitions=64, chunksize=1_000_000, id_column='Patient ID',
+                  overwrite=False):
+    '''
+    Splits a VA or CMS csv of any size into `n_partitions` parquet files by
+    patient key (prepared as by prepare()), reading it chunk by chunk. Every
+    prescription of a patient lands in the same partition number. Raises
+    FileExistsError if `out_dir` already holds partitions, unless
+    `overwrite`, which removes them first.
+    '''
+    if pa is None:
+        raise ImportError('partition_csv requires pyarrow (pip install pyarrow)')
+    existing = glob.glob(os.path.join(out_dir, 'part-*.parquet'))
+    if existing and not overwrite:
+        raise FileExistsError('%s already holds partitions from an earlier run, pass overwrite=True to replace them'
+                              % out_dir)
+    for part_fp in existing:
+        os.remove(part_fp)
+    os.makedirs(out_dir, exist_ok=True)
+    writers = {}
+    try:
+        for chunk in pd.read_csv(fp, chunksize=chunksize):
+            chunk = prepare(chunk, columns, id_column)
+            part = chunk[key_column].to_numpy() % n_partitions
+            for k in np.unique(part):
+                table = pa.Table.from_pandas(chunk[part == k], preserve_index=False)
+                if k not in writers:
+                    schema = table.schema.remove_metadata()
+                    writers[k] = pq.ParquetWriter(os.path.join(out_dir, 'part-%03d.parquet' % k), schema)
+                writers[k].write_table(table.cast(writers[k].schema))
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return out_dir
+
+
+def read_partition(out_dir, k):
+    '''One partition written by partition_csv (empty when no patient fell in it).'''
+    fp = os.path.join(out_dir, 'part-%03d.parquet' % k)
+    if not os.path.isfile(fp):
+        return pd.DataFrame({c:pd.Series(dtype=object) for c in linkage_columns}).astype({key_column:np.int64})
+    return pd.read_parquet(fp)
+
+
+def iter_partitions(va_dir, cms_dir, n_partitions=64):
+    '''Yields the (VA, CMS) prescriptions of each patient partition.'''
+    for k in range(n_partitions):
+        yield read_partition(va_dir, k), read_partition(cms_dir, k)
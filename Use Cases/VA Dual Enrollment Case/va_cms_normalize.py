@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+VA and CMS Prescription Normalization
+Written: 10/18/2026
+Updated: 10/18/2026
+
+Standardizes the medication, dose, duration and morphine milligram equivalent
+(MME) columns of the VA and CMS data (steps 2-4 of the walkthrough) from
+lookup tables instead of a per-row med_dose loop and nested np.where chains:
+
+  - dose_units: factor converting each dose unit to mg (mcg, mg, g)
+  - duration_units: days per duration unit (Day, Week, Month as 30 days)
+  - medication_names: raw medication text -> standardized name (meds_dict)
+  - mme_factors: MME per mg of each opioid
+
+Names missing from medication_names can also be resolved by the shared fuzzy
+normalizer (med_names.MedicationNormalizer in the Use Cases folder), passed
+as `normalizer`.
+
+Each lookup is applied to the distinct values of a column (a handful of units
+or names) and broadcast back through integer codes. A whole frame is then
+normalized in a few vectorized passes, and a file too large for memory chunk
+by chunk. Units, names and missing values the tables don't cover are left NaN
+and listed in the returned report rather than silently passed through.
+
+    va_data, unknown = normalize_claims(read_dataset('VA_data.csv'), va_columns)     # datasets.py, Use Cases folder
+    unknown = normalize_csv('CMS_data.csv', 'CMS_normalized.csv', cms_columns)
+"""
+
+# Modules
+
+import pandas as pd
+import numpy as np
+import os
+
+# pyarrow is only needed for writing normalized chunks to parquet
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+# Conversion factors to mg, keyed by lower case unit
+dose_units = {'mcg':0.001, 'ug':0.001, 'mg':1.0, 'g':1000.0}
+
+# Days per duration unit, keyed by lower case unit (a month counted as 30 days, as in the walkthrough)
+duration_units = {'day':1, 'days':1, 'week':7, 'weeks':7, 'month':30, 'months':30}
+
+# Standardized medication names, keyed by lower case raw value (the walkthrough's meds_dict)
+medication_names = {'bupernorphine':'buprenorphine', 'buprenorphine':'buprenorphine',
+                    'buprenorphine tablet':'buprenorphine', 'butorphanol':'butorphanol',
+                    'dihydrocodeine':'dihydrocodeine', 'dihydrocodeine-acetaminophin-caff':'dihydrocodeine',
+                    'tramadol':'tramadol', 'tramadol hcl':'tramadol', 'acetaminophen':'acetaminophen',
+                    'gabapentin':'gabapentin', 'ibuprofen':'ibuprofen'}
+
+# MME per mg of each opioid (other medications have an MME of 0)
+mme_factors = {'buprenorphine':30, 'butorphanol':7, 'dihydrocodeine':0.25, 'tramadol':0.1}
+
+# Input columns of each data set
+va_columns = {'medication':'Medication', 'dose':'Medication Dose', 'dose_unit':'Medication Dose Unit',
+              'duration':'Medication Duration Value', 'duration_unit':'Medication Duration Unit'}
+cms_columns = {'medication':'Medication', 'dose':'Medication Dose', 'dose_unit':'Medication Dose Unit',
+               'duration':'Medication Duration', 'duration_unit':'Duration Unit'}
+
+# Output columns, named as in the walkthrough
+output_columns = {'medication':'Medication', 'dose':'Dose Mg Recalc', 'duration':'Duration Recalc',
+                  'opioid':'Opioid', 'mme':'MME'}
+
+
+def _coded_lookup(values, table, fallback=None):
+    '''
+    Integer codes and distinct values of `values`, each distinct value looked
+    up in `table` (case and surrounding whitespace ignored), then by
+    `fallback(value)` when given (None or NaN where not found), and the row
+    counts of the values not found, including missing ones.
+    '''
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    uniques = np.asarray(uniques, dtype=object)
+    keys = pd.Index(uniques, dtype=object).astype(str).str.strip().str.lower()
+    found = np.array([table.get(k, np.nan) for k in keys], dtype=object)
+    if fallback is not None:
+        for k in np.flatnonzero(pd.isna(found)):
+            found[k] = fallback(uniques[k])
+
+    counts = np.bincount(codes + 1, minlength=len(uniques) + 1)
+    missing = pd.isna(found)
+    unknown_values = list(uniques[missing]) + ([np.nan] if counts[0] else [])
+    unknown_rows = list(counts[1:][missing]) + ([counts[0]] if counts[0] else [])
+    unknown = pd.Series(unknown_rows, index=pd.Index(unknown_values, dtype=object), dtype=np.int64)
+    return codes, uniques, found, unknown
+
+
+def _broadcast(codes, per_value, fill=np.nan):
+    '''Values per distinct value broadcast to the rows, code -1 (missing) taking `fill`.'''
+    return np.append(per_value, fill)[codes]
+
+
+def normalize_claims(df, columns, names=medication_names, mme=mme_factors, outputs=output_columns,
+                     normalizer=None):
+    '''
+    Normalized copy of a VA or CMS frame (columns as in va_columns/cms_columns)
+    with the standardized medication (categorical) and the dose in mg,
+    duration in days, opioid indicator and MME columns of `outputs`. Returns
+    the frame and a report of the unknown values (Column, Value, Rows).
+
+    Medications not in `names` are passed to `normalizer` (a
+    med_names.MedicationNormalizer) when given, and only those it can't
+    resolve are reported.
+    '''
+    report = []
+
+    def table_lookup(key, table, fallback=None):
+        codes, uniques, found, unknown = _coded_lookup(df[columns[key]], table, fallback)
+        report.append(pd.DataFrame({'Column':columns[key], 'Value':unknown.index, 'Rows':unknown.to_numpy()}))
+        return codes, uniques, found
+
+    codes, _, found = table_lookup('dose_unit', dose_units)
+    dose_factor = _broadcast(codes, found.astype(np.float64))
+    codes, _, found = table_lookup('duration_unit', duration_units)
+    day_factor = _broadcast(codes, found.astype(np.float64))
+
+    # Names and MME factors resolved per distinct medication, unrecognized names keeping their raw value
+    codes, uniques, found = table_lookup('medication', names, normalizer.normalize if normalizer else None)
+    standard = np.where(pd.isna(found), uniques, found)
+    categories, standard_codes = np.unique(standard.astype(str), return_inverse=True)
+    factor = np.array([mme.get(str(name).strip().lower(), np.nan) for name in standard], dtype=np.float64)
+
+    out = df.copy()
+    dose_mg = pd.to_numeric(df[columns['dose']], errors='coerce').to_numpy(dtype=np.float64) * dose_factor
+    opioid = _broadcast(codes, ~np.isnan(factor), fill=False)
+    out[outputs['medication']] = pd.Categorical.from_codes(_broadcast(codes, standard_codes, fill=-1),
+                                                           categories=categories)
+    out[outputs['dose']] = dose_mg
+    out[outputs['duration']] = (pd.to_numeric(df[columns['duration']], errors='coerce').to_numpy(dtype=np.float64)
+                                * day_factor)
+    out[outputs['opioid']] = opioid.astype(int)
+    out[outputs['mme']] = np.where(opioid, dose_mg * _broadcast(codes, np.nan_to_num(factor)), 0.0)
+    return out, pd.concat(report, ignore_index=True)
+
+
+def combine_reports(reports):
+    '''Sums unknown value reports (e.g. from several chunks).'''
+    reports = [r for r in reports if len(r)]
+    if not reports:
+        return pd.DataFrame({'Column':[], 'Value':[], 'Rows':[]})
+    combined = pd.concat(reports, ignore_index=True)
+    return combined.groupby(['Column', 'Value'], dropna=False, sort=False)['Rows'].sum().reset_index()
+
+
+def iter_normalized(fp, columns, chunksize=1_000_000, **kwargs):
+    '''Yields (normalized chunk, unknown value report) for each chunk of a csv file.'''
+    text_columns = [columns['medication'], columns['dose_unit'], columns['duration_unit']]
+    for chunk in pd.read_csv(fp, chunksize=chunksize, dtype={c:'category' for c in text_columns}):
+        yield normalize_claims(chunk, columns, **kwargs)
+
+
+def normalize_csv(fp, out_fp, columns, chunksize=1_000_000, **kwargs):
+    '''
+    Normalizes a csv file of any size chunk by chunk, writing the result to
+    `out_fp` (.csv, or .parquet with pyarrow installed). Returns the combined
+    unknown value report.
+    '''
+    reports = []
+    writer = None
+    if os.path.exists(out_fp):
+        os.remove(out_fp)
+    try:
+        for k, (chunk, report) in enumerate(iter_normalized(fp, columns, chunksize, **kwargs)):
+            reports.append(report)
+            if out_fp.endswith('.parquet'):
+                if pa is None:
+                    raise ImportError('Writing parquet output requires pyarrow (pip install pyarrow)')
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(out_fp, table.schema)
+                writer.write_table(table.cast(writer.schema))
+            else:
+                chunk.to_csv(out_fp, mode='a', header=k == 0, index=False)
+    finally:
+        if writer is not None:
+            writer.close()
+    return combine_reports(reports)
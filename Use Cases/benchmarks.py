@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+"""
+Use Case Benchmarks
+Written: 10/18/2026
+Updated: 10/18/2026
+
+Offline benchmarks of the hot paths of the use cases, so a change that makes
+them slower or hungrier shows up before it is rolled out:
+
+  - stockout_sim: the transaction simulation (stockout_engine.iter_fleet, one process)
+  - faers_drug: parsing a quarter's zipped DRUG table and filtering it to
+    phenytoin (faers_extract.iter_ingredient_rows)
+  - bmi_sln_check: checking a submitted contact list against the answer key
+    (sln_check of automate_data_check_bmi.py)
+  - va_cms_mme: the med_dose and MME steps on the VA and CMS data
+    (va_cms_normalize.normalize_claims)
+  - icd_cohort: the PTSD cohort filter of the ICD extract (icd_cohort.extract_cohort)
+
+Fixtures are synthetic and scaled 1x, 10x, 100x or 1000x a base size taken
+from the shipped data (base_sizes): the three St. Jude machines, the VA/CMS
+and ICD csv files and the 901 patients of BMI_Data_UPDATE.xlsx. No FAERS
+file ships with the repo, so 1x is a nominal 20,000 DRUG rows. Fixtures are
+written once to a fixture folder and reused.
+
+Each case and scale runs in a fresh process. The process records the best
+wall time of `repeat` runs, its peak RSS, and the peak of Python and NumPy
+allocations in a separate run under tracemalloc. pyarrow allocations are not
+traced, so the RSS peak is the one to watch for the arrow readers. Results
+are compared with a JSON baseline file, and a metric is a regression when it
+exceeds its baseline by more than its threshold (relative, plus a small
+absolute slack for noise at small sizes).
+
+Usage: python benchmarks.py
+       python benchmarks.py --cases icd_cohort faers_drug --scales 1 10 100
+       python benchmarks.py --scales 1 10 --save         # record the current results as the baseline
+"""
+
+# Modules
+
+import pandas as pd
+import numpy as np
+import argparse, ast, io, json, multiprocessing, os, platform, resource, sys, time, tracemalloc, zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+
+root = os.path.dirname(os.path.abspath(__file__))
+
+# Folders of the modules benchmarked (and of the shipped data the fixtures are scaled from)
+folders = {'stockout':os.path.join(root, 'St. Jude Stock-Outs', 'Instructor Materials'),
+           'stockout_data':os.path.join(root, 'St. Jude Stock-Outs'),
+           'faers':os.path.join(root, 'FAERS_DataPull'),
+           'bmi':os.path.join(root, 'Age & BMI Risk Factors'),
+           'va_cms':os.path.join(root, 'VA Dual Enrollment Case'),
+           'ptsd':os.path.join(root, 'PTSD & SRB Use Case')}
+
+default_fixture_dir = os.path.join(root, '.benchmark_fixtures')
+default_baseline_fp = os.path.join(root, 'benchmark_baselines.json')
+
+scales = [1, 10, 100, 1000]
+
+# 1x sizes: machines, DRUG rows, patients, copies of VA_data/CMS_data.csv, copies of PossiblePatients_ICD.csv
+base_sizes = {'stockout_sim':3, 'faers_drug':20_000, 'bmi_sln_check':901, 'va_cms_mme':1, 'icd_cohort':1}
+
+# Allowed increase over the baseline of each metric: relative, and absolute slack (seconds or MB)
+thresholds = {'wall_s':0.25, 'peak_rss_mb':0.2, 'tracemalloc_peak_mb':0.2}
+slack = {'wall_s':0.05, 'peak_rss_mb':16, 'tracemalloc_peak_mb':1}
+
+fixture_seed = 2026
+
+
+def _module_path(*names):
+    for name in names:
+        if folders[name] not in sys.path:
+            sys.path.append(folders[name])
+    if root not in sys.path:
+        sys.path.append(root)
+
+
+# Fixtures: each writes the files of one case and scale to `out_dir` and returns their paths (and row count)
+
+def fixture_stockout_sim(scale, out_dir):
+    '''A medication table with random rarities on every department, and 3 x scale machine configs.'''
+    _module_path('stockout')
+    from stockout_engine import default_machines
+    rng = np.random.default_rng(fixture_seed)
+    meds = pd.read_csv(os.path.join(folders['stockout_data'], 'MEDICATIONS.csv'))[['Med_Name']]
+    for column in sorted({c for config in default_machines for c in config['rarity_cols']}):
+        meds[column] = rng.choice(['None', 'Common', 'Moderate', 'Rare'], len(meds), p=[0.4, 0.2, 0.2, 0.2])
+    machines = [dict(default_machines[k % len(default_machines)], machine=k + 1)
+                for k in range(base_sizes['stockout_sim'] * scale)]
+
+    paths = {'meds':os.path.join(out_dir, 'meds.csv'), 'machines':os.path.join(out_dir, 'machines.json')}
+    meds.to_csv(paths['meds'], index=False)
+    with open(paths['machines'], 'w') as f:
+        json.dump(machines, f)
+    return paths # rows are counted as they're simulated
+
+
+def fixture_faers_drug(scale, out_dir, chunksize=1_000_000):
+    '''A zipped DRUG table of 20,000 x scale rows, about 0.5% of them phenytoin or fosphenytoin products.'''
+    rng = np.random.default_rng(fixture_seed)
+    syllables = ['ac', 'bu', 'clo', 'da', 'fen', 'ga', 'hy', 'lo', 'me', 'nor', 'pra', 'ri', 'sta', 'tra', 'vo',
+                 'xa', 'zo', 'pam', 'tine', 'mab']
+    vocabulary = np.array(['%s%s%s' % (a, b, c) for a in syllables for b in syllables for c in syllables[-6:]][:2000] +
+                          ['PHENYTOIN', 'PHENYTOIN SODIUM', 'FOSPHENYTOIN SODIUM', 'PHENYTOIN\\PHENOBARBITAL'],
+                          dtype=object)
+    weights = np.append(np.full(2000, 0.995 / 2000), [0.002, 0.0015, 0.001, 0.0005])
+
+    fp = os.path.join(out_dir, 'faers_ascii_2019Q1.zip')
+    n = base_sizes['faers_drug'] * scale
+    with zipfile.ZipFile(fp, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        with zf.open('ascii/DRUG19Q1.txt', 'w') as raw, io.TextIOWrapper(raw, encoding='latin-1') as f:
+            for start in range(0, n, chunksize):
+                size = min(chunksize, n - start)
+                primaryid = 100000000 + np.arange(start, start + size) // 3
+                prod_ai = pd.Series(vocabulary[rng.choice(len(vocabulary), size, p=weights)]).str.upper()
+                pd.DataFrame({'primaryid':primaryid, 'caseid':primaryid // 10,
+                              'drug_seq':np.arange(start, start + size) % 3 + 1,
+                              'role_cod':rng.choice(['PS', 'SS', 'C', 'I'], size), 'drugname':prod_ai + ' 100MG',
+                              'val_vbm':1, 'route':'ORAL', 'dose_vbm':'100 MG', 'prod_ai':prod_ai
+                              }).to_csv(f, sep='$', index=False, header=start == 0)
+    return {'zip':fp, 'rows':n}
+
+
+def fixture_bmi_sln_check(scale, out_dir):
+    '''
+    An answer key of 901 x scale patients (ID, PhoneNo, Address) and a
+    shuffled submission of it with 1% of patients left out, 1% extra, 1% with
+    another phone number and 0.5% listed twice.
+    '''
+    _module_path('bmi')
+    from bmi_simulation import bmi_cohort
+    rng = np.random.default_rng(fixture_seed)
+    n = base_sizes['bmi_sln_check'] * scale
+    patients = bmi_cohort(n + n // 100)[['ID', 'PhoneNo', 'Address']]
+    key, extra = patients.iloc[:n], patients.iloc[n:]
+
+    student = key.drop(index=rng.choice(n, n // 100, replace=False))
+    changed = rng.choice(student.index, n // 100, replace=False)
+    student.loc[changed, 'PhoneNo'] = '555-555-5555'
+    student = pd.concat([student, extra, student.sample(n // 200, random_state=fixture_seed)])
+    student = student.sample(frac=1, random_state=fixture_seed)
+
+    paths = {'key':os.path.join(out_dir, 'answer_key.csv'), 'student':os.path.join(out_dir, 'submission.csv')}
+    key.to_csv(paths['key'], index=False)
+    student.to_csv(paths['student'], index=False)
+    paths['rows'] = len(key) + len(student)
+    return paths
+
+
+def fixture_va_cms_mme(scale, out_dir):
+    '''VA_data.csv and CMS_data.csv, each repeated scale times.'''
+    paths = {}
+    for name in ['VA_data', 'CMS_data']:
+        df = pd.read_csv(os.path.join(folders['va_cms'], name + '.csv'))
+        paths[name] = os.path.join(out_dir, name + '.csv')
+        pd.concat([df] * scale, ignore_index=True).to_csv(paths[name], index=False)
+        paths['rows'] = paths.get('rows', 0) + len(df) * scale
+    return paths
+
+
+def fixture_icd_cohort(scale, out_dir):
+    '''PossiblePatients_ICD.csv repeated scale times, each copy with its own patient IDs.'''
+    df = pd.read_csv(os.path.join(folders['ptsd'], 'PossiblePatients_ICD.csv'), usecols=['PatientID', 'ICDCode', 'Age'])
+    fp = os.path.join(out_dir, 'PossiblePatients_ICD.csv')
+    offset = int(df['PatientID'].max()) + 1
+    for k in range(scale):
+        df.assign(PatientID=df['PatientID'] + k * offset).to_csv(fp, mode='w' if k == 0 else 'a', header=k == 0,
+                                                                  index=False)
+    return {'csv':fp, 'rows':len(df) * scale}
+
+
+# Cases: setup(paths) loads what isn't measured and returns the arguments of run(...), which returns the rows
+# processed when the fixture can't tell
+
+def _bmi_sln_check():
+    '''
+    sln_check of automate_data_check_bmi.py, compiled on its own (with the
+    id_list helper it calls) since importing the script runs the checks.
+    '''
+    _module_path('bmi')
+    from row_diff import diff_frames
+    fp = os.path.join(folders['bmi'], 'automate_data_check_bmi.py')
+    with open(fp) as f:
+        tree = ast.parse(f.read(), fp)
+    tree.body = [node for node in tree.body
+                 if isinstance(node, ast.FunctionDef) and node.name in ('id_list', 'sln_check')]
+    namespace = {'pd':pd, 'np':np, 'diff_frames':diff_frames}
+    exec(compile(tree, fp, 'exec'), namespace)
+    return namespace['sln_check']
+
+
+def setup_stockout_sim(paths):
+    _module_path('stockout')
+    from stockout_engine import iter_fleet, load_machines
+    return iter_fleet, pd.read_csv(paths['meds'], keep_default_na=False), load_machines(paths['machines'])
+
+
+def run_stockout_sim(iter_fleet, meds, machines):
+    return sum(len(df) for df in iter_fleet(meds, machines, workers=1))
+
+
+def setup_faers_drug(paths):
+    _module_path('faers')
+    from faers_extract import iter_ingredient_rows
+    return iter_ingredient_rows, paths['zip']
+
+
+def run_faers_drug(iter_ingredient_rows, zip_fp):
+    for chunk in iter_ingredient_rows(zip_fp, ['phenytoin', 'fosphenytoin']):
+        pass
+
+
+def setup_bmi_sln_check(paths):
+    return _bmi_sln_check(), pd.read_csv(paths['key']), pd.read_csv(paths['student'])
+
+
+def run_bmi_sln_check(sln_check, key, student):
+    correct, note = [None], [None]
+    sln_check(key, student, 0, correct, note)
+
+
+def setup_va_cms_mme(paths):
+    _module_path('va_cms')
+    from va_cms_normalize import normalize_claims, va_columns, cms_columns
+    frames = [(pd.read_csv(paths['VA_data']), va_columns), (pd.read_csv(paths['CMS_data']), cms_columns)]
+    return normalize_claims, frames
+
+
+def run_va_cms_mme(normalize_claims, frames):
+    for df, columns in frames:
+        normalize_claims(df, columns)
+
+
+def setup_icd_cohort(paths):
+    _module_path('ptsd')
+    from icd_cohort import extract_cohort
+    return extract_cohort, paths['csv']
+
+
+def run_icd_cohort(extract_cohort, fp):
+    extract_cohort(fp)
+
+
+cases = {'stockout_sim':(fixture_stockout_sim, setup_stockout_sim, run_stockout_sim),
+         'faers_drug':(fixture_faers_drug, setup_faers_drug, run_faers_drug),
+         'bmi_sln_check':(fixture_bmi_sln_check, setup_bmi_sln_check, run_bmi_sln_check),
+         'va_cms_mme':(fixture_va_cms_mme, setup_va_cms_mme, run_va_cms_mme),
+         'icd_cohort':(fixture_icd_cohort, setup_icd_cohort, run_icd_cohort)}
+
+
+def fixture(case, scale, fixture_dir=default_fixture_dir):
+    '''The fixture files of a case at a scale, {name: path}, written on first use.'''
+    out_dir = os.path.join(fixture_dir, '%s@%dx' % (case, scale))
+    manifest = os.path.join(out_dir, 'manifest.json')
+    if os.path.isfile(manifest):
+        with open(manifest) as f:
+            return json.load(f)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = cases[case][0](scale, out_dir)
+    with open(manifest + '.tmp', 'w') as f:
+        json.dump(paths, f)
+    os.replace(manifest + '.tmp', manifest) # only complete fixtures get a manifest
+    return paths
+
+
+def peak_rss_mb():
+    '''
+    Peak resident memory of this process in MB. On Linux this is VmHWM, as
+    ru_maxrss carries over the peak of the parent a spawned process was
+    forked from.
+    '''
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # KB on Linux
+
+
+def _measure(case, paths, repeat=3, trace=True):
+    '''Runs one case in this process: best wall time, peak RSS and, in one more run, the tracemalloc peak.'''
+    _, setup, run = cases[case]
+    args = setup(paths)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = run(*args)
+        times.append(time.perf_counter() - start)
+    rows = paths.get('rows') if rows is None else rows
+    result = {'rows':rows, 'wall_s':min(times), 'rows_per_s':rows / min(times) if rows else None,
+              'peak_rss_mb':peak_rss_mb()}
+    if trace:
+        tracemalloc.start()
+        run(*args)
+        result['tracemalloc_peak_mb'] = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return result
+
+
+def measure(case, scale, repeat=3, trace=True, fixture_dir=default_fixture_dir):
+    '''Measures one case at one scale in a fresh process, so its peak RSS is its own.'''
+    paths = fixture(case, scale, fixture_dir)
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        result = pool.submit(_measure, case, paths, repeat, trace).result()
+    return dict({'case':case, 'scale':scale}, **result)
+
+
+def load_baselines(fp=default_baseline_fp):
+    '''The baseline file: {'environment':..., 'thresholds':..., 'slack':..., 'results':{'case@scale': metrics}}.'''
+    if not os.path.isfile(fp):
+        return {'thresholds':thresholds, 'slack':slack, 'results':{}}
+    with open(fp) as f:
+        return json.load(f)
+
+
+def environment():
+    '''The machine and library versions a baseline was recorded on.'''
+    return {'platform':platform.platform(), 'python':platform.python_version(), 'cpus':os.cpu_count(),
+            'numpy':np.__version__, 'pandas':pd.__version__}
+
+
+def save_baselines(results, fp=default_baseline_fp):
+    '''Records results as the baselines of their case and scale, keeping the other baselines in the file.'''
+    baselines = load_baselines(fp)
+    baselines['environment'] = environment()
+    for r in results:
+        baselines['results']['%s@%dx' % (r['case'], r['scale'])] = {k:v for k, v in r.items()
+                                                                      if k not in ('case', 'scale', 'regressions')}
+    with open(fp + '.tmp', 'w') as f:
+        json.dump(baselines, f, indent=1, sort_keys=True)
+    os.replace(fp + '.tmp', fp)
+
+
+def compare(results, baselines):
+    '''
+    Adds to each result the list of its regressions: the metrics above
+    baseline * (1 + threshold) + slack. Thresholds and slack come from the
+    baseline file when it sets them.
+    '''
+    limits, extra = dict(thresholds, **baselines.get('thresholds', {})), dict(slack, **baselines.get('slack', {}))
+    for r in results:
+        base = baselines['results'].get('%s@%dx' % (r['case'], r['scale']))
+        r['regressions'] = []
+        for metric, limit in limits.items():
+            if base is not None and r.get(metric) is not None and base.get(metric) is not None:
+                if r[metric] > base[metric] * (1 + limit) + extra[metric]:
+                    r['regressions'].append('%s %.3g > %.3g' % (metric, r[metric], base[metric]))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the use case hot paths on scaled synthetic fixtures')
+    parser.add_argument('--cases', nargs='+', choices=list(cases), default=list(cases))
+    parser.add_argument('--scales', nargs='+', type=int, choices=scales, default=[1, 10])
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case, the best is kept')
+    parser.add_argument('--no-tracemalloc', action='store_true', help='skip the tracemalloc run')
+    parser.add_argument('--fixtures', default=default_fixture_dir, help='folder the fixtures are written to')
+    parser.add_argument('--baseline', default=default_baseline_fp)
+    parser.add_argument('--save', action='store_true', help='record the results as the new baselines')
+    parser.add_argument('--out', help='also write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = []
+    for scale in args.scales:
+        for case in args.cases:
+            results.append(measure(case, scale, args.repeat, not args.no_tracemalloc, args.fixtures))
+            print('%s@%dx: %.3f s' % (case, scale, results[-1]['wall_s']), flush=True)
+    compare(results, load_baselines(args.baseline))
+
+    table = pd.DataFrame(results).set_index(['case', 'scale'])
+    table['regressions'] = table['regressions'].str.join('; ')
+    print(table.to_string(float_format=lambda x: '%.3f' % x))
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=1)
+    if args.save:
+        save_baselines(results, args.baseline)
+        print('Baselines saved to %s' % args.baseline)
+    elif any(r['regressions'] for r in results):
+        sys.exit(1)
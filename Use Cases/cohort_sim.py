@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic Cohort Helpers
+Written: 10/18/2026
+Updated: 10/18/2026
+
+Shared by the PTSD (ptsd_simulation.py) and BMI (bmi_simulation.py)
+generators, which replace the row-by-row loops of their data simulation
+notebooks with vectorized draws, so cohorts of any size can be generated
+for load testing.
+
+Rows are generated in blocks of block_size rows. Each block draws every
+attribute from its own numpy Generator, seeded from
+SeedSequence(seed, spawn_key=(block,)) and spawned once per attribute. A
+cohort is then the same for a given seed whatever the chunk size it is
+written in. Its first rows also match those of a smaller cohort drawn with
+the same seed, apart from ID formats that widen with the cohort's size.
+
+  - unique_ids: unique IDs in bulk, as an affine permutation of the row
+    numbers over the ID space (no duplicate check, no set of drawn IDs)
+  - draw_categories: categorical draws whose probabilities depend on each
+    row's stratum (e.g. PTSD x SRB), in one pass over the rows
+  - generate / iter_chunks / write_chunks: any rows of a cohort, in memory
+    or written chunk by chunk to csv or parquet
+
+    streams = block_streams(1415, 0, ['age', 'alcohol'])
+    alc = draw_categories(streams['alcohol'].random(n), strata, [[0.7, 0.3], [0.5, 0.5]])
+"""
+
+# Modules
+
+import pandas as pd
+import numpy as np
+import math, os
+
+# pyarrow is only needed for writing chunks to parquet
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+block_size = 1 << 16
+
+
+def block_streams(seed, block, names):
+    '''A numpy Generator per attribute name for one block of rows, {name: Generator}.'''
+    children = np.random.SeedSequence(seed, spawn_key=(block,)).spawn(len(names))
+    return {name:np.random.default_rng(child) for name, child in zip(names, children)}
+
+
+def unique_ids(index, space, seed):
+    '''
+    Distinct integers in [0, space) for distinct row numbers `index` (below
+    `space`), as (a * index + b) % space with a coprime to `space`, and a and
+    b drawn from `seed`. Requires space < 3e9 so the products fit in int64.
+    '''
+    index = np.asarray(index, dtype=np.int64)
+    if len(index) and index.max() >= space:
+        raise ValueError('%d rows need an ID space larger than %d' % (index.max() + 1, space))
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(2**32 - 1,)))
+    a = int(rng.integers(1, space)) if space > 1 else 1
+    while math.gcd(a, space) != 1:
+        a = a % (space - 1) + 1
+    b = int(rng.integers(0, space))
+    return (a * index + b) % space
+
+
+def draw_categories(u, strata, probs):
+    '''
+    Category index of each row from uniform draws `u`, the row's stratum code
+    `strata` and a probability table with one row per stratum (or a single
+    row of probabilities for every row when `strata` is None).
+    '''
+    cumulative = np.cumsum(np.atleast_2d(np.asarray(probs, dtype=np.float64)), axis=1)
+    cumulative[:, -1] = 1.0 # rounding in the table can't leave a row without a category
+    if strata is None:
+        return np.searchsorted(cumulative[0], u, side='right').astype(np.int8)
+    return (u[:, None] >= cumulative[strata][:, :-1]).sum(axis=1).astype(np.int8)
+
+
+def strata_codes(*flags):
+    '''Stratum code of each row from 0/1 flags, e.g. strata_codes(ptsd, srb) = 2 * ptsd + srb.'''
+    code = np.zeros(len(flags[0]), dtype=np.int8)
+    for flag in flags:
+        code = 2 * code + np.asarray(flag, dtype=np.int8)
+    return code
+
+
+def generate(make_block, n, seed, start=0, total=None):
+    '''
+    Rows [start, start + n) of a cohort of `total` rows (by default start + n).
+    make_block(seed, block, first, size, total) returns the first `size` rows
+    of block `block`, which starts at row `first`.
+    '''
+    total = start + n if total is None else total
+    parts = []
+    for block in range(start // block_size, (start + n - 1) // block_size + 1 if n else 0):
+        first = block * block_size
+        lo, hi = max(start - first, 0), min(start + n - first, block_size)
+        parts.append(make_block(seed, block, first, hi, total).iloc[lo:])
+    if not parts:
+        return make_block(seed, 0, 0, 0, total)
+    return pd.concat(parts, ignore_index=True)
+
+
+def iter_chunks(make_block, n, seed, chunksize=1_000_000):
+    '''Yields a cohort of n rows in chunks of `chunksize` rows.'''
+    for start in range(0, n, chunksize):
+        yield generate(make_block, min(chunksize, n - start), seed, start, n)
+
+
+def write_chunks(make_block, n, out_fp, seed, chunksize=1_000_000):
+    '''Writes a cohort of n rows to `out_fp` (.csv, or .parquet with pyarrow installed) chunk by chunk.'''
+    if out_fp.endswith('.parquet') and pa is None:
+        raise ImportError('Writing parquet output requires pyarrow (pip install pyarrow)')
+    if os.path.exists(out_fp):
+        os.remove(out_fp)
+    writer = None
+    try:
+        for k, chunk in enumerate(iter_chunks(make_block, n, seed, chunksize)):
+            if out_fp.endswith('.parquet'):
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(out_fp, table.schema)
+                writer.write_table(table.cast(writer.schema))
+            else:
+                chunk.to_csv(out_fp, mode='a', header=k == 0, index=False)
+    finally:
+        if writer is not None:
+            writer.close()
+    return out_fp
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Compact Dataset Loader
+Written: 10/18/2026
+Updated: 10/18/2026
+
+Reads the csv files of the use cases with a declared schema per dataset
+rather than pd.read_csv's inferred types:
+
+  - low-cardinality text (Medication, Type, ICDCode, IncomeCat, units) as categoricals
+  - Likert items, flags and small counts as int8/int16, IDs as int32 where they fit
+  - Day and Visit Date as datetime64
+  - written-out index columns (Unnamed: 0) dropped
+
+Integer columns are range checked before being narrowed, so a value that
+doesn't fit (or a missing value) raises a ValueError naming the column
+rather than wrapping around.
+
+The first read of a file also writes an uncompressed Feather (Arrow IPC)
+copy to a .data_cache folder next to it. Later reads memory-map that copy,
+so the numeric, date and text columns are views of the mapped file rather
+than parsed copies. The copy records the csv's size and modification time
+and the schema it was written with, and is rewritten when either changes.
+Without pyarrow the files are read from csv with the schema, uncached.
+
+    transactions = read_dataset('EmergencyDepartmentTransactions.csv')
+    icd = read_dataset('../PTSD & SRB Use Case/PossiblePatients_ICD.csv', columns=['PatientID', 'ICDCode'])
+    df = read_dataset('my_extract.csv', schema='icd_diagnoses')
+"""
+
+# Modules
+
+import pandas as pd
+import numpy as np
+import hashlib, json, os
+
+# pyarrow writes and memory-maps the Feather cache
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = feather = None
+
+
+def _pcl5(wave='6mo'):
+    return {'PTSD_Q%d_%s' % (q, wave):'int8' for q in range(1, 21)}
+
+
+# Declared column types of each dataset ('datetime' columns are parsed as %Y-%m-%d dates). Undeclared
+# columns keep pd.read_csv's types
+schemas = {'transactions':{'columns':{'TransactionID':'str', 'Machine':'int8', 'Day':'datetime',
+                                      'Medication':'category', 'Type':'category', 'AmtRemaining':'int16'},
+                           'drop':['Unnamed: 0']},
+           'medications':{'columns':{'Med_Name':'str', 'Note':'category', 'EmergencyStatus':'category'}},
+           'machines':{'columns':{'Machine ID':'int8', 'Department/Location':'category'}},
+           'icd_diagnoses':{'columns':{'PatientID':'int32', 'ICDCode':'category', 'Age':'int8'},
+                            'drop':['Unnamed: 0']},
+           'ptsd_survey':{'columns':dict({'UID':'str'}, **_pcl5(), **{'PTSD_6mo':'int8', 'PHQ_Q9_6mo':'int8',
+                          'SRB_6mo':'int8', 'Age':'int8', 'Service_Yrs':'int8', 'CombatExposure':'int8',
+                          'IED_Exposure':'int8', 'AlcAbuse':'int8', 'AFQT_BL':'int8', 'IncomeCat':'category'})},
+           'ptsd_cohort':{'columns':dict({'UID':'str'}, **_pcl5(), **{'PHQ_Q9_6mo':'int8', 'Age':'int8',
+                          'TimeFirstDiagnosis_Months':'int8', 'AlcAbuse':'int8', 'BeckAnxiety_BL':'int8',
+                          'IncomeCat':'category', 'PTSD_Ppx':'category', 'PTSD_Rx':'category'}),
+                          'drop':['Unnamed: 0']},
+           'va_prescriptions':{'columns':{'Patient ID':'int32', 'Visit Date':'datetime', 'Age':'int8',
+                                          'Medication':'category', 'Medication Dose Unit':'category',
+                                          'Medication Duration Value':'int16', 'Medication Duration Unit':'category'}},
+           'cms_prescriptions':{'columns':{'Patient ID':'str', 'Medication':'category',
+                                           'Medication Dose Unit':'category', 'Medication Duration':'int16',
+                                           'Duration Unit':'category', 'Visit Date':'datetime'}}}
+
+# Schema of each shipped file, by file name
+dataset_schemas = {'EmergencyDepartmentTransactions.csv':'transactions',
+                   'Neuro_Surgery_Transactions.csv':'transactions',
+                   'Onc_Derm_Transactions.csv':'transactions',
+                   'MEDICATIONS.csv':'medications',
+                   'Machines.csv':'machines',
+                   'PossiblePatients_ICD.csv':'icd_diagnoses',
+                   'ptsd_data.csv':'ptsd_survey',
+                   'PTSD_ResearchCohort.csv':'ptsd_cohort',
+                   'VA_data.csv':'va_prescriptions',
+                   'CMS_data.csv':'cms_prescriptions'}
+
+date_format = '%Y-%m-%d'
+cache_folder = '.data_cache'
+
+
+def schema_for(fp, schema=None):
+    '''The schema of a file: `schema` (a name of schemas or a dict), or the one its file name is registered under.'''
+    if isinstance(schema, dict):
+        return schema
+    name = schema or dataset_schemas.get(os.path.basename(fp))
+    if name is None:
+        raise KeyError('No schema registered for %s, pass schema= (one of %s)' % (fp, ', '.join(schemas)))
+    return schemas[name]
+
+
+def apply_schema(df, schema, source=''):
+    '''`df` with the declared types of `schema` applied to the columns it has (and its dropped columns removed).'''
+    df = df.drop(columns=[c for c in schema.get('drop', []) if c in df.columns])
+    for column, dtype in schema['columns'].items():
+        if column not in df.columns:
+            continue
+        values = df[column]
+        if dtype == 'datetime':
+            df[column] = pd.to_datetime(values, format=date_format)
+        elif dtype in ('category', 'str'):
+            df[column] = values.astype(dtype)
+        else:
+            limits = np.iinfo(dtype)
+            numbers = pd.to_numeric(values)
+            bad = numbers.isna() | (numbers < limits.min) | (numbers > limits.max) | (numbers != np.round(numbers))
+            if bad.any():
+                raise ValueError('%s: %d values of %s do not fit %s, e.g. %r' % (source or 'data', bad.sum(), column,
+                                                                                 dtype, values[bad].iloc[0]))
+            df[column] = numbers.astype(dtype)
+    return df
+
+
+def read_csv(fp, schema=None, **kwargs):
+    '''A csv file read with its schema (keyword arguments passed to pd.read_csv).'''
+    schema = schema_for(fp, schema)
+    declared = {c:t for c, t in schema['columns'].items() if t in ('category', 'str')}
+    drop = set(schema.get('drop', []))
+    usecols = kwargs.pop('usecols', None)
+    keep = (lambda c: c not in drop) if usecols is None else (lambda c: c in usecols and c not in drop)
+    df = pd.read_csv(fp, dtype=declared, usecols=keep, **kwargs)
+    return apply_schema(df, schema, fp)
+
+
+def _fingerprint(schema):
+    return hashlib.sha1(json.dumps(schema, sort_keys=True).encode()).hexdigest()
+
+
+def cache_path(fp, cache_dir=None):
+    '''Path of a file's Feather copy: a .data_cache folder next to it by default.'''
+    folder = cache_dir or os.path.join(os.path.dirname(os.path.abspath(fp)), cache_folder)
+    return os.path.join(folder, os.path.basename(fp) + '.arrow')
+
+
+def _cache_key(fp, schema):
+    stat = os.stat(fp)
+    return {'size':str(stat.st_size), 'mtime':str(stat.st_mtime_ns), 'schema':_fingerprint(schema)}
+
+
+def _read_cache(cache_fp, key, columns):
+    '''The cached table when its key matches, else None. The table's buffers map the file rather than copy it.'''
+    try:
+        table = feather.read_table(cache_fp, columns=columns, memory_map=True)
+    except (OSError, ValueError, pa.ArrowInvalid): # missing, damaged or lacking a requested column
+        return None
+    metadata = {k.decode():v.decode() for k, v in (table.schema.metadata or {}).items()}
+    if any(metadata.get('source_' + k) != v for k, v in key.items()):
+        return None
+    return table
+
+
+def _write_cache(df, cache_fp, key):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata.update({('source_' + k).encode():v.encode() for k, v in key.items()})
+    os.makedirs(os.path.dirname(cache_fp), exist_ok=True)
+    tmp = cache_fp + '.tmp'
+    feather.write_feather(table.replace_schema_metadata(metadata), tmp, compression='uncompressed')
+    os.replace(tmp, cache_fp)
+
+
+def read_dataset(fp, schema=None, columns=None, cache=True, cache_dir=None):
+    '''
+    A dataset with its declared types, from its memory-mapped Feather copy
+    when that is current, else from csv (writing the copy). `columns`
+    selects columns, `cache=False` always reads the csv.
+    '''
+    schema = schema_for(fp, schema)
+    if not cache or pa is None:
+        return read_csv(fp, schema, usecols=columns)
+
+    cache_fp = cache_path(fp, cache_dir)
+    key = _cache_key(fp, schema)
+    table = _read_cache(cache_fp, key, columns)
+    if table is None:
+        df = read_csv(fp, schema)
+        try:
+            _write_cache(df, cache_fp, key)
+        except OSError: # e.g. a read-only folder, use what was read
+            return df[columns] if columns is not None else df
+        table = _read_cache(cache_fp, key, columns)
+        if table is None: # the csv changed while it was read, use what was read
+            return df[columns] if columns is not None else df
+    # split_blocks keeps each column its own block, so columns without missing values stay zero-copy
+    return table.to_pandas(split_blocks=True)
+
+
+def memory_report(fp, schema=None):
+    '''Memory (MB, deep) of a file read with plain pd.read_csv and with its schema, by column.'''
+    plain = pd.read_csv(fp).memory_usage(deep=True, index=False) / 2**20
+    compact = read_csv(fp, schema).memory_usage(deep=True, index=False) / 2**20
+    report = pd.DataFrame({'read_csv MB':plain, 'schema MB':compact})
+    report.loc['Total'] = report.sum()
+    report['Ratio'] = report['read_csv MB'] / report['schema MB']
+    return report
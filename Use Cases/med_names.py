@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+Medication Name Normalizer
+Written: 10/18/2026
+Updated: 10/18/2026
+
+Shared by the VA/CMS (va_cms_normalize.py) and FAERS (faers_warehouse.py)
+use cases to resolve free-text medication strings, e.g. 'BUPERNORPHINE',
+'tramadol HCL' or 'dihydrocodeine-acetaminophin-caff', to a canonical
+ingredient vocabulary without a hand-written dictionary entry per spelling.
+
+A string is lower cased, split into its ingredients (at \\ / + , ; - 'and'
+'with'), and stripped of salt and dose form words (ignored_words). Each part is
+then looked up exactly, and otherwise fuzzily: a character trigram inverted
+index over the vocabulary picks the few candidates sharing the most trigrams,
+and the closest of them within a bounded edit distance (optimal string
+alignment, so a transposed pair of letters counts as one edit) is taken.
+
+Vocabulary names are kept whole (less dose form words), and the salt words
+stripped from a string must agree with those of the name it is matched to when
+both have any: 'tramadol HCL' resolves to 'tramadol' or 'tramadol
+hydrochloride', but 'sodium chloride' not to 'potassium chloride'.
+
+Resolved strings are kept in an LRU cache, which can be saved and reloaded,
+and whole columns are mapped through their distinct values and broadcast back,
+so each distinct raw string is scored once.
+
+    names = MedicationNormalizer(['buprenorphine', 'tramadol', 'dihydrocodeine', 'acetaminophen'])
+    names.normalize('BUPERNORPHINE')                            # 'buprenorphine'
+    names.ingredients('dihydrocodeine-acetaminophin-caff')      # ('dihydrocodeine', 'acetaminophen')
+    va_data['Medication'] = names.normalize_series(va_data['Medication'])
+"""
+
+# Modules
+
+import pandas as pd
+import numpy as np
+import json, os, re
+from collections import OrderedDict, defaultdict
+
+
+# Salt words, which must agree when both sides of a match have them, and dose form and release words, dropped
+# before matching
+salt_words = {'hcl', 'hydrochloride', 'hydrobromide', 'sodium', 'sod', 'potassium', 'calcium', 'sulfate',
+              'phosphate', 'citrate', 'tartrate', 'bitartrate', 'maleate', 'acetate'}
+form_words = {'tablet', 'tablets', 'tab', 'tabs', 'capsule', 'capsules', 'cap', 'caps', 'oral', 'injection',
+              'solution', 'suspension', 'patch', 'film', 'extended', 'release', 'er', 'xr', 'sr', 'ir', 'mg', 'mcg',
+              'ml'}
+ignored_words = salt_words | form_words
+salt_synonyms = {'hcl':'hydrochloride', 'sod':'sodium'}
+
+_part_separators = re.compile(r'\s*(?:[\\/+,;&]|-|\band\b|\bwith\b)\s*')
+_words = re.compile(r'[a-z][a-z0-9]*')
+
+
+def clean(text, ignored=ignored_words):
+    '''Lower case words of `text` without `ignored` words or numbers, joined by single spaces.'''
+    return ' '.join(w for w in _words.findall(str(text).lower()) if w not in ignored)
+
+
+def lookup_key(text):
+    '''
+    The term `text` is looked up by and the salt words stripped from it, e.g.
+    ('chloride', {'potassium'}). A text of salt words alone ('calcium') is its
+    own term, without salts.
+    '''
+    term = clean(text)
+    if not term:
+        return clean(text, form_words), frozenset()
+    return term, frozenset(salt_synonyms.get(w, w) for w in _words.findall(str(text).lower()) if w in salt_words)
+
+
+def trigrams(term):
+    '''Character trigrams of a term padded with one boundary mark on each side.'''
+    padded = '^%s$' % term
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, bound):
+    '''
+    Optimal string alignment distance between `a` and `b` (insertions,
+    deletions, substitutions and adjacent transpositions), or bound + 1 as
+    soon as it must exceed `bound`.
+    '''
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > bound:
+            return bound + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class MedicationNormalizer:
+    '''
+    Resolves medication strings to the canonical names of `vocabulary`.
+
+    The canonical names are the vocabulary entries lower cased, without
+    numbers or dose form words. `aliases` ({raw string: canonical name},
+    matched by lookup_key()) covers names no spelling distance would find,
+    e.g. brand names. `max_distance`
+    caps the edit distance of a fuzzy match, which is further limited to a
+    quarter of the term's length (no fuzzy matching under 4 letters).
+    `candidates` is the number of trigram index candidates scored per term.
+    '''
+
+    def __init__(self, vocabulary, aliases=None, max_distance=2, candidates=10, cache_size=100000, cache_fp=None):
+        self.vocabulary = sorted({clean(v, form_words) for v in vocabulary} - {''})
+        self.aliases = {lookup_key(k)[0]:clean(v, form_words) for k, v in (aliases or {}).items()}
+        self.max_distance = max_distance
+        self.candidates = candidates
+        self.cache_size = cache_size
+        self.cache_fp = cache_fp
+        self._cache = OrderedDict()
+
+        # Lookup term -> [(salts, canonical name)] of the names it stands for, e.g. 'chloride' for both
+        # 'potassium chloride' and 'calcium chloride'. Aliases have no salts, so match whatever came with them.
+        self._exact = defaultdict(list)
+        for name in self.vocabulary:
+            term, salts = lookup_key(name)
+            self._exact[term].append((salts, name))
+        for term, name in self.aliases.items():
+            self._exact[term].insert(0, (frozenset(), name))
+        self._exact = dict(self._exact)
+        self._terms = sorted(self._exact)
+
+        # Trigram -> lookup term positions
+        index = defaultdict(list)
+        for k, term in enumerate(self._terms):
+            for gram in trigrams(term):
+                index[gram].append(k)
+        self._index = {gram:np.array(ks, dtype=np.int64) for gram, ks in index.items()}
+
+        if cache_fp is not None and os.path.isfile(cache_fp):
+            self.load_cache(cache_fp)
+
+    def _closest(self, term):
+        '''The lookup term `term` is, or is within the edit distance bound of, or None.'''
+        if term in self._exact:
+            return term
+        bound = min(self.max_distance, len(term) // 4)
+        if bound == 0:
+            return None
+        hits = [self._index[g] for g in trigrams(term) if g in self._index]
+        if not hits:
+            return None
+        shared = np.bincount(np.concatenate(hits), minlength=len(self._terms))
+        top = np.argsort(-shared, kind='stable')[:self.candidates]
+
+        best, best_distance = None, bound + 1
+        for k in top[shared[top] > 0]:
+            distance = edit_distance(term, self._terms[k], bound)
+            if distance < best_distance:
+                best, best_distance = self._terms[k], distance
+        return best
+
+    def match(self, term, salts=frozenset()):
+        '''
+        Canonical name of one cleaned term (an ingredient) that came with the
+        salt words `salts` (see lookup_key), or None. A name with the same
+        salts is preferred, then the only one where either side has none
+        ('chloride' alone does not pick between salts).
+        '''
+        found = self._closest(term)
+        if found is None:
+            return None
+        names = self._exact[found]
+        for name_salts, name in names:
+            if name_salts == salts:
+                return name
+        loose = {name for name_salts, name in names if not name_salts or not salts}
+        return loose.pop() if len(loose) == 1 else None
+
+    def _resolve(self, text):
+        whole, salts = lookup_key(text)
+        if not whole:
+            return ()
+        found = self.match(whole, salts)
+        if found is not None:
+            return (found,)
+
+        # Each ingredient of a combination, and failing that each of its words
+        resolved = []
+        for part in _part_separators.split(str(text).lower()):
+            part, salts = lookup_key(part)
+            matches = [self.match(part, salts)] if part else []
+            if part and matches[0] is None:
+                matches = [self.match(word, salts) for word in part.split(' ')]
+            resolved += [m for m in matches if m is not None and m not in resolved]
+        return tuple(resolved)
+
+    def ingredients(self, text):
+        '''Canonical names of the ingredients found in `text`, in order (cached).'''
+        if text is None or (not isinstance(text, str) and pd.isna(text)):
+            return ()
+        key = str(text)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        found = self._resolve(key)
+        self._cache[key] = found
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return found
+
+    def normalize(self, text):
+        '''Canonical name of the first ingredient found in `text`, or None.'''
+        found = self.ingredients(text)
+        return found[0] if found else None
+
+    def normalize_series(self, values, keep_unmatched=False):
+        '''
+        Canonical names (first ingredient) of a column of medication strings as
+        a categorical Series, each distinct value resolved once. Unmatched
+        values are NaN, or their original text with keep_unmatched=True.
+        '''
+        values = pd.Series(values)
+        codes, uniques = pd.factorize(values)
+        names = [self.normalize(u) for u in uniques]
+        if keep_unmatched:
+            names = [str(u) if n is None else n for n, u in zip(names, uniques)]
+        names = pd.Categorical(np.array(names, dtype=object)) # None -> NaN
+        codes = np.append(names.codes, -1)[codes]
+        return pd.Series(pd.Categorical.from_codes(codes, names.categories), index=values.index, name=values.name)
+
+    def save_cache(self, fp=None):
+        '''Writes the resolved strings to a json file (by default `cache_fp`).'''
+        fp = fp or self.cache_fp
+        with open(fp + '.tmp', 'w') as f:
+            json.dump({k:list(v) for k, v in self._cache.items()}, f)
+        os.replace(fp + '.tmp', fp)
+
+    def load_cache(self, fp):
+        '''Adds the strings resolved in an earlier session whose names are all still in the vocabulary.'''
+        with open(fp) as f:
+            saved = json.load(f)
+        known = set(self.vocabulary) | set(self.aliases.values())
+        for k, v in saved.items():
+            if v and all(name in known for name in v): # unmatched strings are retried
+                self._cache[k] = tuple(v)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
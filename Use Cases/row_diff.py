@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Row Diff for the Use Case Check Scripts
+Written: 10/18/2026
+Updated: 10/18/2026
+
+Shared by the check scripts of the use cases (FAERS_SolutionCheck.py /
+faers_grading.py and automate_data_check_bmi.py) to tell a student which rows
+of their submission are missing, extra or changed, rather than only whether
+the shapes or medication sets agree.
+
+Both frames are first normalized (dropping a written-out index column,
+aligning column order, coercing numbers to float so 1 and 1.0 agree,
+stripping whitespace and optionally ignoring case). Then every row is hashed
+with pd.util.hash_pandas_object. Rows are matched by hash, counting duplicates,
+so the comparison takes a few linear passes over the data instead of a
+row-by-row loop. When a key is given (e.g. ID, or primaryid + drug_seq),
+unmatched rows sharing a key are reported as changed, together with the
+columns that differ.
+
+    diff = diff_frames(student_df, solution_df, key='ID')
+    diff.ok, diff.missing, diff.extra, diff.changed, diff.column_mismatches
+"""
+
+# Modules
+
+import pandas as pd
+import numpy as np
+
+
+index_columns = ['Unnamed: 0']
+
+
+def normalize(df, columns=None, drop=index_columns, dtypes=None, strip=True, ignore_case=False, decimals=None):
+    '''
+    Normalized copy of `df` for comparison:
+      - written-out index columns (`drop`) removed
+      - columns restricted to / ordered as `columns` when given, else sorted by name
+      - `dtypes` ({column: dtype}) applied, then numeric columns as float64 (rounded to `decimals` when given)
+      - text stripped of surrounding whitespace and, with ignore_case, lower cased
+    '''
+    df = df.drop(columns=[c for c in drop if c in df.columns])
+    df.columns = [str(c).strip() for c in df.columns]
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    else:
+        df = df[sorted(df.columns)]
+    if dtypes:
+        df = df.astype({c:t for c, t in dtypes.items() if c in df.columns})
+
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_bool_dtype(s) or pd.api.types.is_numeric_dtype(s):
+            s = s.astype(np.float64)
+            if decimals is not None:
+                s = s.round(decimals)
+        elif pd.api.types.is_object_dtype(s) or pd.api.types.is_string_dtype(s) or isinstance(s.dtype, pd.CategoricalDtype):
+            s = s.astype('string')
+            if strip:
+                s = s.str.strip()
+            if ignore_case:
+                s = s.str.lower()
+        out[col] = s
+    return pd.DataFrame(out, index=df.index)
+
+
+def shared_codes(a, b):
+    '''
+    Integer codes of two columns over their joint set of values (NA coded -1),
+    so equal values get equal codes on both sides.
+    '''
+    codes, _ = pd.factorize(pd.concat([a, b], ignore_index=True))
+    return codes[:len(a)], codes[len(a):]
+
+
+def column_codes(a, b):
+    '''
+    Integer codes of two normalized columns such that equal values get equal
+    codes. Float columns use their bit patterns (with -0.0 and NaN made
+    canonical), so only text columns need a joint factorize.
+    '''
+    if a.dtype == np.float64 and b.dtype == np.float64:
+        bits = lambda s: np.where(np.isnan(s), np.nan, s.to_numpy() + 0.0).view(np.int64)
+        return bits(a), bits(b)
+    return shared_codes(a, b)
+
+
+def row_hashes(df):
+    '''One uint64 hash per row of `df` (over its values only, not its index).'''
+    if df.shape[1] == 0:
+        return np.zeros(len(df), dtype=np.uint64)
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def _occurrence(codes):
+    '''Occurrence number of each code (0 for its first row, 1 for the second, ...).'''
+    order = np.argsort(codes, kind='stable')
+    ordered = codes[order]
+    start = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+    rank = np.empty(len(codes), dtype=np.int64)
+    rank[order] = np.arange(len(codes)) - np.repeat(start, np.diff(np.r_[start, len(codes)]))
+    return rank
+
+
+def _unmatched(a, b):
+    '''
+    Rows of each side with no counterpart on the other, given row codes over a
+    joint vocabulary. Duplicates are matched one to one, so a row appearing
+    twice in `a` and once in `b` leaves one `a` row unmatched.
+    '''
+    n = max(a.max(initial=-1), b.max(initial=-1)) + 1
+    matched = np.minimum(np.bincount(a, minlength=n), np.bincount(b, minlength=n))
+    return _occurrence(a) >= matched[a], _occurrence(b) >= matched[b]
+
+
+def _first_unmatched(key_codes, unmatched):
+    '''Position of the first unmatched row of each key, indexed by the key code.'''
+    pos = np.flatnonzero(unmatched)
+    keys, first = np.unique(key_codes[pos], return_index=True)
+    return pd.Series(pos[first], index=keys)
+
+
+class RowDiff:
+    '''
+    Result of diff_frames.
+
+    `missing` holds the solution rows absent from the submission and `extra`
+    the submission rows absent from the solution (both as given, before
+    normalization). With a key, `changed` pairs the unmatched rows sharing a
+    key (columns ('solution', col) and ('submission', col), indexed by key),
+    and those rows are left out of missing/extra. `column_mismatches` counts,
+    per shared column, the changed rows differing in it (with a key) or the
+    solution values missing from the submission's column (without one).
+    '''
+
+    def __init__(self, missing, extra, changed, column_mismatches, missing_columns, extra_columns, n_solution,
+                 n_submission):
+        self.missing = missing
+        self.extra = extra
+        self.changed = changed
+        self.column_mismatches = column_mismatches
+        self.missing_columns = missing_columns
+        self.extra_columns = extra_columns
+        self.n_solution = n_solution
+        self.n_submission = n_submission
+
+    @property
+    def ok(self):
+        return (len(self.missing) == 0 and len(self.extra) == 0 and len(self.changed) == 0
+                and not self.missing_columns and not self.extra_columns)
+
+    def summary(self):
+        '''One sentence describing the differences, e.g. for a feedback note.'''
+        if self.ok:
+            return 'All rows match the solution.'
+        parts = []
+        if self.missing_columns:
+            parts.append('missing columns: %s' % ', '.join(self.missing_columns))
+        if self.extra_columns:
+            parts.append('extra columns: %s' % ', '.join(self.extra_columns))
+        if len(self.missing):
+            parts.append('%d solution row(s) missing' % len(self.missing))
+        if len(self.extra):
+            parts.append('%d extra row(s)' % len(self.extra))
+        if len(self.changed):
+            worst = self.column_mismatches[self.column_mismatches > 0].sort_values(ascending=False)
+            parts.append('%d row(s) with different values (%s)' % (len(self.changed), ', '.join(worst.index[:5])))
+        return 'Of %d solution rows and %d submitted rows: %s.' % (self.n_solution, self.n_submission,
+                                                                  '; '.join(parts))
+
+
+def diff_frames(submission, solution, key=None, columns=None, **options):
+    '''
+    Compares a submitted data frame with the solution, returning a RowDiff.
+
+    `key` (a column or list of columns) identifies rows across the two frames.
+    `columns` restricts the comparison to those columns. Other keyword arguments
+    go to normalize (drop, dtypes, strip, ignore_case, decimals).
+    '''
+    keys = [] if key is None else ([key] if isinstance(key, str) else list(key))
+    submission = submission.rename(columns=lambda c: str(c).strip())
+    solution = solution.rename(columns=lambda c: str(c).strip())
+    sub = normalize(submission, columns, **options)
+    sol = normalize(solution, columns, **options)
+    missing_columns = [c for c in sol.columns if c not in sub.columns]
+    extra_columns = [c for c in sub.columns if c not in sol.columns]
+    shared = [c for c in sol.columns if c in sub.columns]
+    keys = [k for k in keys if k in shared]
+
+    # Each column coded over both frames' values, then rows hashed over their codes and coded in turn
+    codes = {col:column_codes(sol[col], sub[col]) for col in shared}
+    sol_codes = pd.DataFrame({col:c[0] for col, c in codes.items()}, columns=shared)
+    sub_codes = pd.DataFrame({col:c[1] for col, c in codes.items()}, columns=shared)
+    sol_rows, sub_rows = shared_codes(pd.Series(row_hashes(sol_codes)), pd.Series(row_hashes(sub_codes)))
+    sol_unmatched, sub_unmatched = _unmatched(sol_rows, sub_rows)
+
+    column_mismatches = pd.Series(0, index=pd.Index(shared, dtype=object), dtype=np.int64)
+    changed = pd.DataFrame()
+    if keys:
+        # Unmatched rows sharing a key are changed rows, paired on their first unmatched occurrence
+        sol_key, sub_key = shared_codes(pd.Series(row_hashes(sol_codes[keys])), pd.Series(row_hashes(sub_codes[keys])))
+        sol_pos = _first_unmatched(sol_key, sol_unmatched)
+        sub_pos = _first_unmatched(sub_key, sub_unmatched)
+        both = sol_pos.index.intersection(sub_pos.index)
+        sol_pair, sub_pair = sol_pos[both].to_numpy(), sub_pos[both].to_numpy()
+
+        for col, (a, b) in codes.items():
+            column_mismatches[col] = int((a[sol_pair] != b[sub_pair]).sum())
+
+        key_values = solution.iloc[sol_pair][keys].reset_index(drop=True)
+        index = pd.MultiIndex.from_frame(key_values) if len(keys) > 1 else pd.Index(key_values[keys[0]])
+        changed = pd.concat({'solution':solution.iloc[sol_pair][shared].set_axis(index),
+                             'submission':submission.iloc[sub_pair][shared].set_axis(index)}, axis=1)
+        sol_unmatched[sol_pair] = False
+        sub_unmatched[sub_pair] = False
+    else:
+        # Solution values missing from each column, counting duplicates
+        for col, (a, b) in codes.items():
+            a, b = shared_codes(pd.Series(a), pd.Series(b))
+            n = max(a.max(initial=-1), b.max(initial=-1)) + 2 # NA (-1) shifted to 0
+            excess = np.bincount(a + 1, minlength=n) - np.bincount(b + 1, minlength=n)
+            column_mismatches[col] = int(excess[excess > 0].sum())
+
+    return RowDiff(missing=solution[sol_unmatched],
+                   extra=submission[sub_unmatched],
+                   changed=changed,
+                   column_mismatches=column_mismatches,
+                   missing_columns=missing_columns,
+                   extra_columns=extra_columns,
+                   n_solution=len(solution),
+                   n_submission=len(submission))